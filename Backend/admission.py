@@ -0,0 +1,127 @@
+# =============================================================================
+# ADMISSION CONTROL IN FRONT OF THE MODEL
+# =============================================================================
+#
+# At most max_active /chat requests use the model at the same time (enough to
+# fill the micro-batches of the scheduler / worker pool). Up to max_queue more
+# wait for a slot until their deadline; beyond that a request is rejected at
+# once with a retry-after estimate instead of piling up on the server threads.
+# Commands that do not need the model (help, status, log...) skip the queue.
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from src import metrics
+
+
+class Overloaded(Exception):
+    """Request not admitted (answered with HTTP 503 and Retry-After)"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded queue with deadlines in front of the model.
+
+    Waiting requests are served in arrival order; a request whose deadline
+    passes while it waits leaves the queue without ever reaching the model.
+    """
+
+    def __init__(self, max_active=8, max_queue=32, timeout=10.0):
+        """
+        Args:
+            max_active: Requests using the model at the same time.
+            max_queue: Requests waiting for a slot; more are rejected at once.
+            timeout: Default (and maximum) seconds a request may wait for a slot.
+        """
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self._condition = threading.Condition()
+        self._waiting = []  # Tickets in arrival order
+        self._tickets = 0
+        self.active = 0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.bypassed = 0
+        self.mean_service = 0.0  # Seconds a slot is held (moving average)
+
+    def retry_after(self):
+        """Seconds until the queue has likely drained (at least 1)"""
+        pending = len(self._waiting) + 1
+        return max(1, math.ceil(self.mean_service * pending / self.max_active))
+
+    @contextmanager
+    def admit(self, timeout=None):
+        """
+        Holds a model slot for the body of the with block.
+
+        Raises:
+            Overloaded: The queue is full, or no slot was free before the deadline.
+        """
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        arrival = time.monotonic()
+        deadline = arrival + timeout
+
+        with self._condition:
+            if self.active >= self.max_active or self._waiting:
+                if len(self._waiting) >= self.max_queue:
+                    self.rejected += 1
+                    raise Overloaded("Server busy, queue full", self.retry_after())
+
+                self._tickets += 1
+                ticket = self._tickets
+                self._waiting.append(ticket)
+                try:
+                    while self.active >= self.max_active or self._waiting[0] != ticket:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.expired += 1
+                            raise Overloaded("Server busy, request deadline exceeded", self.retry_after())
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting.remove(ticket)
+                    self._condition.notify_all()
+
+            self.active += 1
+            self.admitted += 1
+
+        start = time.monotonic()
+        if metrics.enabled:
+            metrics.record('chat.queue_wait', start - arrival)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self.mean_service += 0.1 * (time.monotonic() - start - self.mean_service)
+                self._condition.notify_all()
+
+    def bypass(self):
+        """Counts a request served without the model (no slot needed)"""
+        with self._condition:
+            self.bypassed += 1
+
+    def stats(self):
+        with self._condition:
+            return {
+                'active': self.active,
+                'queued': len(self._waiting),
+                'max_active': self.max_active,
+                'max_queue': self.max_queue,
+                'timeout_s': self.timeout,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'bypassed': self.bypassed,
+                'mean_service_ms': self.mean_service * 1000
+            }
@@ -1,41 +1,89 @@
+import json
 import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
 
-# PARCHE PARA TORCH.LOAD
-import warnings
-warnings.filterwarnings("ignore", message=".*torch.load.*")
-warnings.filterwarnings("ignore", message=".*weights_only.*")
-
-import torch
-original_load = torch.load
-def patched_load(*args, **kwargs):
-    kwargs.pop('weights_only', None)
-    return original_load(*args, **kwargs)
-torch.load = patched_load
-
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-import io
-import sys
-from contextlib import redirect_stdout
 
 # Importar directamente desde model_chat
 from model_chat import RoboticsAI
+from chat_results import SimulationResult
+from kinematics_api import kinematics_api
+from executors import run_cpu
+from admission import AdmissionController, Overloaded
+from simulation_jobs import SimulationJobs
+from single_flight import SingleFlight
+from prediction_cache import normalize_text
+from src import metrics
 
 # Crear app Flask
 app = Flask(__name__)
 CORS(app)
 
+# Endpoints numéricos /api/* (llaman a src directamente, sin cargar el modelo)
+app.register_blueprint(kinematics_api)
+
 # Instancia global del AI (como en model_chat.py)
 ai_instance = None
 
+# Control de admisión delante del modelo: por defecto tantas peticiones activas como caben en los batches
+admission = AdmissionController(
+    max_active=int(os.environ.get('ROBOT_AI_MAX_ACTIVE', 0)) or
+               int(os.environ.get('ROBOT_AI_MAX_BATCH', 8)) * max(1, int(os.environ.get('ROBOT_AI_WORKERS', 0))),
+    max_queue=int(os.environ.get('ROBOT_AI_MAX_QUEUE', 32)),
+    timeout=float(os.environ.get('ROBOT_AI_QUEUE_TIMEOUT', 10))
+)
+
+# Figuras de las simulaciones, generadas en segundo plano y recogidas en /simulation/<id>
+simulation_jobs = SimulationJobs(
+    workers=int(os.environ.get('ROBOT_AI_SIMULATION_WORKERS', 2)),
+    max_jobs=int(os.environ.get('ROBOT_AI_SIMULATION_JOBS', 256)),
+    ttl=float(os.environ.get('ROBOT_AI_SIMULATION_TTL', 600))
+)
+
+# Single-flight: las consultas idénticas en curso se calculan una sola vez (ROBOT_AI_COALESCE=0 lo desactiva)
+in_flight = SingleFlight(enabled=os.environ.get('ROBOT_AI_COALESCE', '1') != '0')
+
+# Comandos que no usan el modelo: no pasan por la cola de admisión
+CHEAP_COMMANDS = {'help', 'h', 'examples', 'e', 'status', 's', 'log', 'history', 'l', 'clear log', 'clear', 'reset'}
+
 def get_ai_instance():
     """Inicializar AI igual que en model_chat.py"""
     global ai_instance
     if ai_instance is None:
-        ai_instance = RoboticsAI()
+        workers = int(os.environ.get('ROBOT_AI_WORKERS', 0))
+        if workers > 0 and os.environ.get('ROBOT_AI_COMPILE') == '1':
+            # La compilación ejecuta inferencias de calentamiento en este proceso, antes del fork de los workers
+            raise ValueError("ROBOT_AI_COMPILE=1 can't be combined with ROBOT_AI_WORKERS: use one or the other")
+
+        # ROBOT_AI_QUANTIZE=1 activa la inferencia int8 en CPU
+        # ROBOT_AI_PREDICTION_CACHE=<fichero sqlite> conserva la cache de predicciones entre reinicios
+        ai_instance = RoboticsAI(
+            quantize=os.environ.get('ROBOT_AI_QUANTIZE') == '1',
+            prediction_cache_path=os.environ.get('ROBOT_AI_PREDICTION_CACHE'),
+            decoding=os.environ.get('ROBOT_AI_DECODING', 'beam'),  # 'beam', 'adaptive', 'constrained' o 'speculative'
+            fast_path=os.environ.get('ROBOT_AI_FAST_PATH') == '1',  # ROBOT_AI_FAST_PATH=1 resuelve las consultas con plantilla fija sin el modelo
+            compiled=os.environ.get('ROBOT_AI_COMPILE') == '1',  # ROBOT_AI_COMPILE=1 compila encoder y decoder (torch.compile)
+            generate_timeout=float(os.environ.get('ROBOT_AI_GENERATE_TIMEOUT', 60)),  # Espera máxima por el scheduler / workers
+            cache_templates=os.environ.get('ROBOT_AI_CACHE_TEMPLATES') == '1'  # ROBOT_AI_CACHE_TEMPLATES=1 comparte la cache entre consultas que solo difieren en los números
+        )
         if not ai_instance.load_model():
             raise Exception("Failed to load model")
+
+        if workers > 0:
+            # ROBOT_AI_WORKERS=N: N procesos de inferencia que comparten los pesos del modelo cargado aquí
+            ai_instance.enable_worker_pool(
+                workers,
+                max_batch_size=int(os.environ.get('ROBOT_AI_MAX_BATCH', 8)),
+                threads_per_worker=int(os.environ.get('ROBOT_AI_WORKER_THREADS', 0)) or None
+            )
+        else:
+            # Un solo hilo es dueño del modelo y agrupa las peticiones concurrentes en micro-batches
+            ai_instance.enable_scheduler(
+                max_batch_size=int(os.environ.get('ROBOT_AI_MAX_BATCH', 8)),
+                max_wait_ms=float(os.environ.get('ROBOT_AI_BATCH_WAIT_MS', 5))
+            )
         
         # Configurar referencia para chat_processing (como en model_chat.py)
         from chat_processing import set_ai_reference
@@ -43,81 +91,139 @@ def get_ai_instance():
         
     return ai_instance
 
-def process_user_input(user_input):
+def special_command(ai, user_input):
+    """Texto de los comandos que no usan el modelo, o None si user_input no es uno de ellos"""
+    # Handle special commands (igual que en model_chat.py), con prioridad: sin cola de admisión
+    if user_input.lower() in CHEAP_COMMANDS:
+        admission.bypass()
+
+    if user_input.lower() in ['help', 'h']:
+        return ai.show_help() + "\n"
+    
+    elif user_input.lower() in ['examples', 'e']:
+        return ai.show_examples() + "\n"
+    
+    elif user_input.lower() in ['status', 's']:
+        return ai.get_system_status() + "\n"
+
+    elif user_input.lower() in ['log', 'history', 'l']:
+        return ai.show_log() + "\n"
+    
+    elif user_input.lower() in ['clear log', 'clear', 'reset']:
+        return ai.clear_log() + "\n"
+    
+    return None
+
+def log_context(ai):
     """
-    Procesa la entrada del usuario EXACTAMENTE como en model_chat.py
-    Retorna (respuesta_texto, prediction_dict, simulations_html)
+    Contexto de sesión del que depende la respuesta: las consultas del log que usan
+    los handlers cuando faltan ángulos o coordenadas
     """
-    ai = get_ai_instance()
+    return tuple((entry['timestamp'], entry['input']) for entry in ai.prediction_log)
+
+def predict_input(ai, user_input, timeout=None):
+    """Predicción del modelo tras pasar el control de admisión (lanza Overloaded)"""
+    # Get prediction (EXACTAMENTE como en model_chat.py)
+    with admission.admit(timeout), metrics.span('chat.predict'):
+        prediction, error = ai.predict(user_input)
+    if error:
+        prediction = None  # Con error la predicción puede ser el texto crudo del modelo
+    return prediction, error
+
+def compute_result(prediction, error, render_text=True, render_figures=True):
+    """Cinemática y texto: en el executor de CPU acotado (serve.py), en este hilo con el servidor de desarrollo"""
+    from chat_processing import process
+    with metrics.span('chat.processing'):
+        result = run_cpu(process, prediction, error, render_figures=render_figures)
     
-    # Limpiar simulaciones previas si existe la función
+    response_text = None
+    if render_text:
+        from chat_formatting import format_text
+        with metrics.span('chat.format'):
+            response_text = run_cpu(format_text, result)
+    return result, response_text
+
+def submit_simulation(result):
+    """Encola las figuras del resultado en los jobs de simulación; devuelve el id (None si no hay figuras)"""
+    # Las figuras se generan en segundo plano, sin retener el hilo de la petición
+    if not isinstance(result, SimulationResult) or not result.configurations:
+        return None
+    return simulation_jobs.submit(result)
+
+def coalesce(ai, key, function, *args, timeout=None):
+    """
+    in_flight.do con plazo: quien espera a una petición idéntica en curso espera como
+    mucho lo que esperaría la suya (hueco en la cola + generación) y si no, Overloaded (503).
+    """
+    queue_timeout = admission.timeout if timeout is None else min(timeout, admission.timeout)
     try:
-        from src import clear_simulations
-        clear_simulations()
-    except ImportError:
-        pass  # Si no existe la función, continuar
+        return in_flight.do(key, function, *args, timeout=queue_timeout + ai.config['generate_timeout'])
+    except FutureTimeoutError:
+        raise Overloaded("Server busy, request deadline exceeded", admission.retry_after())
+
+@metrics.timed('chat.total')
+def process_user_input(user_input, render_text=True, timeout=None):
+    """
+    Procesa la entrada del usuario como en model_chat.py, sin capturar stdout:
+    los handlers devuelven un resultado (chat_results) y el texto se genera aparte.
+    Retorna (respuesta_texto, prediction_dict, simulation_id, result)
+
+    render_text=False omite el texto (respuesta_texto = None) para los clientes que solo usan los números.
+    timeout: segundos que la petición puede esperar un hueco del modelo (como máximo ROBOT_AI_QUEUE_TIMEOUT).
+    Lanza Overloaded si la cola está llena o el plazo vence antes de llegar al modelo.
+    """
+    ai = get_ai_instance()
     
-    # Capturar toda la salida (prints)
-    output_buffer = io.StringIO()
+    # LÓGICA COPIADA DIRECTAMENTE DE model_chat.py main()
+    response_text = special_command(ai, user_input)
+    if response_text is not None:
+        return response_text, None, None, None
     
-    with redirect_stdout(output_buffer):
-        # LÓGICA COPIADA DIRECTAMENTE DE model_chat.py main()
-        
-        # Handle special commands (igual que en model_chat.py)
-        if user_input.lower() in ['help', 'h']:
-            print(ai.show_help())
-            return output_buffer.getvalue(), None, None
-        
-        elif user_input.lower() in ['examples', 'e']:
-            print(ai.show_examples())
-            return output_buffer.getvalue(), None, None
-        
-        elif user_input.lower() in ['status', 's']:
-            print(ai.get_system_status())
-            return output_buffer.getvalue(), None, None
+    # Peticiones idénticas simultáneas comparten una sola predicción y su procesado
+    (response_text, prediction, simulation_id, result), _ = coalesce(
+        ai, ('chat', normalize_text(user_input), render_text, log_context(ai)),
+        run_user_input, ai, user_input, render_text, timeout, timeout=timeout)
+    return response_text, prediction, simulation_id, result
 
-        elif user_input.lower() in ['log', 'history', 'l']:
-            print(ai.show_log())
-            return output_buffer.getvalue(), None, None
-        
-        elif user_input.lower() in ['clear log', 'clear', 'reset']:
-            print(ai.clear_log())
-            return output_buffer.getvalue(), None, None
-        
-        # Process robotics command (igual que en model_chat.py)
-        # print("🔄 Processing ...")
-        
-        # Get prediction (EXACTAMENTE como en model_chat.py)
-        prediction, error = ai.predict(user_input)
-        
-        # ACTIVAR WEB MODE si es simulación
-        if prediction and prediction.get('operacion') == 'simulacion_3d':
-            try:
-                from src import Robot_repr
-                Robot_repr.clear_simulations()  # Limpiar simulaciones previas
-            except ImportError:
-                pass
-        
-        # Importar processing desde chat_processing (como en model_chat.py)
-        from chat_processing import processing
-        processing(prediction, error)
-        
-        # Obtener simulaciones si las hay
-        simulations_html = None
-        if prediction and prediction.get('operacion') == 'simulacion_3d':
-            try:
-                from src.Robot_repr import get_all_simulations_html
-                simulations_html = get_all_simulations_html()
-                # print(f"✅ HTML generado: {len(simulations_html) if simulations_html else 0} caracteres")
-            except ImportError as e:
-                print(f"❌ Error importando: {e}")
-                simulations_html = None
-            except Exception as e:
-                print(f"❌ Error procesando simulaciones: {e}")
-                simulations_html = None
+def run_user_input(ai, user_input, render_text, timeout):
+    prediction, error = predict_input(ai, user_input, timeout)
+    result, response_text = compute_result(prediction, error, render_text, render_figures=False)
     
-    # Retornar texto, predicción Y simulaciones
-    return output_buffer.getvalue(), prediction, simulations_html
+    # Retornar texto, predicción, job de simulación Y resultado
+    return response_text, prediction, submit_simulation(result), result
+
+def read_chat_request(data):
+    """
+    Mensaje, plazo y opciones de una petición de /chat.
+
+    Returns:
+        tuple: (mensaje, timeout en segundos o None, render_text), o un str con el error
+    """
+    if not isinstance(data, dict):
+        return "Expected a JSON object"
+    user_message = str(data.get('message', '')).strip()
+    if not user_message:
+        return 'Empty message'
+
+    # "deadline_ms": tiempo máximo de espera en la cola (por defecto ROBOT_AI_QUEUE_TIMEOUT)
+    deadline_ms = data.get('deadline_ms')
+    if deadline_ms is not None and (isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0):
+        return "'deadline_ms' must be a positive number"
+
+    # "text": false omite el texto formateado; los números van siempre en 'result'
+    return (user_message, deadline_ms / 1000 if deadline_ms is not None else None,
+            data.get('text', True) is not False)
+
+def overloaded_response(e):
+    """HTTP 503 con Retry-After para una petición rechazada por el control de admisión"""
+    print(f"⏳ Rejected: {e.reason}")
+    response = jsonify({'error': e.reason, 'retry_after': e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def sse(event, data):
+    """Un evento Server-Sent Events con datos JSON"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 # RUTAS PARA SERVIR FRONTEND
 @app.route('/')
@@ -143,16 +249,20 @@ def chat():
     Maneja múltiples simulaciones
     """
     try:
-        data = request.get_json()
-        user_message = data.get('message', '').strip()
-        
-        if not user_message:
-            return jsonify({'error': 'Empty message'}), 400
+        chat_request = read_chat_request(request.get_json(silent=True))
+        if isinstance(chat_request, str):
+            return jsonify({'error': chat_request}), 400
+        user_message, timeout, render_text = chat_request
         
         print(f"📨 Received: {user_message}")
         
         # USAR DIRECTAMENTE model_chat.py con soporte para múltiples simulaciones
-        response_text, prediction, simulations_html = process_user_input(user_message)
+        try:
+            response_text, prediction, simulation_id, result = process_user_input(
+                user_message, render_text=render_text, timeout=timeout)
+        except Overloaded as e:
+            return overloaded_response(e)
+        result_dict = result.to_dict() if result is not None else None
         
         # # Si no hay respuesta, dar mensaje por defecto
         # if not response_text.strip():
@@ -160,25 +270,18 @@ def chat():
         
         print(f"📤 Sending response...")
         
-        # Detectar si hay simulaciones
-        if simulations_html:
-            simulation_count = simulations_html.count('simulation-container') if simulations_html else 0
+        # Detectar si hay simulaciones: el HTML se pide después a /simulation/<id>
+        if simulation_id:
             return jsonify({
                 'response': response_text,
                 'has_simulation': True,
-                'simulations_html': simulations_html,
-                'simulation_count': simulation_count
-            })
-        elif prediction and prediction.get('operacion') == 'simulacion_3d':
-            # Fallback: Si es simulación pero no tenemos HTML, usar método original
-            return jsonify({
-                'response': response_text,
-                'has_simulation': True,
-                'simulation_url': 'http://127.0.0.1:57622/',  # Puerto dinámico - necesita mejora
-                'simulation_count': 1
+                'simulation_id': simulation_id,
+                'simulation_url': f'/simulation/{simulation_id}',
+                'simulation_count': len(result.configurations),
+                'result': result_dict
             })
         else:
-            return jsonify({'response': response_text})
+            return jsonify({'response': response_text, 'result': result_dict})
         
     except Exception as e:
         print(f"❌ API Error: {e}")
@@ -186,6 +289,96 @@ def chat():
         traceback.print_exc()
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Variante de /chat por Server-Sent Events: cada etapa se envía en cuanto termina.
+
+        event: prediction   {"prediction": {...}, "error": null}         (tras la inferencia)
+        event: result       {"response": "texto", "result": {...}}       (cinemática y texto)
+        event: simulation   {"simulation_id": "...", "simulation_url": "/simulation/<id>", "simulation_count": N}
+        event: error        {"error": "..."}
+        event: done         {}
+
+    Los comandos sin modelo (help, status...) envían solo result y done.
+    Una petición rechazada por el control de admisión recibe 503 antes de empezar el stream.
+    """
+    chat_request = read_chat_request(request.get_json(silent=True))
+    if isinstance(chat_request, str):
+        return jsonify({'error': chat_request}), 400
+    user_message, timeout, render_text = chat_request
+
+    print(f"📨 Received (stream): {user_message}")
+
+    # La inferencia va antes de abrir el stream: su resultado es el primer evento
+    try:
+        ai = get_ai_instance()
+        response_text = special_command(ai, user_message)
+        if response_text is None:
+            (prediction, error), _ = coalesce(ai, ('predict', normalize_text(user_message), log_context(ai)),
+                                              predict_input, ai, user_message, timeout, timeout=timeout)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"❌ API Error: {e}")
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+    def events():
+        if response_text is not None:
+            yield sse('result', {'response': response_text, 'result': None})
+            yield sse('done', {})
+            return
+
+        yield sse('prediction', {'prediction': prediction, 'error': error})
+        try:
+            # Las figuras se serializan en segundo plano; el cliente las pide a /simulation/<id>
+            result, text = compute_result(prediction, error, render_text, render_figures=False)
+            yield sse('result', {'response': text, 'result': result.to_dict() if result is not None else None})
+
+            simulation_id = submit_simulation(result)
+            if simulation_id:
+                yield sse('simulation', {'simulation_id': simulation_id,
+                                         'simulation_url': f'/simulation/{simulation_id}',
+                                         'simulation_count': len(result.configurations)})
+        except Exception as e:
+            print(f"❌ API Error: {e}")
+            import traceback
+            traceback.print_exc()
+            yield sse('error', {'error': f'Server error: {str(e)}'})
+        print(f"📤 Stream sent")
+        yield sse('done', {})
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/simulation/<simulation_id>')
+def simulation(simulation_id):
+    """
+    Figuras de un job de simulación de /chat o /chat/stream.
+    ?wait=<s> espera hasta s segundos (máximo 10) a que termine antes de responder.
+
+        200 {"status": "done", "simulations_html": "...", "simulation_count": N}
+        202 {"status": "pending"}  (con Retry-After)
+        404 job desconocido o caducado
+    """
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), 10)
+    except ValueError:
+        return jsonify({'error': "'wait' must be a number of seconds"}), 400
+
+    job = simulation_jobs.get(simulation_id, wait=wait)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired simulation'}), 404
+
+    status, value, count = job
+    if status == 'pending':
+        response = jsonify({'status': 'pending', 'simulation_count': count})
+        response.headers['Retry-After'] = '1'
+        return response, 202
+    if status == 'error':
+        return jsonify({'status': 'error', 'error': value}), 500
+    return jsonify({'status': 'done', 'simulations_html': value or '', 'simulation_count': count})
+
 @app.route('/status')
 def status():
     """Estado del servidor"""
@@ -194,7 +387,13 @@ def status():
         return jsonify({
             'status': 'running',
             'model_loaded': ai.model is not None,
-            'model_status': ai.model_status
+            'model_status': ai.model_status,
+            # Contadores del proceso y de los workers de inferencia (sumados tras cada batch)
+            'decoding': ai.decoding_stats.stats(),
+            'encoder_cache': ai.encoder_cache.stats() if ai.encoder_cache else None,
+            'scheduler': ai.scheduler.stats() if ai.scheduler else None,
+            'admission': admission.stats(),
+            'simulation_jobs': simulation_jobs.stats()
         })
     except Exception as e:
         return jsonify({
@@ -202,6 +401,15 @@ def status():
             'error': str(e)
         })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Histogramas de latencia por etapa (ms); ?reset=1 los reinicia después de leerlos"""
+    snapshot = metrics.snapshot()
+    if request.args.get('reset') == '1':
+        metrics.reset()
+    return jsonify({'enabled': metrics.enabled, 'stages': snapshot, 'admission': admission.stats(),
+                    'simulation_jobs': simulation_jobs.stats(), 'coalescing': in_flight.stats()})
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🤖 ROBOT AI WEB SERVER")
@@ -214,6 +422,7 @@ if __name__ == '__main__':
         print("✅ AI ready!")
         print("="*60)
         
+        # Servidor de desarrollo; en producción usar serve.py
         app.run(debug=False, host='0.0.0.0', port=5000, threaded=True)
         
     except KeyboardInterrupt:
@@ -0,0 +1,261 @@
+# =============================================================================
+# KINEMATICS MICRO-BENCHMARKS
+# =============================================================================
+#
+# Times the scalar kinematic models (src/matrice_tn.py, src/modele_differentiel.py,
+# src/trajectory_generation.py) and their batch versions (src/kinematics_batch.py)
+# for 1 to 1e6 configurations, checks that both agree and compares the timings
+# against a stored baseline. From the Backend folder:
+#
+#   python -m benchmarks.kinematics_benchmark --save-baseline
+#   python -m benchmarks.kinematics_benchmark --threshold 0.25
+#
+# Scalar timings above --max-scalar configurations are extrapolated from a
+# sample (per-call time x size). The exit code is 1 when a timing is slower than
+# the baseline by more than the threshold, when scalar and batch disagree or when
+# there is no baseline to compare with (the committed one was measured on a
+# single-core x86_64 machine: re-save it on the machine that runs the check).
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+
+import numpy as np
+
+sys.path.append('.')
+
+from src.const_v import dh, Liaisons
+from src.matrice_tn import generate_transformation_matrices, matrice_Tn, mgd, mgi
+from src.modele_differentiel import Jacob_geo, Jacob_analytique, MDI
+from src.trajectory_generation import traj
+from src.kinematics_batch import (matrices_batch, matrice_Tn_batch, mgd_batch, mgi_batch, Jacob_geo_batch,
+                                  Jacob_analytique_batch, MDI_batch)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'kinematics_baseline.json')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+SIZES = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# Batch inputs are processed in chunks to bound memory (1e6 x 4 x 4 x 4 float64 = 512 MB)
+CHUNK_SIZE = 65536
+
+# Timings shorter than this are too noisy to be compared with the baseline
+MIN_COMPARABLE_SECONDS = 1e-4
+
+# Trajectory used for traj (scalar only: one call = one whole trajectory)
+TRAJ_ARGS = (np.array([0, 500, 600]), np.array([0, 500, 900]), 50, 100, 100)
+
+
+def random_configurations(n, seed=0):
+    """Joint angles in degrees, away from the singular configurations"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(-180, 180, n), rng.uniform(-80, 80, n), rng.uniform(10, 170, n)])
+
+
+def make_inputs(n):
+    qs = random_configurations(n)
+    positions = mgd_batch(qs, Liaisons)
+    Js = Jacob_geo_batch(matrices_batch(qs, dh))[:, :3]
+    velocities = np.random.default_rng(1).uniform(-100, 100, (n, 3))
+    return {'qs': qs, 'positions': positions, 'Js': Js, 'velocities': velocities}
+
+
+def mgi_rows(batch):
+    solutions, valid = batch
+    return [solutions[i][valid[i]] for i in range(len(solutions))]
+
+
+# name: (scalar(inputs, i), batch(inputs, start, stop), scalar output -> comparable, batch output -> comparable rows,
+#        max scalar calls)
+CASES = {
+    'generate_transformation_matrices': (
+        lambda d, i: generate_transformation_matrices(list(d['qs'][i]), dh),
+        lambda d, a, b: matrices_batch(d['qs'][a:b], dh),
+        np.array, list, None),
+    'matrice_Tn': (
+        lambda d, i: matrice_Tn(dh, list(d['qs'][i])),
+        lambda d, a, b: matrice_Tn_batch(dh, d['qs'][a:b]),
+        np.array, list, None),
+    'mgd': (
+        lambda d, i: mgd(d['qs'][i], Liaisons),
+        lambda d, a, b: mgd_batch(d['qs'][a:b], Liaisons),
+        np.array, list, None),
+    'mgi': (
+        lambda d, i: mgi(d['positions'][i], Liaisons),
+        lambda d, a, b: mgi_batch(d['positions'][a:b], Liaisons),
+        lambda out: np.array(out, dtype=np.float64).reshape(-1, 3), mgi_rows, None),
+    'Jacob_geo': (
+        lambda d, i: Jacob_geo(generate_transformation_matrices(list(d['qs'][i]), dh)),
+        lambda d, a, b: Jacob_geo_batch(matrices_batch(d['qs'][a:b], dh)),
+        np.array, list, None),
+    'Jacob_analytique': (
+        lambda d, i: Jacob_analytique(list(d['qs'][i])),
+        lambda d, a, b: Jacob_analytique_batch(d['qs'][a:b]),
+        np.array, list, 20),  # sympy subs: tens of ms per call
+    'MDI': (
+        lambda d, i: MDI(d['velocities'][i], d['Js'][i]),
+        lambda d, a, b: MDI_batch(d['velocities'][a:b], d['Js'][a:b]),
+        np.array, list, None),
+}
+
+
+def best_time(function, repeat, min_time=0.02):
+    """Best of `repeat` measurements, each looping the function for at least ~min_time"""
+    start = time.perf_counter()
+    function()
+    first = time.perf_counter() - start
+    loops = max(1, int(min_time / first)) if first > 0 else 1000
+
+    best = first
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def run_scalar(case, inputs, n):
+    scalar = CASES[case][0]
+    return [scalar(inputs, i) for i in range(n)]
+
+
+def run_batch(case, inputs, n):
+    batch = CASES[case][1]
+    return [batch(inputs, start, min(start + CHUNK_SIZE, n)) for start in range(0, n, CHUNK_SIZE)]
+
+
+def check_agreement(case, inputs, n, atol=1e-6):
+    """Scalar and batch outputs of the first n configurations match"""
+    _, _, scalar_out, batch_rows, _ = CASES[case]
+    scalar = [scalar_out(out) for out in run_scalar(case, inputs, n)]
+    batch = [row for chunk in run_batch(case, inputs, n) for row in batch_rows(chunk)]
+    return len(scalar) == len(batch) and all(
+        np.shape(s) == np.shape(b) and np.allclose(s, b, rtol=1e-7, atol=atol) for s, b in zip(scalar, batch))
+
+
+def run_benchmark(cases, sizes, repeat=3, max_scalar=10000):
+    inputs = make_inputs(max(sizes))
+    results = {}
+    for case in [case for case in cases if case in CASES]:
+        case_max_scalar = min(max_scalar, CASES[case][4] or max_scalar)
+        agreement = check_agreement(case, inputs, min(max(sizes), 1000, case_max_scalar))
+        print(f"{case}: scalar/batch agreement {'OK' if agreement else 'FAILED'}")
+        results[case] = {'agreement': agreement, 'sizes': {}}
+
+        for n in sizes:
+            sampled = min(n, case_max_scalar)
+            scalar = best_time(lambda: run_scalar(case, inputs, sampled), repeat) * n / sampled
+            batch = best_time(lambda: run_batch(case, inputs, n), repeat)
+            results[case]['sizes'][str(n)] = {
+                'scalar_s': scalar,
+                'scalar_extrapolated': sampled < n,
+                'batch_s': batch,
+                'speedup': scalar / batch if batch else None
+            }
+            print(f"  n={n:>8}  scalar {scalar * 1000:>12.3f} ms{'*' if sampled < n else ' '}"
+                  f"  batch {batch * 1000:>10.3f} ms  x{scalar / batch:>8.1f}")
+
+    if 'traj' not in cases:
+        return results
+
+    # traj prints its MGI failures: keep the report readable
+    with redirect_stdout(StringIO()):
+        trajectory_points = len(traj(*TRAJ_ARGS)[2])
+        traj_time = best_time(lambda: traj(*TRAJ_ARGS), repeat, min_time=0)
+    results['traj'] = {'agreement': True, 'points': trajectory_points, 'sizes': {'1': {'scalar_s': traj_time}}}
+    print(f"traj: {trajectory_points} points in {traj_time * 1000:.1f} ms")
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Returns:
+        list: Timings slower than the baseline by more than threshold (0.25 = +25%).
+    """
+    regressions = []
+    for case, result in results.items():
+        for size, timings in result['sizes'].items():
+            reference = baseline['results'].get(case, {}).get('sizes', {}).get(size, {})
+            for key in ('scalar_s', 'batch_s'):
+                current, previous = timings.get(key), reference.get(key)
+                if current is None or previous is None or max(current, previous) < MIN_COMPARABLE_SECONDS:
+                    continue
+                if current > previous * (1 + threshold):
+                    regressions.append({'case': case, 'size': size, 'mode': key[:-2],
+                                        'baseline_s': previous, 'current_s': current,
+                                        'slowdown': current / previous - 1})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kinematics micro-benchmarks with regression thresholds")
+    parser.add_argument('--cases', nargs='+', default=list(CASES) + ['traj'], choices=list(CASES) + ['traj'])
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3, help="Measurements per timing (the best one is kept)")
+    parser.add_argument('--max-scalar', type=int, default=10000,
+                        help="Scalar calls actually timed; larger sizes are extrapolated")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown against the baseline")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline")
+    parser.add_argument('--output', help="Report path (default: benchmarks/results/kinematics_<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = {
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count()
+        },
+        'settings': {'repeat': args.repeat, 'max_scalar': args.max_scalar, 'chunk_size': CHUNK_SIZE},
+        'results': run_benchmark(args.cases, sorted(args.sizes), args.repeat, args.max_scalar)
+    }
+
+    failed = [case for case, result in report['results'].items() if not result['agreement']]
+    baseline = load_baseline(args.baseline)
+    if baseline is not None:
+        report['regressions'] = compare_with_baseline(report['results'], baseline, args.threshold)
+        for regression in report['regressions']:
+            print(f"⚠️ {regression['case']} n={regression['size']} {regression['mode']}: "
+                  f"{regression['baseline_s'] * 1000:.3f} ms -> {regression['current_s'] * 1000:.3f} ms "
+                  f"(+{regression['slowdown']:.0%})")
+        if not report['regressions']:
+            print(f"✅ No regression above {args.threshold:.0%} against {args.baseline}")
+    elif not args.save_baseline:
+        print(f"❌ No baseline at {args.baseline}: nothing to check the timings against (run with --save-baseline)")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"kinematics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Report written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline written to {args.baseline}")
+
+    if failed:
+        print(f"❌ Scalar and batch results disagree: {', '.join(failed)}")
+    if failed or report.get('regressions') or (baseline is None and not args.save_baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
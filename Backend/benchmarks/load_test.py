@@ -0,0 +1,271 @@
+# =============================================================================
+# CONCURRENT LOAD TEST OF THE /chat SERVER
+# =============================================================================
+#
+# Replays a weighted mix of chat queries (taken from parser_corpus.json) against
+# the Flask server with N simultaneous clients and reports throughput, latency
+# percentiles, error rates and response sizes, overall and per query type.
+# From the Backend folder:
+#
+#   python -m benchmarks.load_test --start-server --concurrency 8 --requests 200
+#   python -m benchmarks.load_test --url http://127.0.0.1:5000 --duration 60 --mix fk=4 ik=2 simulation=1
+#
+# Every client sends its next request as soon as the previous one is answered
+# (closed loop), so the concurrency is the number of operators using the app.
+
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'parser_corpus.json')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_URL = 'http://127.0.0.1:5000'
+
+# Query types of the mix and the operation of their corpus queries
+QUERY_TYPES = {
+    'fk': 'cinematica_directa',
+    'ik': 'cinematica_inversa',
+    'jacobian': 'jacobiano',
+    'matrices': 'matrices_transformacion',
+    'simulation': 'simulacion_3d'
+}
+DEFAULT_MIX = {'fk': 3, 'ik': 3, 'jacobian': 2, 'matrices': 1, 'simulation': 1}
+
+
+def load_queries(path=CORPUS_PATH):
+    """Corpus queries grouped by query type"""
+    with open(path, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    return {
+        query_type: [sample['query'] for sample in corpus if sample['expected'].get('operacion') == operation]
+        for query_type, operation in QUERY_TYPES.items()
+    }
+
+
+def parse_mix(items):
+    """['fk=4', 'ik=2'] -> {'fk': 4.0, 'ik': 2.0}"""
+    mix = {}
+    for item in items:
+        query_type, _, weight = item.partition('=')
+        if query_type not in QUERY_TYPES:
+            raise ValueError(f"Unknown query type '{query_type}' (expected one of {', '.join(QUERY_TYPES)})")
+        mix[query_type] = float(weight or 1)
+    return mix
+
+
+def request_stream(queries, mix, seed=0):
+    """Endless (query type, query) sequence following the weights of the mix"""
+    rng = random.Random(seed)
+    types = [query_type for query_type in mix if queries.get(query_type)]
+    weights = [mix[query_type] for query_type in types]
+    while True:
+        query_type = rng.choices(types, weights)[0]
+        yield query_type, rng.choice(queries[query_type])
+
+
+def get_json(url, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def send_chat(url, message, timeout):
+    """
+    Returns:
+        dict: latency (s), HTTP status, response size (bytes) and error (None if the request succeeded).
+    """
+    body = json.dumps({'message': message}).encode('utf-8')
+    http_request = urllib.request.Request(f"{url}/chat", data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        payload, status = e.read(), e.code
+    except Exception as e:
+        return {'latency': time.perf_counter() - start, 'status': None, 'bytes': 0, 'error': type(e).__name__}
+    latency = time.perf_counter() - start
+
+    error = None if status == 200 else f"HTTP {status}"
+    if error is None:
+        try:
+            if 'error' in json.loads(payload):
+                error = 'error response'
+        except ValueError:
+            error = 'invalid JSON'
+    return {'latency': latency, 'status': status, 'bytes': len(payload), 'error': error}
+
+
+def start_server(url, timeout=600):
+    """Starts api.py and waits until /status reports the model loaded"""
+    print("Starting api.py (loading the model)...")
+    process = subprocess.Popen([sys.executable, 'api.py'], cwd=BACKEND_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"api.py exited with code {process.returncode}")
+        try:
+            if get_json(f"{url}/status").get('model_loaded'):
+                return process
+        except (OSError, ValueError):
+            pass
+        time.sleep(1)
+    process.terminate()
+    raise RuntimeError(f"The server was not ready after {timeout} s")
+
+
+def run_load(url, stream, concurrency, total_requests=None, duration=None, timeout=120):
+    """
+    Closed-loop load: `concurrency` clients send requests back to back until
+    `total_requests` have been sent or `duration` seconds have passed.
+    """
+    lock = threading.Lock()
+    counter = itertools.count()
+    results = []
+    deadline = time.perf_counter() + duration if duration else None
+
+    def client():
+        while True:
+            with lock:
+                if total_requests is not None and next(counter) >= total_requests:
+                    return
+                query_type, query = next(stream)
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            result = send_chat(url, query, timeout)
+            result.update(type=query_type, query=query)
+            with lock:
+                results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed=None):
+    latencies = np.array([result['latency'] for result in results]) * 1000
+    sizes = np.array([result['bytes'] for result in results if result['error'] is None])
+    errors = {}
+    for result in results:
+        if result['error'] is not None:
+            errors[result['error']] = errors.get(result['error'], 0) + 1
+
+    summary = {
+        'requests': len(results),
+        'error_rate': sum(errors.values()) / len(results) if results else 0.0,
+        'errors': errors,
+        'latency_ms': {
+            'mean': float(latencies.mean()) if len(latencies) else 0.0,
+            **{f"p{q}": float(np.percentile(latencies, q)) if len(latencies) else 0.0 for q in (50, 90, 95, 99)},
+            'max': float(latencies.max()) if len(latencies) else 0.0
+        },
+        'response_bytes': {
+            'mean': float(sizes.mean()) if len(sizes) else 0.0,
+            'p50': float(np.percentile(sizes, 50)) if len(sizes) else 0.0,
+            'max': int(sizes.max()) if len(sizes) else 0
+        }
+    }
+    if elapsed is not None:
+        summary['throughput_rps'] = len(results) / elapsed if elapsed else 0.0
+    return summary
+
+
+def print_summary(report):
+    print("\n" + "=" * 92)
+    print(f"{'Type':<14}{'Requests':>9}{'Errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'KB avg':>10}")
+    print("-" * 92)
+    for name, summary in [('all', report['overall'])] + list(report['by_type'].items()):
+        latency = summary['latency_ms']
+        print(f"{name:<14}{summary['requests']:>9}{summary['error_rate']:>8.1%}{latency['p50']:>10.1f}{latency['p90']:>10.1f}"
+              f"{latency['p99']:>10.1f}{latency['max']:>10.1f}{summary['response_bytes']['mean'] / 1024:>10.1f}")
+    print("=" * 92)
+    print(f"Concurrency {report['settings']['concurrency']}: {report['overall']['throughput_rps']:.2f} req/s "
+          f"over {report['elapsed_s']:.1f} s")
+    if report['overall']['errors']:
+        print(f"Errors: {report['overall']['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test of the /chat server")
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--start-server', action='store_true', help="Start api.py for the test and stop it afterwards")
+    parser.add_argument('--concurrency', type=int, default=4, help="Simultaneous clients")
+    parser.add_argument('--requests', type=int, default=100, help="Requests to send (ignored with --duration)")
+    parser.add_argument('--duration', type=float, help="Seconds of load instead of a number of requests")
+    parser.add_argument('--warmup', type=int, default=5, help="Sequential requests sent (and discarded) first")
+    parser.add_argument('--mix', nargs='+', default=[f"{t}={w}" for t, w in DEFAULT_MIX.items()],
+                        help=f"Weights of the query types ({', '.join(QUERY_TYPES)})")
+    parser.add_argument('--timeout', type=float, default=120, help="Per-request timeout (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--output', help="Report path (default: benchmarks/results/load_<timestamp>.json)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    stream = request_stream(load_queries(args.corpus), mix, args.seed)
+    server = start_server(args.url) if args.start_server else None
+
+    try:
+        for _ in range(args.warmup):
+            send_chat(args.url, next(stream)[1], args.timeout)
+        try:
+            # Server-side stage histograms of the measured requests only
+            get_json(f"{args.url}/metrics?reset=1")
+        except (OSError, ValueError):
+            pass
+
+        total = None if args.duration else args.requests
+        print(f"Sending {f'{total} requests' if total else f'requests for {args.duration:.0f} s'} "
+              f"with {args.concurrency} clients to {args.url}...")
+        results, elapsed = run_load(args.url, stream, args.concurrency, total, args.duration, args.timeout)
+
+        try:
+            server_metrics = get_json(f"{args.url}/metrics")
+        except (OSError, ValueError):
+            server_metrics = None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'url': args.url,
+        'settings': {'concurrency': args.concurrency, 'requests': args.requests, 'duration': args.duration,
+                     'warmup': args.warmup, 'mix': mix, 'seed': args.seed},
+        'elapsed_s': elapsed,
+        'overall': summarize(results, elapsed),
+        'by_type': {query_type: summarize([r for r in results if r['type'] == query_type])
+                    for query_type in mix if any(r['type'] == query_type for r in results)},
+        'server_metrics': server_metrics,
+        'failures': [result for result in results if result['error'] is not None][:50]
+    }
+    print_summary(report)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📄 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
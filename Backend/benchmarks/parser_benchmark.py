@@ -0,0 +1,231 @@
+# =============================================================================
+# PARSER ACCURACY AND LATENCY BENCHMARK
+# =============================================================================
+#
+# Runs the labelled corpus through RoboticsAI.predict for each decoding and
+# quantization mode and writes a JSON report. From the Backend folder:
+#
+#   python -m benchmarks.parser_benchmark
+#   python -m benchmarks.parser_benchmark --decoding beam adaptive --quantize both --repeat 3
+#
+# The prediction and encoder caches are disabled so every query pays the real
+# model cost, unless --with-caches is given.
+
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import torch
+
+sys.path.append('.')
+
+from model_chat import RoboticsAI
+from rule_parser import parse_command
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'parser_corpus.json')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+DECODING_MODES = ('beam', 'adaptive', 'constrained', 'speculative')
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def normalize_value(value):
+    """Numbers (and expressions like pi/2, 8pi/3) compare by value, the rest as folded text"""
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)):
+        return round(float(value), 4)
+    text = str(value).strip()
+    try:
+        # 8pi/3, 3π/4 -> 8*pi/3, 3*pi/4
+        expression = re.sub(r'(\d)\s*pi', r'\1*pi', text.replace('π', 'pi'))
+        return round(float(eval(expression, {'__builtins__': {}}, {'pi': math.pi, 'np': np, 'math': math})), 4)
+    except Exception:
+        return text.casefold()
+
+
+def flatten(value, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}"""
+    if not isinstance(value, dict):
+        return {prefix: value}
+    fields = {}
+    for key, child in value.items():
+        fields.update(flatten(child, f"{prefix}.{key}" if prefix else key))
+    return fields
+
+
+def score(prediction, expected):
+    """
+    Returns:
+        tuple: (exact match, {field: correct}) for every field of the expected command.
+    """
+    expected_fields = flatten(expected)
+    predicted_fields = flatten(prediction) if isinstance(prediction, dict) else {}
+    fields = {
+        field: field in predicted_fields and normalize_value(predicted_fields[field]) == normalize_value(value)
+        for field, value in expected_fields.items()
+    }
+    return all(fields.values()), fields
+
+
+def same_command(a, b):
+    """Same fields (keys included) with the same values"""
+    if not isinstance(a, dict) or not isinstance(b, dict):
+        return False
+    return flatten(a).keys() == flatten(b).keys() and score(a, b)[0]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def run_mode(ai, corpus, decoding, repeat):
+    """Accuracy (first pass) and latency (every pass) of one decoding mode"""
+    ai.config['decoding'] = decoding
+
+    latencies = []
+    exact, valid = 0, 0
+    field_hits, field_totals = {}, {}
+    failures = []
+    rule_hits, rule_label, rule_model = 0, 0, 0
+
+    # Warm-up query (lazy structures such as the constrained decoding trie)
+    ai.predict(corpus[0]['query'])
+
+    start = time.perf_counter()
+    for iteration in range(repeat):
+        for sample in corpus:
+            t0 = time.perf_counter()
+            prediction, error = ai.predict(sample['query'])
+            latencies.append(time.perf_counter() - t0)
+            if iteration:
+                continue
+
+            valid += error is None
+            match, fields = score(prediction, sample['expected'])
+            exact += match
+            for field, correct in fields.items():
+                field_hits[field] = field_hits.get(field, 0) + correct
+                field_totals[field] = field_totals.get(field, 0) + 1
+
+            # Fast path: the rules' output against the label and against the model
+            rule = parse_command(sample['query'])
+            if rule is not None:
+                rule_hits += 1
+                rule_label += same_command(rule, sample['expected'])
+                rule_model += same_command(rule, prediction)
+            if not match:
+                failures.append({'query': sample['query'], 'expected': sample['expected'],
+                                 'prediction': prediction, 'error': error})
+    elapsed = time.perf_counter() - start
+
+    return {
+        'decoding': decoding,
+        'queries': len(corpus),
+        'exact_match': exact / len(corpus),
+        'valid_json': valid / len(corpus),
+        'field_accuracy': sum(field_hits.values()) / sum(field_totals.values()),
+        'per_field_accuracy': {field: field_hits[field] / field_totals[field] for field in sorted(field_totals)},
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': float(np.mean(latencies)) * 1000
+        },
+        'throughput_qps': len(latencies) / elapsed,
+        'fast_path': {
+            'hits': rule_hits,
+            'agreement_with_labels': rule_label / rule_hits if rule_hits else 0.0,
+            'agreement_with_model': rule_model / rule_hits if rule_hits else 0.0
+        },
+        'failures': failures
+    }
+
+
+def run_benchmark(decodings, quantize_modes, repeat=1, fast_path=False, with_caches=False, corpus_path=CORPUS_PATH):
+    corpus = load_corpus(corpus_path)
+    runs = []
+    for quantize in quantize_modes:
+        ai = RoboticsAI(quantize=quantize, fast_path=fast_path)
+        if not with_caches:
+            ai.prediction_cache = None
+            ai.encoder_cache = None
+        if not ai.load_model():
+            print(f"❌ Couldn't load the model (quantize={quantize})")
+            continue
+
+        for decoding in decodings:
+            print(f"Running {decoding}{' int8' if quantize else ''} on {len(corpus)} queries x {repeat}...")
+            result = run_mode(ai, corpus, decoding, repeat)
+            result.update(quantized=quantize, model_status=ai.model_status)
+            runs.append(result)
+
+    return {
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'corpus': os.path.basename(corpus_path),
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'device': 'cuda' if torch.cuda.is_available() else 'cpu',
+            'threads': torch.get_num_threads(),
+            'machine': platform.machine()
+        },
+        'settings': {'repeat': repeat, 'fast_path': fast_path, 'with_caches': with_caches},
+        'runs': runs
+    }
+
+
+def print_summary(report):
+    print("\n" + "=" * 88)
+    print(f"{'Mode':<22}{'Exact':>8}{'Fields':>8}{'JSON':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q/s':>10}")
+    print("-" * 88)
+    for run in report['runs']:
+        mode = run['decoding'] + (' int8' if run['quantized'] else '')
+        latency = run['latency_ms']
+        print(f"{mode:<22}{run['exact_match']:>8.1%}{run['field_accuracy']:>8.1%}{run['valid_json']:>8.1%}"
+              f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}{run['throughput_qps']:>10.2f}")
+    print("=" * 88)
+    for run in report['runs']:
+        fast_path = run['fast_path']
+        print(f"Fast path ({run['decoding']}{' int8' if run['quantized'] else ''}): {fast_path['hits']} of {run['queries']} queries parsed by the rules, "
+              f"{fast_path['agreement_with_labels']:.1%} identical to the label, {fast_path['agreement_with_model']:.1%} identical to the model")
+    if report['settings']['fast_path']:
+        print("⚠️ --fast-path: the model never sees the rule hits, the agreement with the model is not measured")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser accuracy and latency benchmark")
+    parser.add_argument('--decoding', nargs='+', default=['beam'], choices=DECODING_MODES)
+    parser.add_argument('--quantize', choices=['off', 'on', 'both'], default='off')
+    parser.add_argument('--repeat', type=int, default=1, help="Passes over the corpus for the latency figures")
+    parser.add_argument('--fast-path', action='store_true', help="Keep the rule-based fast path in front of the model")
+    parser.add_argument('--with-caches', action='store_true', help="Keep the prediction and encoder caches enabled")
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--output', help="Report path (default: benchmarks/results/parser_<timestamp>.json)")
+    args = parser.parse_args()
+
+    quantize_modes = {'off': [False], 'on': [True], 'both': [False, True]}[args.quantize]
+    report = run_benchmark(args.decoding, quantize_modes, args.repeat, args.fast_path, args.with_caches, args.corpus)
+    print_summary(report)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"parser_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"📄 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# =============================================================================
+# TEXT RENDERING OF THE CHAT RESULTS
+# =============================================================================
+#
+# Optional stage after chat_processing: turns a result object into the text the
+# chat shows. Clients that only need the numbers use result.to_dict() instead.
+
+import io
+
+import numpy as np
+import sympy as sp
+
+from chat_results import (MessageResult, ErrorResult, MatricesResult, DirectKinematicsResult,
+                          InverseKinematicsResult, JacobianResult, SimulationResult)
+from src import dh
+from src.metrics import span
+
+
+def _matrices_text(result, out):
+    for i, matrix in enumerate(result.matrices):
+        prefix = "\n" if i else ""
+        print(f"{prefix}Translation matrix T{i}{i + 1}:\n", matrix, file=out)
+
+    print(f"\nTranslation matrix T0{len(dh['sigma_i'])} :", file=out)
+    print(np.round(result.T0n, decimals=0).astype(int), file=out)
+
+
+def _direct_kinematics_text(result, out):
+    x_mgd, y_mgd, z_mgd = (round(value, 2) for value in result.position)
+    print("\nCoordinates of the end effector with those joint angles:", file=out)
+    print("x=", x_mgd, "\ny=", y_mgd, "\nz=", z_mgd, "\n", file=out)
+
+
+def _inverse_kinematics_text(result, out):
+    print("Solutions in degrees ( °)", file=out)
+    for i, solution in enumerate(result.solutions):
+        print(f"  Solution {i+1}: {np.round(np.degrees(solution), 2)}", file=out)
+
+
+def _jacobian_text(result, out):
+    J_text = np.array2string(result.J, formatter={'float_kind': lambda x: f"{x:7.1f}"})
+    if result.dX is None:
+        print("\nJacobian:", file=out)
+        print(J_text, file=out)
+        print("\nIf you would like to see the linear and angular velocities of the robot you must enter the joint velocities first.\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n", file=out)
+        return
+
+    q, (dq1, dq2, dq3) = result.q, result.dq
+    print("\nGeometric Jacobian:", file=out)
+    print(J_text, file=out)
+    dX_vert = sp.Matrix(np.round(np.array(result.dX).reshape(-1, 1), 1))
+    print("\nValues of the robot's linear and angular velocities for the requested configuration (", q[0], ",", q[1], ",", q[2], ") when applying dq1 =", dq1, ", dq2 =", dq2, ", dq3 =", dq3, file=out)
+    with span('processing.sympy_pprint'):
+        print(sp.pretty(dX_vert), file=out)
+
+
+def _simulation_text(result, out):
+    # Solo se listan las configuraciones cuando salen de la cinemática inversa
+    if result.from_position:
+        for i, angles_deg in enumerate(result.configurations):
+            print(f"  Solution {i+1}: {angles_deg}", file=out)
+
+
+FORMATTERS = {
+    MatricesResult: _matrices_text,
+    DirectKinematicsResult: _direct_kinematics_text,
+    InverseKinematicsResult: _inverse_kinematics_text,
+    JacobianResult: _jacobian_text,
+    SimulationResult: _simulation_text,
+    MessageResult: lambda result, out: print(result.message, file=out),
+    ErrorResult: lambda result, out: print(f"Error: {result.error}", file=out),
+}
+
+
+def format_text(result):
+    """Chat text of a result (notes first), built in a local buffer"""
+    if result is None:
+        return ""
+    out = io.StringIO()
+    for note in result.notes:
+        print(note, file=out)
+    FORMATTERS[type(result)](result, out)
+    return out.getvalue()
@@ -3,9 +3,13 @@ os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
 
 import math as m
 import numpy as np
-import sympy as sp
-from src import generate_transformation_matrices, matrice_Tn, bras_rob_model3D, mgi, mgd, Jacob_geo, MDD
+from src import generate_transformation_matrices, matrice_Tn, mgi, mgd, Jacob_geo, MDD
 from src import dh, Liaisons
+from src.Robot_repr import render_figure_html, render_figures_html
+from src.metrics import span
+from chat_results import (MessageResult, ErrorResult, MatricesResult, DirectKinematicsResult,
+                          InverseKinematicsResult, JacobianResult, SimulationResult)
+from chat_formatting import format_text
 
 ai_instance = None  # Variable para guardar la referencia al AI
 
@@ -183,15 +187,8 @@ def matrices_dh(parametros):
         q=[q1,q2,q3]
 
         transformation_matrices_show = generate_transformation_matrices(q, dh, round_p=(2, 1e-6))
-        print("Translation matrix T01:\n", transformation_matrices_show[0])
-        print("\nTranslation matrix T12:\n", transformation_matrices_show[1])
-        print("\nTranslation matrix T23:\n", transformation_matrices_show[2])
-        print("\nTranslation matrix T34:\n", transformation_matrices_show[3])
-
-        print(f"\nTranslation matrix T0{len(dh['sigma_i'])} :")
         matrice_T0Tn = matrice_Tn(dh, q)
-        matrice_T0Tn_rounded = np.round(matrice_T0Tn, decimals=0)
-        print(matrice_T0Tn_rounded.astype(int))
+        return MatricesResult(q=q, matrices=transformation_matrices_show, T0n=matrice_T0Tn)
 
     else:
         resultado_verificacion = verificar_angulos_en_logs()
@@ -209,10 +206,11 @@ def matrices_dh(parametros):
             
             # print(temp_parametros,"\n")
             # Llamar recursivamente con los parámetros del log
-            print(f"\nSorry I couldn't find any specified angles in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n")
-            direct_kine(temp_parametros)
+            result = direct_kine(temp_parametros)
+            result.notes.insert(0, f"\nSorry I couldn't find any specified angles in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n")
+            return result
         else:
-            print(f"\nSorry I couldn't find any specified angles in your present query or recent ones\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
+            return MessageResult(message=f"\nSorry I couldn't find any specified angles in your present query or recent ones\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
 
 def simulation(parametros):
     # CASO 1: Tenemos ángulos directamente
@@ -230,8 +228,8 @@ def simulation(parametros):
             q3 = round(m.degrees(q3), 2)
 
         q = [q1, q2, q3]
-        bras_rob_model3D(Liaisons, q, web_mode=True)
-        return  # ✅ IMPORTANTE: salir después de ejecutar
+        # La figura se serializa aparte (render_simulation)
+        return SimulationResult(configurations=[q])
     
     # CASO 2: Tenemos coordenadas de posición del efector
     elif ("posicion_efector" in parametros and
@@ -254,13 +252,11 @@ def simulation(parametros):
             z=z*1000
                 
         Xd = [x, y, z]
-        sol = mgi(Xd, Liaisons)
+        with span('kinematics.mgi'):
+            sol = mgi(Xd, Liaisons)
 
-        for i, solution in enumerate(sol):
-            angles_deg = np.degrees(solution)
-            print(f"  Solution {i+1}: {angles_deg}")
-            bras_rob_model3D(Liaisons, angles_deg, web_mode=True)
-        return  # ✅ IMPORTANTE: salir después de ejecutar
+        configurations = [np.degrees(solution) for solution in sol]
+        return SimulationResult(configurations=configurations, from_position=True)
     
     # CASO 3: No tenemos datos directos - buscar en logs
     else:
@@ -281,8 +277,7 @@ def simulation(parametros):
                     'unidad_angular': resultado_verificacion_ang['angular_unit']
                 }
                 
-                print(f"\nSorry I couldn't find any specified angles in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n")
-                simulation(temp_parametros)
+                note = f"\nSorry I couldn't find any specified angles in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n"
                 
             else:
                 # Coordenadas son más recientes
@@ -298,8 +293,7 @@ def simulation(parametros):
                     }
                 }
                 
-                print(f"\nSorry I couldn't find any specified coordinates in your query\nSo I used the ones you talked about recently; x={coord_from_log['x']}{resultado_verificacion_coord['position_unit']}, y={coord_from_log['y']}{resultado_verificacion_coord['position_unit']}, z={coord_from_log['z']}{resultado_verificacion_coord['position_unit']}\nType 'help' or 'h' if you need some guidance\n")
-                simulation(temp_parametros)
+                note = f"\nSorry I couldn't find any specified coordinates in your query\nSo I used the ones you talked about recently; x={coord_from_log['x']}{resultado_verificacion_coord['position_unit']}, y={coord_from_log['y']}{resultado_verificacion_coord['position_unit']}, z={coord_from_log['z']}{resultado_verificacion_coord['position_unit']}\nType 'help' or 'h' if you need some guidance\n"
 
         # Subcase 3.2: Solo tenemos ángulos
         elif resultado_verificacion_ang["found"] and not resultado_verificacion_coord["found"]:
@@ -312,8 +306,7 @@ def simulation(parametros):
                 'unidad_angular': resultado_verificacion_ang['angular_unit']
             }
             
-            print(f"\nSorry I couldn't find any specified angles in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n")
-            simulation(temp_parametros)
+            note = f"\nSorry I couldn't find any specified angles in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n"
 
         # Subcase 3.3: Solo tenemos coordenadas
         elif not resultado_verificacion_ang["found"] and resultado_verificacion_coord["found"]:
@@ -328,15 +321,17 @@ def simulation(parametros):
                 }
             }
             
-            print(f"\nSorry I couldn't find any specified coordinates in your query\nSo I used the ones you talked about recently; x={coord_from_log['x']}{resultado_verificacion_coord['position_unit']}, y={coord_from_log['y']}{resultado_verificacion_coord['position_unit']}, z={coord_from_log['z']}{resultado_verificacion_coord['position_unit']}\nType 'help' or 'h' if you need some guidance\n")
-            simulation(temp_parametros)
+            note = f"\nSorry I couldn't find any specified coordinates in your query\nSo I used the ones you talked about recently; x={coord_from_log['x']}{resultado_verificacion_coord['position_unit']}, y={coord_from_log['y']}{resultado_verificacion_coord['position_unit']}, z={coord_from_log['z']}{resultado_verificacion_coord['position_unit']}\nType 'help' or 'h' if you need some guidance\n"
 
         # Subcase 3.4: No tenemos nada
         else:
-            print(f"\nSorry, I couldn't find angles or coordinates in your query or recent history.")
-            print("Type 'help' or 'h' for guidance on how to specify simulation parameters.")
-            print("Or re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
-            return  # ✅ IMPORTANTE: salir sin recursión
+            return MessageResult(message="\nSorry, I couldn't find angles or coordinates in your query or recent history.\n"
+                                         "Type 'help' or 'h' for guidance on how to specify simulation parameters.\n"
+                                         "Or re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
+
+        result = simulation(temp_parametros)
+        result.notes.insert(0, note)
+        return result
         
 
 def direct_kine(parametros):
@@ -359,12 +354,9 @@ def direct_kine(parametros):
 
         q=[q1,q2,q3]
 
-        Xd_mgd = mgd(q, Liaisons)
-        x_mgd = round(Xd_mgd[0],2)
-        y_mgd = round(Xd_mgd[1],2)
-        z_mgd = round(Xd_mgd[2],2)
-        print("\nCoordinates of the end effector with those joint angles:")  
-        print("x=", x_mgd, "\ny=", y_mgd, "\nz=", z_mgd, "\n")
+        with span('kinematics.mgd'):
+            Xd_mgd = mgd(q, Liaisons)
+        return DirectKinematicsResult(q=q, position=Xd_mgd)
     
     else:
         resultado_verificacion = verificar_angulos_en_logs()
@@ -382,10 +374,11 @@ def direct_kine(parametros):
             
             # print(temp_parametros,"\n")
             # Llamar recursivamente con los parámetros del log
-            print(f"\nSorry I couldn't find any specified angles in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n")
-            direct_kine(temp_parametros)
+            result = direct_kine(temp_parametros)
+            result.notes.insert(0, f"\nSorry I couldn't find any specified angles in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n")
+            return result
         else:
-            print(f"\nSorry I couldn't find any specified angles in your present query or recent ones\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
+            return MessageResult(message=f"\nSorry I couldn't find any specified angles in your present query or recent ones\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
 
         
 
@@ -410,13 +403,10 @@ def invert_kine(parametros):
             z=z*1000
                 
         Xd = [x, y, z]
-        sol = mgi(Xd, Liaisons)
+        with span('kinematics.mgi'):
+            sol = mgi(Xd, Liaisons)
 
-        print("Solutions in degrees ( °)")
-        for i, solution in enumerate(sol):
-            angles_deg = np.degrees(solution)
-            angles_rounded = np.round(angles_deg, 2)
-            print(f"  Solution {i+1}: {angles_rounded}")
+        return InverseKinematicsResult(target=Xd, solutions=sol)
 
     else:
         resultado_verificacion = verificar_coordenadas_en_logs()
@@ -433,10 +423,11 @@ def invert_kine(parametros):
             
             # print(temp_parametros,"\n")
             # Llamar recursivamente con los parámetros del log
-            print(f"\nSorry I couldn't find any specified coordinates in your query\nSo I used the ones you talked about recently; x={coord_from_log['x']}{resultado_verificacion['position_unit']}, y={coord_from_log['y']}{resultado_verificacion['position_unit']}, z={coord_from_log['z']}{resultado_verificacion['position_unit']}\nType 'help' or 'h' if you need some guidance\n")
-            invert_kine(temp_parametros)
+            result = invert_kine(temp_parametros)
+            result.notes.insert(0, f"\nSorry I couldn't find any specified coordinates in your query\nSo I used the ones you talked about recently; x={coord_from_log['x']}{resultado_verificacion['position_unit']}, y={coord_from_log['y']}{resultado_verificacion['position_unit']}, z={coord_from_log['z']}{resultado_verificacion['position_unit']}\nType 'help' or 'h' if you need some guidance\n")
+            return result
         else:
-            print(f"\nSorry I couldn't find any specified coordinates in your present query or recent ones\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
+            return MessageResult(message=f"\nSorry I couldn't find any specified coordinates in your present query or recent ones\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
 
 
 def jacobiano(parametros):
@@ -470,14 +461,10 @@ def jacobiano(parametros):
         
         transformation_matrices_calc = generate_transformation_matrices(q, dh, round_p=(5, 1e-6))
         J_geo = Jacob_geo(transformation_matrices_calc)
-        print("\nGeometric Jacobian:")
-        print(np.array2string(J_geo, formatter={'float_kind': lambda x: f"{x:7.1f}"}))
 
         dq = [dq1, dq2, dq3]
         dX = MDD(dq, J_geo)
-        dX_vert = sp.Matrix(np.round(np.array(dX).reshape(-1, 1), 1))
-        print("\nValues of the robot's linear and angular velocities for the requested configuration (", q[0], ",", q[1], ",", q[2], ") when applying dq1 =", dq1, ", dq2 =", dq2, ", dq3 =", dq3)
-        sp.pprint(dX_vert)
+        return JacobianResult(q=q, J=J_geo, dq=dq, dX=dX)
 
     elif((parametros["q1"] != "" and parametros["q1"] is not None and
           parametros["q2"] != "" and parametros["q2"] is not None and
@@ -503,9 +490,7 @@ def jacobiano(parametros):
         
         transformation_matrices_calc = generate_transformation_matrices(q, dh, round_p=(5, 1e-6))
         J_geo = Jacob_geo(transformation_matrices_calc)
-        print("\nJacobian:")
-        print(np.array2string(J_geo, formatter={'float_kind': lambda x: f"{x:7.1f}"}))
-        print("\nIf you would like to see the linear and angular velocities of the robot you must enter the joint velocities first.\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
+        return JacobianResult(q=q, J=J_geo)
 
     elif((parametros["q1"] == "" or parametros["q1"] is None and
           parametros["q2"] == "" or parametros["q2"] is None and
@@ -531,11 +516,12 @@ def jacobiano(parametros):
             
             # print(temp_parametros,"\n")
             # Llamar recursivamente con los parámetros del log
-            print(f"\nSorry I couldn't find any specified angles in your query\nSo I used the ones you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n")
-            jacobiano(temp_parametros)
+            result = jacobiano(temp_parametros)
+            result.notes.insert(0, f"\nSorry I couldn't find any specified angles in your query\nSo I used the ones you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance\n")
+            return result
         
         else:
-            print("Sorry, I couldn't find any angles specified nether in your query nor your most recent ones...\nRemember that to calculate de Jacobian to specify the angles is necessary\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
+            return MessageResult(message="Sorry, I couldn't find any angles specified nether in your query nor your most recent ones...\nRemember that to calculate de Jacobian to specify the angles is necessary\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
 
     else:
         resultado_verificacion = verificar_angulos_en_logs()
@@ -557,35 +543,60 @@ def jacobiano(parametros):
             
             # print(temp_parametros,"\n")
             # Llamar recursivamente con los parámetros del log
-            print(f"\nSorry I couldn't find any specified angles nor joint velocities in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance")
-            jacobiano(temp_parametros)
+            result = jacobiano(temp_parametros)
+            result.notes.insert(0, f"\nSorry I couldn't find any specified angles nor joint velocities in your query\nSo I used the angles you talked about recently; q1={angles_from_log['q1']}°, q2={angles_from_log['q2']}°, q2={angles_from_log['q3']}°\nType 'help' or 'h' if you need some guidance")
+            return result
         else:
-            print(f"\nSorry I couldn't find any specified angles nor joint velocities in your present query or recent ones\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
+            return MessageResult(message=f"\nSorry I couldn't find any specified angles nor joint velocities in your present query or recent ones\nType 'help' or 'h' if you need some guidance\nOr re-phrase the sentence, remember that for the moment I'am a quite limited model, sorry for the inconvenience...\n")
 
-def processing(prediction, error):
+HANDLERS = {
+    "matrices_transformacion": matrices_dh,
+    "simulacion_3d": simulation,
+    "cinematica_directa": direct_kine,
+    "cinematica_inversa": invert_kine,
+    "jacobiano": jacobiano
+}
 
-    if error:
-        print(f"Error: {error}")
+def render_simulation(result):
+    """
+    Serializa las figuras de un SimulationResult en result.payloads
+    (la figura se devuelve en el resultado, sin estado global compartido entre peticiones).
+    """
+    if result.from_position:
+        if result.configurations:
+            # Todas las soluciones se renderizan juntas (FK vectorizada + serialización en paralelo)
+            result.payloads = render_figures_html(Liaisons, np.array(result.configurations))
     else:
-        # print("✅ Predicción obtenida:")
-        # print(prediction)
-        operacion = prediction["operacion"]
-        parametros = prediction["parametros"]
-        
-        if operacion == "matrices_transformacion":
-            matrices_dh(parametros)
-        
-        if operacion == "simulacion_3d":
-            simulation(parametros)
-        
-        if operacion == "cinematica_directa":
-            direct_kine(parametros)
+        result.payloads = [render_figure_html(Liaisons, result.configurations[0], include_plotlyjs='cdn')]
+    return result
 
-        if operacion == "cinematica_inversa":
-            invert_kine(parametros)
+def process(prediction, error, render_figures=True):
+    """
+    Ejecuta la operación de la predicción y devuelve su resultado (chat_results),
+    sin generar texto; el texto lo produce chat_formatting.format_text.
+
+    render_figures=False deja las figuras de las simulaciones sin serializar,
+    para enviarlas después con render_simulation (respuestas por streaming).
+    """
+    if error:
+        return ErrorResult(error=error)
 
-        if operacion == "jacobiano":
-            jacobiano(parametros)
+    operacion = prediction["operacion"]
+    parametros = prediction["parametros"]
+
+    handler = HANDLERS.get(operacion)
+    if handler is None:
+        return None
+
+    with span(f'processing.{operacion}'):
+        result = handler(parametros)
+        if render_figures and isinstance(result, SimulationResult):
+            render_simulation(result)
+        return result
+
+def processing(prediction, error):
+    """Versión de consola: ejecuta la operación e imprime su texto"""
+    print(format_text(process(prediction, error)), end="")
 
 if __name__=="__main__":
     from model_chat import RoboticsAI
@@ -0,0 +1,98 @@
+# =============================================================================
+# TYPED RESULTS OF THE CHAT OPERATIONS
+# =============================================================================
+
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+
+
+def to_plain(value):
+    """numpy arrays and scalars -> lists and Python numbers (JSON serializable)"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    return value
+
+
+@dataclass(kw_only=True)
+class ChatResult:
+    """
+    Result of one chat operation. The handlers of chat_processing return these
+    objects; turning them into text is left to chat_formatting.
+    """
+    kind = 'result'
+
+    # Notices shown before the result (e.g. angles taken from a previous query)
+    notes: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {'type': self.kind, **{f.name: to_plain(getattr(self, f.name)) for f in fields(self)}}
+
+
+@dataclass
+class MessageResult(ChatResult):
+    """No result: the parameters were missing from the query and from the log"""
+    kind = 'message'
+    message: str
+
+
+@dataclass
+class ErrorResult(ChatResult):
+    """The prediction failed"""
+    kind = 'error'
+    error: str
+
+
+@dataclass
+class MatricesResult(ChatResult):
+    kind = 'matrices_transformacion'
+    q: list  # Joint angles (degrees)
+    matrices: list  # T(i, i+1), rounded to 2 decimals
+    T0n: np.ndarray
+
+
+@dataclass
+class DirectKinematicsResult(ChatResult):
+    kind = 'cinematica_directa'
+    q: list  # Joint angles (degrees)
+    position: np.ndarray  # [x, y, z] (mm)
+
+
+@dataclass
+class InverseKinematicsResult(ChatResult):
+    kind = 'cinematica_inversa'
+    target: list  # [x, y, z] (mm)
+    solutions: list  # [q1, q2, q3] of each solution (radians)
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['solutions_deg'] = [np.degrees(solution).tolist() for solution in self.solutions]
+        return data
+
+
+@dataclass
+class JacobianResult(ChatResult):
+    kind = 'jacobiano'
+    q: list  # Joint angles (degrees)
+    J: np.ndarray  # Geometric Jacobian (6x3)
+    dq: list = None  # Joint velocities, when given
+    dX: np.ndarray = None  # Linear and angular velocities MDD(dq, J)
+
+
+@dataclass
+class SimulationResult(ChatResult):
+    kind = 'simulacion_3d'
+    configurations: list  # Joint angles (degrees) of each figure
+    payloads: list = field(default_factory=list, repr=False)  # Serialized figures (see Robot_repr.simulations_html)
+    from_position: bool = False  # The configurations are the IK solutions of a position
+
+    def to_dict(self):
+        data = super().to_dict()
+        data.pop('payloads')
+        return data
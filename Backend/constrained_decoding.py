@@ -0,0 +1,428 @@
+# =============================================================================
+# GRAMMAR-CONSTRAINED JSON DECODING FOR THE COMMAND PARSER
+# =============================================================================
+
+from collections import namedtuple
+
+import torch
+from transformers import LogitsProcessor
+
+from decoding import COMMAND_SCHEMA, OPTIONAL_PARAMETERS
+
+OPERATIONS = tuple(COMMAND_SCHEMA)
+
+# Units are restricted to the values chat_processing understands ("" = not given)
+ENUM_VALUES = {
+    'operacion': OPERATIONS,
+    'unidad_angular': ('grados', 'radianes', ''),
+    'unidad_posicion': ('mm', 'cm', 'm', ''),
+}
+
+HEX_DIGITS = set('0123456789abcdefABCDEF')
+
+# Longest string or number value, so a looping model is forced to close it
+MAX_VALUE_LENGTH = 48
+
+# Memoized token masks (one per parser state signature, vocabulary-sized booleans)
+MAX_CACHED_MASKS = 256
+
+# Parser state of the generated text:
+#   mode: what is expected next (value, obj_start, key, colon, string, enum, number, null,
+#         after_value, after_comma, done)
+#   stack: open objects, as (spec, seen keys, optional keys) tuples
+#   op: parsed 'operacion' (selects the 'parametros' schema)
+#   buf: characters of the current key / enum / number / escape sequence
+#   key: key whose value is being parsed
+#   space_ok: a single space is allowed here (after ':' and ',')
+#   expect: spec of the value being parsed (dict = object, tuple = enum, None = free value)
+#   size: characters of the current string value
+State = namedtuple('State', 'mode stack op buf key space_ok expect size')
+
+TOP_SPEC = {'operacion': OPERATIONS, 'parametros': {}}
+INITIAL_STATE = State('value', (), None, '', None, False, TOP_SPEC, 0)
+
+
+def _allowed_keys(state):
+    spec, seen, _ = state.stack[-1]
+    if spec is TOP_SPEC:
+        # 'operacion' always first, it selects the schema of 'parametros'
+        return [key for key in ('operacion', 'parametros') if key not in seen][:1]
+    return [key for key in spec if key not in seen]
+
+
+def _can_close(state):
+    spec, seen, optional = state.stack[-1]
+    return all(key in seen or key in optional for key in spec)
+
+
+def _child_spec(state, key):
+    spec = state.stack[-1][0]
+    if spec is TOP_SPEC:
+        return OPERATIONS if key == 'operacion' else COMMAND_SCHEMA[state.op]
+    if spec[key] is None and key in ENUM_VALUES:
+        return ENUM_VALUES[key]
+    return spec[key]
+
+
+def _close_value(state, value=None):
+    """A value has been completed: back to the enclosing object"""
+    op = value if state.key == 'operacion' else state.op
+    if not state.stack:
+        return state._replace(mode='done', op=op, buf='')
+    return state._replace(mode='after_value', op=op, buf='', space_ok=False)
+
+
+def advance(state, ch):
+    """Feed one character; returns the new state or None if the character is not allowed"""
+    mode = state.mode
+
+    if mode == 'value':
+        if ch == ' ' and state.space_ok:
+            return state._replace(space_ok=False)
+        expect = state.expect
+        if isinstance(expect, dict):
+            if ch != '{':
+                return None
+            optional = frozenset(OPTIONAL_PARAMETERS.get(state.op, ()) if expect is COMMAND_SCHEMA.get(state.op) else ())
+            return state._replace(mode='obj_start', stack=state.stack + ((expect, frozenset(), optional),),
+                                  space_ok=False)
+        if isinstance(expect, tuple):
+            return state._replace(mode='enum', buf='', space_ok=False) if ch == '"' else None
+        if ch == '"':
+            return state._replace(mode='string', buf='', space_ok=False, size=0)
+        if ch == '-' or ch.isdigit():
+            return state._replace(mode='number', buf=ch, space_ok=False)
+        if ch == 'n':
+            return state._replace(mode='null', buf='n', space_ok=False)
+        return None
+
+    if mode == 'obj_start':
+        if ch == '"' and _allowed_keys(state):
+            return state._replace(mode='key', buf='')
+        if ch == '}' and _can_close(state):
+            return _close_value(state._replace(stack=state.stack[:-1], key=None))
+        return None
+
+    if mode == 'key':
+        keys = _allowed_keys(state)
+        if ch == '"':
+            if state.buf not in keys:
+                return None
+            spec, seen, optional = state.stack[-1]
+            stack = state.stack[:-1] + ((spec, seen | {state.buf}, optional),)
+            return state._replace(mode='colon', stack=stack, key=state.buf, buf='')
+        buf = state.buf + ch
+        return state._replace(buf=buf) if any(key.startswith(buf) for key in keys) else None
+
+    if mode == 'colon':
+        if ch != ':':
+            return None
+        return state._replace(mode='value', space_ok=True, expect=_child_spec(state, state.key))
+
+    if mode == 'string':
+        escape = state.buf
+        if escape == '' and ch == '"':
+            return _close_value(state)
+        if state.size >= MAX_VALUE_LENGTH:
+            return None
+        size = state.size + 1
+        if escape == '':
+            if ch == '\\':
+                return state._replace(buf='\\', size=size)
+            return state._replace(size=size) if ch >= ' ' else None
+        if escape == '\\':
+            if ch == 'u':
+                return state._replace(buf='u', size=size)
+            return state._replace(buf='', size=size) if ch in '"\\/bfnrt' else None
+        # Unicode escape \uXXXX
+        if ch not in HEX_DIGITS:
+            return None
+        return state._replace(buf='' if len(escape) == 4 else escape + ch, size=size)
+
+    if mode == 'enum':
+        if ch == '"':
+            return _close_value(state, state.buf) if state.buf in state.expect else None
+        buf = state.buf + ch
+        return state._replace(buf=buf) if any(value.startswith(buf) for value in state.expect) else None
+
+    if mode == 'number':
+        # JSON number: -?int(.digits)?([eE][+-]?digits)?
+        buf = state.buf
+        exponent = 'e' in buf or 'E' in buf
+        if len(buf) >= MAX_VALUE_LENGTH and ch not in ',}':
+            return None
+        if ch.isdigit() and (exponent or buf not in ('0', '-0')):
+            return state._replace(buf=buf + ch)
+        if ch == '.' and '.' not in buf and not exponent and buf[-1].isdigit():
+            return state._replace(buf=buf + ch)
+        if ch in 'eE' and not exponent and buf[-1].isdigit():
+            return state._replace(buf=buf + ch)
+        if ch in '+-' and buf[-1] in 'eE':
+            return state._replace(buf=buf + ch)
+        if ch in ',}' and buf[-1].isdigit():
+            return advance(_close_value(state), ch)
+        return None
+
+    if mode == 'null':
+        buf = state.buf + ch
+        if not 'null'.startswith(buf):
+            return None
+        return _close_value(state) if buf == 'null' else state._replace(buf=buf)
+
+    if mode == 'after_value':
+        if ch == ',' and _allowed_keys(state):
+            return state._replace(mode='after_comma', space_ok=True)
+        if ch == '}' and _can_close(state):
+            return _close_value(state._replace(stack=state.stack[:-1], key=None))
+        return None
+
+    if mode == 'after_comma':
+        if ch == ' ' and state.space_ok:
+            return state._replace(space_ok=False)
+        return state._replace(mode='key', buf='') if ch == '"' and _allowed_keys(state) else None
+
+    return None  # done
+
+
+def advance_text(state, text):
+    for ch in text:
+        state = advance(state, ch)
+        if state is None:
+            return None
+    return state
+
+
+def next_chars(state):
+    """
+    Characters allowed next, or None when there are too many to list
+    (free strings, numbers, values)
+    """
+    mode = state.mode
+    if mode in ('key', 'enum'):
+        options = _allowed_keys(state) if mode == 'key' else state.expect
+        chars = {option[len(state.buf)] for option in options
+                 if option.startswith(state.buf) and len(option) > len(state.buf)}
+        if state.buf in options:
+            chars.add('"')
+        return chars
+    if mode == 'colon':
+        return {':'}
+    if mode == 'null':
+        return {'null'[len(state.buf)]}
+    if mode in ('obj_start', 'after_value', 'after_comma'):
+        return {ch for ch in ' ",}' if advance(state, ch) is not None}
+    if mode == 'value' and isinstance(state.expect, (dict, tuple)):
+        return {ch for ch in ' {"' if advance(state, ch) is not None}
+    if mode == 'done':
+        return set()
+    return None
+
+
+def forced_text(state):
+    """Characters fully determined by the grammar from this state (structural tokens, key/enum endings)"""
+    text = ''
+    while True:
+        chars = next_chars(state)
+        if chars is None or len(chars) != 1:
+            return text, state
+        ch = chars.pop()
+        text += ch
+        state = advance(state, ch)
+
+
+class TokenConstraint:
+    """
+    Maps the character grammar onto the tokenizer vocabulary.
+    The vocabulary is stored as a trie so only the tokens compatible with the
+    current state are visited.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.eos_token_id = tokenizer.eos_token_id
+        self.vocab_size = len(tokenizer)
+
+        special = set(tokenizer.all_special_ids)
+        self.token_strings = {}
+        self.trie = {}
+        plain = torch.zeros(self.vocab_size, dtype=torch.bool)
+        lengths = torch.full((self.vocab_size,), MAX_VALUE_LENGTH + 1)
+        self.special_string_tokens = []
+
+        for token_id in range(self.vocab_size):
+            if token_id in special:
+                continue
+            text = tokenizer.decode([token_id], clean_up_tokenization_spaces=False)
+            if not text:
+                continue
+            self.token_strings[token_id] = text
+            lengths[token_id] = len(text)
+            node = self.trie
+            for ch in text:
+                node = node.setdefault(ch, {})
+            node.setdefault(None, []).append(token_id)
+
+            # Tokens that can never end or escape a string are valid anywhere inside one
+            if '"' in text or '\\' in text or any(ch < ' ' for ch in text):
+                self.special_string_tokens.append(token_id)
+            else:
+                plain[token_id] = True
+        self.plain_string_mask = plain
+        self.token_lengths = lengths
+        self._masks = {}
+
+    def allowed_mask(self, state):
+        """Boolean mask over the vocabulary of the tokens that keep the output valid"""
+        # The same parser states come back on every request, their masks are memoized
+        signature = (state.mode, state.op, state.buf, state.key, state.space_ok, state.size, id(state.expect),
+                     tuple((id(spec), seen, optional) for spec, seen, optional in state.stack))
+        mask = self._masks.get(signature)
+        if mask is None:
+            mask = self._compute_mask(state)
+            if len(self._masks) >= MAX_CACHED_MASKS:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[signature] = mask
+        return mask
+
+    def _compute_mask(self, state):
+        mask = torch.zeros(self.vocab_size, dtype=torch.bool)
+        if state.mode == 'done':
+            mask[self.eos_token_id] = True
+            return mask
+
+        if state.mode == 'string' and state.buf == '':
+            mask |= self.plain_string_mask & (self.token_lengths <= MAX_VALUE_LENGTH - state.size)
+            for token_id in self.special_string_tokens:
+                if advance_text(state, self.token_strings[token_id]) is not None:
+                    mask[token_id] = True
+            return mask
+
+        # Depth-first walk of the vocabulary trie, pruning on the first rejected character
+        pending = [(self.trie, state)]
+        while pending:
+            node, node_state = pending.pop()
+            for ch, child in node.items():
+                if ch is None:
+                    mask[child] = True
+                    continue
+                child_state = advance(node_state, ch)
+                if child_state is not None:
+                    pending.append((child, child_state))
+        return mask
+
+    def advance_token(self, state, token_id):
+        text = self.token_strings.get(token_id)
+        return None if text is None else advance_text(state, text)
+
+    def forced_tokens(self, state):
+        """
+        Token ids of the forced continuation of this state, with the resulting state.
+        The forced text is split by walking the vocabulary trie (longest token at each
+        position), never by re-encoding it: the tokenizer could split a fragment of the
+        output differently from how it appears in the whole outputs the model was trained on.
+        Stops early if no token matches the rest of the text.
+        """
+        text, _ = forced_text(state)
+        token_ids = []
+        position = 0
+        while position < len(text):
+            node, longest = self.trie, None
+            for end in range(position, len(text)):
+                node = node.get(text[end])
+                if node is None:
+                    break
+                if None in node:
+                    longest = (end + 1, node[None][0])
+            if longest is None:
+                break
+            position, token_id = longest
+            token_ids.append(token_id)
+        if not token_ids:
+            return [], state
+        return token_ids, advance_text(state, text[:position])
+
+
+class JsonSchemaLogitsProcessor(LogitsProcessor):
+    """
+    Masks the logits at every step so only tokens valid under the command JSON
+    schema can be generated. Works with batched greedy and beam decoding.
+    """
+
+    def __init__(self, constraint, decoder_start_token_id):
+        self.constraint = constraint
+        self.decoder_start_token_id = decoder_start_token_id
+        self._states = {(): INITIAL_STATE}
+
+    def _state(self, prefix):
+        state = self._states.get(prefix)
+        if state is None and prefix not in self._states:
+            parent = self._state(prefix[:-1])
+            state = None if parent is None else self.constraint.advance_token(parent, prefix[-1])
+            self._states[prefix] = state
+        return state
+
+    def __call__(self, input_ids, scores):
+        for row, ids in enumerate(input_ids.tolist()):
+            if self.constraint.eos_token_id in ids:
+                continue  # Finished sequence, only padding follows
+            state = self._state(tuple(ids[1:]))
+            if state is None:
+                continue
+            mask = self.constraint.allowed_mask(state).to(scores.device)
+            if not mask.any():
+                mask = mask.clone()
+                mask[self.constraint.eos_token_id] = True
+            scores[row] = scores[row].masked_fill(~mask, float('-inf'))
+        return scores
+
+
+def constrained_greedy(model, inputs, constraint, max_length, decoder_start_token_id, encoder_outputs=None):
+    """
+    Greedy decoding of a single input under the grammar. The tokens forced by
+    the grammar are appended without a model step of their own: they are fed
+    together with the next chosen token in one decoder forward pass.
+
+    Args:
+        encoder_outputs: optional precomputed encoder outputs of the input.
+
+    Returns:
+        list: generated token ids (without the decoder start token).
+    """
+    if encoder_outputs is None:
+        encoder_outputs = model.get_encoder()(**inputs)
+    device = inputs['input_ids'].device
+
+    # The opening '{"operacion":' is already fixed by the grammar
+    generated, state = constraint.forced_tokens(INITIAL_STATE)
+    pending = [decoder_start_token_id] + generated
+    past_key_values = None
+
+    while len(generated) < max_length - 1:
+        outputs = model(
+            encoder_outputs=encoder_outputs,
+            attention_mask=inputs['attention_mask'],
+            decoder_input_ids=torch.tensor([pending], device=device),
+            past_key_values=past_key_values,
+            use_cache=True
+        )
+        past_key_values = outputs.past_key_values
+        logits = outputs.logits[0, -1]
+
+        mask = constraint.allowed_mask(state).to(logits.device)
+        if not mask.any():
+            break
+        token_id = int(logits.masked_fill(~mask, float('-inf')).argmax())
+        generated.append(token_id)
+        if token_id == constraint.eos_token_id:
+            break
+
+        state = constraint.advance_token(state, token_id)
+        forced, state = constraint.forced_tokens(state)
+        generated.extend(forced)
+        pending = [token_id] + forced
+
+        if state.mode == 'done':
+            generated.append(constraint.eos_token_id)  # Nothing else can follow a closed object
+            break
+
+    return generated
@@ -0,0 +1,244 @@
+# =============================================================================
+# DECODING HELPERS FOR THE COMMAND PARSER
+# =============================================================================
+
+import json
+import threading
+import time
+
+import torch
+from transformers import LogitsProcessor, StoppingCriteria
+
+from src import metrics
+
+# Parameters of each operation in the model's output format: the keys that
+# chat_processing reads, plus jacobiano's 'unidad_velocidad', which the model
+# always emits (velocities are in rad/s) but no handler reads. The constrained
+# decoding mode forces these keys, so they must match the training outputs.
+# None is a leaf value, a dict is a nested object.
+ANGLES = {'q1': None, 'q2': None, 'q3': None, 'unidad_angular': None}
+POSITION = {'x': None, 'y': None, 'z': None, 'unidad_posicion': None}
+
+COMMAND_SCHEMA = {
+    'matrices_transformacion': dict(ANGLES),
+    'cinematica_directa': dict(ANGLES),
+    'cinematica_inversa': {'posicion_objetivo': dict(POSITION)},
+    'jacobiano': dict(ANGLES, q1_dot=None, q2_dot=None, q3_dot=None, unidad_velocidad=None),
+    'simulacion_3d': dict(ANGLES, posicion_efector=dict(POSITION)),
+}
+
+# Parameters that may be missing (simulation accepts either angles or a position)
+OPTIONAL_PARAMETERS = {
+    'simulacion_3d': {'q1', 'q2', 'q3', 'unidad_angular', 'posicion_efector'},
+}
+
+
+def _matches(value, spec, optional=()):
+    if spec is None:
+        return not isinstance(value, (dict, list))
+    if not isinstance(value, dict):
+        return False
+    for key, child in spec.items():
+        if key not in value:
+            if key in optional:
+                continue
+            return False
+        if not _matches(value[key], child):
+            return False
+    return True
+
+
+def validate_command(command):
+    """
+    Check that a parsed prediction has a known 'operacion' and every
+    'parametros' key of COMMAND_SCHEMA for it.
+    """
+    if not isinstance(command, dict):
+        return False
+    operacion = command.get('operacion')
+    if operacion not in COMMAND_SCHEMA:
+        return False
+    return _matches(command.get('parametros'), COMMAND_SCHEMA[operacion], OPTIONAL_PARAMETERS.get(operacion, ()))
+
+
+def is_valid_output(text):
+    """True if the generated text is JSON that satisfies the command schema"""
+    try:
+        return validate_command(json.loads(text))
+    except json.JSONDecodeError:
+        return False
+
+
+class JsonObjectTracker:
+    """
+    Follows brace depth and string state on the decoded tokens of each sequence,
+    to know when a complete top-level JSON object has been produced.
+    States are cached per token prefix, so each step only scans the new token
+    (and beams that share a prefix share the work).
+    """
+
+    def __init__(self, tokenizer, token_texts=None):
+        """token_texts: optional dict token id -> text shared between trackers"""
+        self.tokenizer = tokenizer
+        self._texts = token_texts if token_texts is not None else {}
+        # (depth, in_string, escape, complete) after each prefix
+        self._states = {(): (0, False, False, False)}
+
+    def _text(self, token_id):
+        text = self._texts.get(token_id)
+        if text is None:
+            text = self.tokenizer.decode([token_id], skip_special_tokens=True, clean_up_tokenization_spaces=False)
+            self._texts[token_id] = text
+        return text
+
+    def _state(self, prefix):
+        state = self._states.get(prefix)
+        if state is None:
+            depth, in_string, escape, complete = self._state(prefix[:-1])
+            for ch in self._text(prefix[-1]):
+                if complete:
+                    break
+                if in_string:
+                    if escape:
+                        escape = False
+                    elif ch == '\\':
+                        escape = True
+                    elif ch == '"':
+                        in_string = False
+                elif ch == '"':
+                    in_string = True
+                elif ch == '{':
+                    depth += 1
+                elif ch == '}' and depth > 0:
+                    depth -= 1
+                    complete = depth == 0
+            state = (depth, in_string, escape, complete)
+            self._states[prefix] = state
+        return state
+
+    def is_complete(self, token_ids):
+        """Same as complete() for a single list of token ids"""
+        return self._state(tuple(token_ids))[3]
+
+    def complete(self, input_ids):
+        """Per-row booleans: the sequence already holds a complete top-level object"""
+        return [self._state(tuple(ids))[3] for ids in input_ids.tolist()]
+
+
+class JsonCompleteStoppingCriteria(StoppingCriteria):
+    """Ends each sequence as soon as its top-level JSON object is closed (greedy / batched decoding)"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.tensor(self.tracker.complete(input_ids), dtype=torch.bool, device=input_ids.device)
+
+
+class ForceEosOnCompleteJson(LogitsProcessor):
+    """
+    Beam search only stops when every beam is done, so instead of stopping the
+    beams whose object is closed, EOS is forced on them and they finish as hypotheses
+    """
+
+    def __init__(self, tracker, eos_token_id):
+        self.tracker = tracker
+        self.eos_token_id = eos_token_id
+
+    def __call__(self, input_ids, scores):
+        for row, complete in enumerate(self.tracker.complete(input_ids)):
+            if complete:
+                eos_score = scores[row, self.eos_token_id].clone()
+                scores[row] = float('-inf')
+                scores[row, self.eos_token_id] = eos_score if torch.isfinite(eos_score) else 0.0
+        return scores
+
+
+class DecodingStats:
+    """Per-mode latency and fallback counters (thread safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.modes = {}
+        self.fallbacks = 0
+        self.adaptive_requests = 0
+        self.speculation = {'passes': 0, 'tokens': 0, 'drafted': 0, 'accepted': 0}
+
+    def timed(self, mode):
+        return _Timer(self, mode)
+
+    def record(self, mode, seconds, sequences):
+        with self._lock:
+            entry = self.modes.setdefault(mode, {'calls': 0, 'sequences': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['sequences'] += sequences
+            entry['seconds'] += seconds
+
+    def record_fallbacks(self, requests, fallbacks):
+        with self._lock:
+            self.adaptive_requests += requests
+            self.fallbacks += fallbacks
+
+    def record_speculation(self, passes, tokens, drafted, accepted):
+        with self._lock:
+            self.speculation['passes'] += passes
+            self.speculation['tokens'] += tokens
+            self.speculation['drafted'] += drafted
+            self.speculation['accepted'] += accepted
+
+    def drain(self):
+        """Takes out the counters (picklable), leaving them at zero; see merge"""
+        with self._lock:
+            counters = {'modes': self.modes, 'fallbacks': self.fallbacks,
+                        'adaptive_requests': self.adaptive_requests, 'speculation': self.speculation}
+            self.modes = {}
+            self.fallbacks = 0
+            self.adaptive_requests = 0
+            self.speculation = dict.fromkeys(self.speculation, 0)
+        return counters
+
+    def merge(self, counters):
+        """Adds the counters drained in another process (the inference workers)"""
+        with self._lock:
+            for mode, other in counters['modes'].items():
+                entry = self.modes.setdefault(mode, {'calls': 0, 'sequences': 0, 'seconds': 0.0})
+                for key in entry:
+                    entry[key] += other[key]
+            self.fallbacks += counters['fallbacks']
+            self.adaptive_requests += counters['adaptive_requests']
+            for key in self.speculation:
+                self.speculation[key] += counters['speculation'][key]
+
+    def stats(self):
+        with self._lock:
+            speculation = dict(self.speculation)
+            speculation['acceptance_rate'] = speculation['accepted'] / speculation['drafted'] if speculation['drafted'] else 0.0
+            speculation['tokens_per_pass'] = speculation['tokens'] / speculation['passes'] if speculation['passes'] else 0.0
+            modes = {
+                mode: dict(entry, mean_latency=entry['seconds'] / entry['calls'])
+                for mode, entry in self.modes.items()
+            }
+            return {
+                'modes': modes,
+                'fallbacks': self.fallbacks,
+                'fallback_rate': self.fallbacks / self.adaptive_requests if self.adaptive_requests else 0.0,
+                'speculation': speculation
+            }
+
+
+class _Timer:
+    def __init__(self, stats, mode):
+        self.stats = stats
+        self.mode = mode
+        self.sequences = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.stats.record(self.mode, elapsed, self.sequences)
+        if metrics.enabled:
+            metrics.record(f'model.generate.{self.mode}', elapsed)
+        return False
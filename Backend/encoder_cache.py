@@ -0,0 +1,91 @@
+# =============================================================================
+# ENCODER OUTPUT CACHE
+# =============================================================================
+
+import threading
+from collections import OrderedDict
+
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+
+
+class EncoderOutputCache:
+    """
+    LRU cache of encoder hidden states keyed by the input token ids (without padding),
+    so re-decoding the same input (beam search fallback, another decoding mode, a
+    repeated query) skips the encoder pass.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, encoder, inputs):
+        """
+        Encoder outputs of a padded batch, running the encoder only on the rows not cached.
+        Padding positions are zeros (masked out by the attention mask).
+        """
+        input_ids, attention_mask = inputs['input_ids'], inputs['attention_mask']
+        keys = [tuple(ids[mask.bool()].tolist()) for ids, mask in zip(input_ids, attention_mask)]
+
+        with self._lock:
+            states = [self._entries.get(key) for key in keys]
+            for key, state in zip(keys, states):
+                if state is not None:
+                    self._entries.move_to_end(key)
+            missing = [row for row, state in enumerate(states) if state is None]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            length = int(attention_mask[missing].sum(dim=1).max())
+            with torch.no_grad():
+                hidden = encoder(input_ids=input_ids[missing, :length],
+                                 attention_mask=attention_mask[missing, :length]).last_hidden_state
+            with self._lock:
+                for i, row in enumerate(missing):
+                    # Copy, so the entry does not keep the whole batch tensor alive
+                    states[row] = hidden[i, :len(keys[row])].clone()
+                    self._store(keys[row], states[row])
+
+        batch = states[0].new_zeros((len(states), input_ids.shape[1], states[0].shape[-1]))
+        for row, state in enumerate(states):
+            batch[row, :state.shape[0]] = state
+        return BaseModelOutput(last_hidden_state=batch)
+
+    def _store(self, key, state):
+        self._entries[key] = state
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def drain_counters(self):
+        """(hits, misses) since the last call, leaving them at zero; the entries stay"""
+        with self._lock:
+            counters = (self.hits, self.misses)
+            self.hits = self.misses = 0
+        return counters
+
+    def merge_counters(self, counters):
+        """Adds the hits and misses of another process's cache (the inference workers)"""
+        with self._lock:
+            self.hits += counters[0]
+            self.misses += counters[1]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
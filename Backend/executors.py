@@ -0,0 +1,40 @@
+# =============================================================================
+# BOUNDED EXECUTOR FOR THE CPU-BOUND STAGES OF A REQUEST
+# =============================================================================
+#
+# Kinematics, result processing and figure serialization run in a fixed number
+# of threads, independent of the number of server threads handling connections.
+# The model itself runs in the inference scheduler thread or worker processes.
+# Without configure() (development server) the stages run on the request thread.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None
+_lock = threading.Lock()
+
+
+def configure(max_workers):
+    """Creates the CPU executor with max_workers threads"""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='robot-ai-cpu')
+
+
+def run_cpu(function, *args, **kwargs):
+    """Runs function in the CPU executor and waits for its result"""
+    executor = _executor
+    if executor is None:
+        return function(*args, **kwargs)
+    return executor.submit(function, *args, **kwargs).result()
+
+
+def shutdown(wait=True):
+    """Stops the executor once the submitted stages are done"""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
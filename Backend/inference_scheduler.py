@@ -0,0 +1,135 @@
+# =============================================================================
+# MICRO-BATCHING INFERENCE SCHEDULER
+# =============================================================================
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+
+class InferenceScheduler:
+    """
+    Single worker thread that owns the model.
+
+    Requests are queued by any thread with submit(); the worker collects them
+    for a few milliseconds (or until max_batch_size) and runs them as one padded
+    batch through generate_batch, then resolves the waiting futures.
+    """
+
+    def __init__(self, generate_batch, max_batch_size=8, max_wait_ms=5):
+        """
+        Args:
+            generate_batch: Callable list[str] -> list[str], only ever called from the worker thread.
+            max_batch_size: Maximum number of requests run in one batch.
+            max_wait_ms: How long the worker waits for more requests after the first one.
+        """
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._running = False
+        self._lock = threading.Lock()  # Orders submit against stop
+
+        self.batches = 0
+        self.requests = 0
+
+    def start(self):
+        with self._lock:
+            if self._worker is None:
+                self._running = True
+                self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+                self._worker.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker once the queued requests have been served. Requests still
+        queued when the worker ends (or after timeout) fail with RuntimeError.
+        """
+        with self._lock:
+            worker, self._worker = self._worker, None
+            if worker is None:
+                return
+            self._running = False
+            self._queue.put(None)
+        worker.join(timeout)
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("Inference scheduler stopped"))
+
+    def submit(self, user_input):
+        """Queue an input and return a Future resolved with the generated text (RuntimeError once stopped)"""
+        future = Future()
+        with self._lock:
+            if self._worker is None:
+                raise RuntimeError("Inference scheduler is not running")
+            self._queue.put((user_input, future))
+        return future
+
+    def generate(self, user_input, timeout=None):
+        """
+        Blocking helper: submit and wait for the result.
+        After timeout seconds the request is cancelled (if not running yet) and TimeoutError raised.
+        """
+        future = self.submit(user_input)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'queued': self._queue.qsize()
+        }
+
+    def _collect(self, first):
+        """Gather more requests until the batch is full or the wait window closes"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:  # Stop signal, served after this batch
+                self._running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while self._running or not self._queue.empty():
+            item = self._queue.get()
+            if item is None:
+                continue
+
+            batch = [entry for entry in self._collect(item) if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.generate_batch([user_input for user_input, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
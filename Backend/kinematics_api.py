@@ -0,0 +1,214 @@
+# =============================================================================
+# NUMERIC KINEMATICS ENDPOINTS (WITHOUT THE NLP LAYER)
+# =============================================================================
+#
+# JSON endpoints that call the kinematic models of src directly. Every endpoint
+# accepts one item or an array of items and answers with plain arrays:
+#
+#   POST /api/fk          {"q": [30, 60, 90]}                      -> {"position": [x, y, z]}
+#   POST /api/fk          {"q": [[30, 60, 90], ...], "unit": "rad"} -> {"position": [[x, y, z], ...]}
+#   POST /api/ik          {"position": [x, y, z], "unit": "mm"}     -> {"solutions": [[q1, q2, q3], ...]}
+#   POST /api/jacobian    {"q": [...], "q_dot": [...]}              -> {"J": 6x3, "velocities": [vx, vy, vz, wx, wy, wz]}
+#   POST /api/matrices    {"q": [...]}                              -> {"matrices": 4x4x4, "T0n": 4x4}
+#   POST /api/trajectory  {"A": [...], "B": [...], "V1": 10, "V2": 20, "K": 5}  (or {"trajectories": [...]})
+#
+# Angles are in degrees unless "unit": "rad" ("angle_unit" for /api/ik outputs),
+# positions in mm unless "unit": "cm" or "m". "decimals" rounds the output.
+# /api/trajectory returns traj() as is: q (rad), qp (rad/s), positions (mm), dt (s).
+
+import os
+
+import numpy as np
+from flask import Blueprint, request, jsonify
+
+from executors import run_cpu
+from src import dh, Liaisons, traj, metrics
+from src.kinematics_batch import matrices_batch, matrice_Tn_batch, mgd_batch, mgi_batch, Jacob_geo_batch, MDD_batch
+
+kinematics_api = Blueprint('kinematics_api', __name__, url_prefix='/api')
+
+# Items accepted in a single request (ROBOT_AI_API_MAX_ITEMS)
+MAX_ITEMS = int(os.environ.get('ROBOT_AI_API_MAX_ITEMS', 100000))
+
+# Trajectories accepted in a single request (each one is computed point by point)
+MAX_TRAJECTORIES = 16
+MAX_TRAJECTORY_POINTS = 200000
+TRAJECTORY_DT = 5 / 1000  # Time step of traj()
+
+POSITION_SCALE = {'mm': 1, 'cm': 10, 'm': 1000}
+
+
+class RequestError(ValueError):
+    """Invalid request body (answered with HTTP 400)"""
+
+
+def read_body():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise RequestError("Expected a JSON object")
+    return data
+
+
+def read_vectors(data, key, size=3):
+    """
+    Array of one item [a, b, c] or of N items [[a, b, c], ...].
+
+    Returns:
+        tuple: (array (N, size), True if a single item was sent)
+    """
+    if key not in data:
+        raise RequestError(f"Missing '{key}'")
+    try:
+        values = np.asarray(data[key], dtype=np.float64)
+    except (TypeError, ValueError):
+        raise RequestError(f"'{key}' must be an array of numbers")
+
+    single = values.ndim == 1
+    values = np.atleast_2d(values)
+    if values.ndim != 2 or values.shape[1] != size:
+        raise RequestError(f"'{key}' must be [{size} numbers] or a list of them")
+    if len(values) > MAX_ITEMS:
+        raise RequestError(f"At most {MAX_ITEMS} items per request")
+    if not np.isfinite(values).all():
+        raise RequestError(f"'{key}' contains non-finite values")
+    return values, single
+
+
+def read_angles(data, key='q'):
+    """Joint angles in degrees"""
+    q, single = read_vectors(data, key)
+    unit = data.get('unit', 'deg')
+    if unit not in ('deg', 'rad'):
+        raise RequestError("'unit' must be 'deg' or 'rad'")
+    return (np.degrees(q) if unit == 'rad' else q), single
+
+
+def read_decimals(data):
+    decimals = data.get('decimals')
+    if decimals is None:
+        return None
+    if isinstance(decimals, bool) or not isinstance(decimals, int):
+        raise RequestError("'decimals' must be an integer")
+    return decimals
+
+
+def output(values, single, decimals):
+    """Plain lists, without the batch dimension for a single item"""
+    values = np.asarray(values)
+    if decimals is not None:
+        values = np.round(values, decimals)
+    return (values[0] if single else values).tolist()
+
+
+def respond(compute):
+    """Runs compute(data) in the CPU executor and turns RequestError into HTTP 400"""
+    try:
+        return jsonify(run_cpu(compute, read_body()))
+    except RequestError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@kinematics_api.route('/fk', methods=['POST'])
+@metrics.timed('api.fk')
+def forward_kinematics():
+    def compute(data):
+        q, single = read_angles(data)
+        return {'position': output(mgd_batch(q, Liaisons), single, read_decimals(data))}
+    return respond(compute)
+
+
+@kinematics_api.route('/ik', methods=['POST'])
+@metrics.timed('api.ik')
+def inverse_kinematics():
+    def compute(data):
+        positions, single = read_vectors(data, 'position')
+        unit = data.get('unit', 'mm')
+        if unit not in POSITION_SCALE:
+            raise RequestError(f"'unit' must be one of {', '.join(POSITION_SCALE)}")
+        angle_unit = data.get('angle_unit', 'deg')
+        if angle_unit not in ('deg', 'rad'):
+            raise RequestError("'angle_unit' must be 'deg' or 'rad'")
+
+        solutions, valid = mgi_batch(positions * POSITION_SCALE[unit], Liaisons)
+        if angle_unit == 'deg':
+            solutions = np.degrees(solutions)
+        decimals = read_decimals(data)
+        if decimals is not None:
+            solutions = np.round(solutions, decimals)
+
+        # Same solutions and order as mgi; an unreachable position has none
+        per_item = [rows[mask].tolist() for rows, mask in zip(solutions, valid)]
+        return {'solutions': per_item[0] if single else per_item}
+    return respond(compute)
+
+
+@kinematics_api.route('/jacobian', methods=['POST'])
+@metrics.timed('api.jacobian')
+def jacobian():
+    def compute(data):
+        q, single = read_angles(data)
+        J = Jacob_geo_batch(matrices_batch(q, dh))
+        result = {'J': output(J, single, read_decimals(data))}
+
+        if data.get('q_dot') is not None:
+            q_dot, _ = read_vectors(data, 'q_dot')
+            if len(q_dot) != len(q) and len(q_dot) != 1:
+                raise RequestError("'q_dot' must have one item or as many items as 'q'")
+            q_dot = np.broadcast_to(q_dot, (len(q), 3))
+            result['velocities'] = output(MDD_batch(q_dot, J), single, read_decimals(data))
+        return result
+    return respond(compute)
+
+
+@kinematics_api.route('/matrices', methods=['POST'])
+@metrics.timed('api.matrices')
+def matrices():
+    def compute(data):
+        q, single = read_angles(data)
+        return {
+            'matrices': output(matrices_batch(q, dh), single, read_decimals(data)),
+            'T0n': output(matrice_Tn_batch(dh, q), single, read_decimals(data))
+        }
+    return respond(compute)
+
+
+def trajectory_item(spec, decimals):
+    try:
+        A = np.asarray(spec['A'], dtype=np.float64)
+        B = np.asarray(spec['B'], dtype=np.float64)
+        V1, V2, K = float(spec['V1']), float(spec['V2']), float(spec['K'])
+    except (KeyError, TypeError, ValueError):
+        raise RequestError("Each trajectory needs A and B ([x, y, z]) and numbers V1, V2 and K")
+    if A.shape != (3,) or B.shape != (3,):
+        raise RequestError("A and B must be [x, y, z]")
+    if min(V1, V2, K) <= 0:
+        raise RequestError("V1, V2 and K must be positive")
+
+    # traj() goes around the circle of diameter |AB| (YZ plane): lower bound of its duration
+    duration = np.pi * np.linalg.norm(B[1:] - A[1:]) / max(V1, V2)
+    if duration / TRAJECTORY_DT > MAX_TRAJECTORY_POINTS:
+        raise RequestError(f"The trajectory would have more than {MAX_TRAJECTORY_POINTS} points, increase the speeds")
+
+    q, qp, positions, dt = traj(A, B, V1, V2, K)
+
+    def points(values):
+        if all(value is not None for value in values):
+            return output(np.asarray(list(values), dtype=np.float64), False, decimals)
+        # Points where the MGI failed are null
+        return [None if value is None else output(np.asarray(value, dtype=np.float64)[None], True, decimals)
+                for value in values]
+
+    return {'dt': float(dt), 'q': points(q), 'qp': points(qp), 'positions': output(positions, False, decimals)}
+
+
+@kinematics_api.route('/trajectory', methods=['POST'])
+@metrics.timed('api.trajectory')
+def trajectory():
+    def compute(data):
+        specs = data.get('trajectories')
+        if specs is None:
+            return trajectory_item(data, read_decimals(data))
+        if not isinstance(specs, list) or len(specs) > MAX_TRAJECTORIES:
+            raise RequestError(f"'trajectories' must be a list of at most {MAX_TRAJECTORIES} items")
+        return {'trajectories': [trajectory_item(spec, read_decimals(data)) for spec in specs]}
+    return respond(compute)
@@ -12,6 +12,10 @@ warnings.filterwarnings("ignore", message=".*weights_only.*")
 import sys
 import os
 import json
+import multiprocessing
+import shutil
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 import warnings
 
@@ -19,28 +23,112 @@ import warnings
 sys.path.append('.')
 
 # Import transformers
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, LogitsProcessorList, StoppingCriteriaList
 import torch
 
 from chat_processing import processing
+from inference_scheduler import InferenceScheduler
+from worker_pool import InferenceWorkerPool
+from prediction_cache import PredictionCache
+from decoding import (DecodingStats, is_valid_output, JsonObjectTracker, JsonCompleteStoppingCriteria,
+                      ForceEosOnCompleteJson)
+from constrained_decoding import TokenConstraint, JsonSchemaLogitsProcessor, constrained_greedy
+from speculative_decoding import prompt_lookup_greedy
+from rule_parser import RuleParser
+from encoder_cache import EncoderOutputCache
+from src import metrics
+from src.metrics import span
 
 # Suppress warnings for cleaner interface
 warnings.filterwarnings("ignore")
 
+# Queries used to compare the int8 quantized model against the fp32 one
+QUANTIZATION_CHECK_QUERIES = [
+    "What are the transformation matrices when all the joints are in 56°?",
+    "I would like to know the matrices when angle1=pi/2, angle2=-pi/4 and angle3=8pi/3",
+    "Calculate the matrices with 34°, 89°, -68°",
+    "What's the end position with angles 30°, 60°, 90°?",
+    "Calculate forward kinematics for π/4, π/2, 3π/4",
+    "End effector position with 1.2, 0.8, 1.5 radians",
+    "Calculate the robot's coordinates",
+    "I want to position the robot at (200, 300, 400) mm",
+    "Angles to reach 0.5, 1.0, 1.5 meters",
+    "Set arm to reach 25cm, 35cm, 45cm",
+    "Calculate de inverse kinematics of the robot looking to obtain, x=-378, y=867 and z=786mm",
+    "Jacobian with angles 45°, 90°, 135° and velocities 2, 1.5, 3 rad/s",
+    "What's the jacobian of the robot when all the angles are 25 degrees?",
+    "Joint velocities are streaming at [0.8|2.4|1.6] radians per second, need jacobian analysis",
+    "What is the Jacobian?",
+    "Visualize robot in 3D with configuration 72°, 144°, 216°",
+    "Simulate the robot end effector in the coordinates x=896, y=677 and z=-564 mm",
+    "Render robot in position 1.0, 1.5, 2.0 rad",
+]
+
+# Representative queries (short and long, angles and positions) used to warm up the compiled model
+COMPILE_WARMUP_QUERIES = [
+    "Calculate the matrices with 34°, 89°, -68°",
+    "Simulate the robot end effector in the coordinates x=896, y=677 and z=-564 mm",
+    "Joint velocities are streaming at [0.8|2.4|1.6] radians per second, need jacobian analysis",
+]
+
+def load_weights(path, map_location):
+    """State dict of a checkpoint, loading tensors only (no arbitrary pickled objects)"""
+    try:
+        return torch.load(path, map_location=map_location, weights_only=True)
+    except TypeError:
+        # PyTorch < 1.13 has no weights_only argument
+        return torch.load(path, map_location=map_location)
+
+
 class RoboticsAI:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, quantize=False, prediction_cache_path=None, decoding='beam', fast_path=False,
+                 compiled=False, generate_timeout=60, cache_templates=False):
         """Initialize the Robotics AI system"""
         
         self.config = {
             'model_name': 'Salesforce/codet5-base',
             'model_path': './models/model_8427.pth',
+            'quantized_model_path': './models/model_8427_int8.pth',
+            'converted_model_path': './models/model_8427',  # Safetensors checkpoint + config + tokenizer, written on first run
+            'quantize': quantize,  # Dynamic int8 quantization of the linear layers (CPU only)
             'max_length': 256,
-            'device': 'cuda' if torch.cuda.is_available() else 'cpu'
+            'device': 'cuda' if torch.cuda.is_available() else 'cpu',
+            'decoding': decoding,  # 'beam', 'adaptive' (greedy + beam fallback), 'constrained' (JSON grammar) or 'speculative'
+            'greedy_min_confidence': 0.8,  # Below this greedy outputs are re-generated with beam search
+            'stop_on_json': True,  # End generation as soon as the top-level JSON object is closed
+            'lookup_ngram_size': 3,  # Speculative decoding: longest output suffix searched in the input
+            'lookup_draft_tokens': 10,  # Speculative decoding: input tokens proposed per decoder pass
+            'compile': compiled,  # torch.compile the encoder and the decoder (eager fallback)
+            'fast_path': fast_path,  # Parse unambiguous templated queries with rules, without the model (opt-in until checked against the model)
+            'encoder_cache_size': 256,  # Encoder outputs kept for re-decoding the same input (0 disables)
+            'prediction_cache_size': 512,  # 0 disables the prediction cache
+            'prediction_cache_path': prediction_cache_path,  # Optional sqlite file (persistent tier)
+            'prediction_cache_templates': cache_templates,  # Share entries between queries that only differ in their numbers
+            'generate_timeout': generate_timeout  # Seconds a prediction waits for the scheduler / worker pool
         }
         
         self.tokenizer = None
         self.model = None
         self.model_status = "NOT_LOADED"
+        self.scheduler = None  # Micro-batching scheduler (see enable_scheduler)
+        self.decoding_stats = DecodingStats()
+        self.token_constraint = None  # Grammar of the 'constrained' decoding mode
+        self.token_texts = {}  # Decoded text of each token id, shared by the JSON early-stop trackers
+        self.compiled = False
+        self.decoder_latency = {}  # Seconds per generated token, 'eager' / 'compiled'
+
+        self.rule_parser = RuleParser() if fast_path else None
+        self.encoder_cache = EncoderOutputCache(self.config['encoder_cache_size']) if self.config['encoder_cache_size'] else None
+
+        self.prediction_cache = None
+        if self.config['prediction_cache_size']:
+            self.prediction_cache = PredictionCache(
+                max_size=self.config['prediction_cache_size'],
+                persist_path=self.config['prediction_cache_path'],
+                template_numbers=self.config['prediction_cache_templates'],
+                # Entries of another model or decoding setup are never shared
+                namespace=self.prediction_namespace()
+            )
 
         self.prediction_log = []  # Lista para guardar predicciones
         self.max_log_size = 3     # Máximo 3 predicciones
@@ -53,29 +141,36 @@ class RoboticsAI:
         print("=" * 60)
         
         try:
-            # Load tokenizer
-            # print("📝 Cargando procesador de lenguaje...")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.config['model_name'])
-            
-            # Load base model
+            # Load tokenizer and model
             print("Loading trained model...")
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(self.config['model_name'])
+            converted = self.load_base_model()
             
             # Try to load trained weights
-            if os.path.exists(self.config['model_path']):
+            if self.config['quantize'] and self.load_quantized_model():
+                print("✅ Quantized model loaded and ready to use!")
+                if self.config['compile']:
+                    self.compile_model()
+                self.update_prediction_namespace()
+                return True
+            if self.model is None:
+                converted = self.load_base_model()
+
+            if converted:
+                self.model_status = "TRAINED_MODEL"
+                print("✅ Model loaded and ready to use!")
+
+            elif os.path.exists(self.config['model_path']):
                 # print("🧠 Loading specialized knowledge...")
                 
                 try:
-                    # Safe loading for different PyTorch versions
-                    try:
-                        state_dict = torch.load(self.config['model_path'], map_location=self.config['device'])
-                    except ValueError:
-                        # Fallback for older PyTorch versions
-                        state_dict = torch.load(self.config['model_path'], map_location=self.config['device'], weights_only=False)
-                    
+                    state_dict = load_weights(self.config['model_path'], self.config['device'])
+
                     self.model.load_state_dict(state_dict)
                     self.model_status = "TRAINED_MODEL"
                     print("✅ Model loaded and ready to use!")
+
+                    # Next startups skip the base weights and the .pth
+                    self.convert_model()
                     
                 except Exception as e:
                     print(f"⚠️ Error loading trained model: {e}")
@@ -88,6 +183,14 @@ class RoboticsAI:
             # Move to device and set to eval mode
             self.model = self.model.to(self.config['device'])
             self.model.eval()
+
+            if self.config['quantize']:
+                self.quantize_model()
+
+            if self.config['compile']:
+                self.compile_model()
+
+            self.update_prediction_namespace()
             
             # print(f"🚀 System ready on {self.config['device']}")
             # print(f"📊 Model parameters: {self.model.num_parameters():,}")
@@ -98,6 +201,178 @@ class RoboticsAI:
             print(f"❌ Critical error: {e}")
             return False
     
+    def prediction_namespace(self):
+        """Identity of everything that changes the generated text: model, weights variant and decoding settings"""
+        config = self.config
+        parts = [os.path.basename(config['model_path']), config['decoding'], f"len{config['max_length']}"]
+        if self.model_status == "BASE_MODEL":
+            parts.append('base')
+        if config['quantize']:
+            parts.append('int8')
+        if config['compile']:
+            parts.append('compiled')
+        if not config['stop_on_json']:
+            parts.append('no-early-stop')
+        if config['decoding'] == 'adaptive':
+            parts.append(f"min-confidence{config['greedy_min_confidence']}")
+        if config['decoding'] == 'speculative':
+            parts.append(f"lookup{config['lookup_ngram_size']}x{config['lookup_draft_tokens']}")
+        return '-'.join(parts)
+
+    def update_prediction_namespace(self):
+        """Recompute the prediction cache namespace once the loaded model (and the final config) is known"""
+        namespace = self.prediction_namespace()
+        if self.prediction_cache and self.prediction_cache.namespace != namespace:
+            self.prediction_cache.clear()  # The memory tier is not namespaced
+            self.prediction_cache.namespace = namespace
+
+    def load_base_model(self):
+        """
+        Load the tokenizer and the model: from the converted checkpoint when it is up to date
+        (returns True, fine-tuned weights included), else the base model (returns False).
+        """
+        if self.load_converted_model():
+            return True
+        self.tokenizer = AutoTokenizer.from_pretrained(self.config['model_name'])
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(self.config['model_name'])
+        return False
+
+    def load_converted_model(self):
+        """
+        Fast startup: the model is built from its config and the safetensors weights are
+        memory-mapped, without initializing (or downloading) the base weights.
+        The checkpoint is only used if it is newer than the trained model.
+        """
+        converted_path = self.config['converted_model_path']
+        weights_path = os.path.join(converted_path, 'model.safetensors')
+        if not os.path.exists(weights_path):
+            return False
+        if (os.path.exists(self.config['model_path']) and
+                os.path.getmtime(weights_path) < os.path.getmtime(self.config['model_path'])):
+            return False
+
+        try:
+            self.tokenizer = AutoTokenizer.from_pretrained(converted_path, local_files_only=True)
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(converted_path, local_files_only=True)
+            return True
+        except Exception as e:
+            print(f"⚠️ Error loading converted model: {e}")
+            return False
+
+    def convert_model(self):
+        """Save the fine-tuned model, its config and the tokenizer as a safetensors checkpoint"""
+        converted_path = self.config['converted_model_path']
+        try:
+            # Write to a temporary directory first so a failed save never leaves a half checkpoint
+            tmp_path = converted_path + '.tmp'
+            self.model.save_pretrained(tmp_path, safe_serialization=True)
+            self.tokenizer.save_pretrained(tmp_path)
+            if os.path.exists(converted_path):
+                shutil.rmtree(converted_path)
+            os.replace(tmp_path, converted_path)
+        except Exception as e:
+            shutil.rmtree(converted_path + '.tmp', ignore_errors=True)
+            print(f"⚠️ Couldn't convert the trained model: {e}")
+
+    def can_quantize(self):
+        """Dynamic int8 quantization is only available for CPU inference"""
+        if self.config['device'] != 'cpu':
+            print("⚠️ Quantization is only supported on CPU, using the fp32 model...")
+            return False
+        return True
+
+    def load_quantized_model(self):
+        """
+        Load the int8 weights cached on disk, skipping the fp32 checkpoint.
+        The cache is only used if it is newer than the trained model.
+        """
+        cache_path = self.config['quantized_model_path']
+        if not self.can_quantize() or not os.path.exists(cache_path):
+            return False
+        if (os.path.exists(self.config['model_path']) and
+                os.path.getmtime(cache_path) < os.path.getmtime(self.config['model_path'])):
+            return False
+
+        try:
+            # The quantized skeleton must exist before loading its packed weights
+            self.model.eval()
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+            state_dict = load_weights(cache_path, 'cpu')
+            self.model.load_state_dict(state_dict)
+            self.model.eval()
+            self.model_status = "TRAINED_MODEL_INT8"
+            return True
+        except Exception as e:
+            print(f"⚠️ Error loading quantized model: {e}")
+            print("🔄 Quantizing the trained model again...")
+            self.model = None  # Reloaded by load_model
+            return False
+
+    def quantize_model(self):
+        """Apply dynamic int8 quantization to the linear layers and cache the result on disk"""
+        if not self.can_quantize():
+            return False
+
+        self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
+        self.model_status += "_INT8"
+
+        # Only the fine-tuned weights are worth caching
+        if self.model_status == "TRAINED_MODEL_INT8":
+            cache_path = self.config['quantized_model_path']
+            try:
+                # Write to a temporary file first so a failed save never leaves a corrupted cache
+                torch.save(self.model.state_dict(), cache_path + '.tmp')
+                os.replace(cache_path + '.tmp', cache_path)
+            except Exception as e:
+                if os.path.exists(cache_path + '.tmp'):
+                    os.remove(cache_path + '.tmp')
+                print(f"⚠️ Couldn't cache the quantized model: {e}")
+        return True
+
+    def compile_model(self):
+        """
+        Compile the encoder and the decoder with torch.compile (dynamic shapes, so the
+        batch size and the generated length do not trigger recompilations) and warm them
+        up with representative queries. Falls back to eager mode if compilation fails.
+        """
+        encoder, decoder = self.model.get_encoder(), self.model.get_decoder()
+        self.decoder_latency['eager'] = self.measure_decoder_latency()
+
+        try:
+            encoder.forward = torch.compile(encoder.forward, dynamic=True)
+            decoder.forward = torch.compile(decoder.forward, dynamic=True)
+            # The first calls compile the graphs
+            self.generate_texts(COMPILE_WARMUP_QUERIES)
+            self.measure_decoder_latency(num_tokens=2)
+            self.decoder_latency['compiled'] = self.measure_decoder_latency()
+            self.compiled = True
+            print("✅ Compiled model ready!")
+        except Exception as e:
+            # Back to the eager forward of the class
+            for module in (encoder, decoder):
+                module.__dict__.pop('forward', None)
+            print(f"⚠️ Couldn't compile the model, using eager mode: {str(e)[:80]}")
+        return self.compiled
+
+    def measure_decoder_latency(self, num_tokens=16):
+        """Mean seconds per greedy decoder step (with KV cache) at batch size 1"""
+        inputs = self.tokenize(COMPILE_WARMUP_QUERIES[:1])
+        with torch.no_grad():
+            encoder_outputs = self.model.get_encoder()(**inputs)
+            decoder_input_ids = torch.full((1, 1), self.model.config.decoder_start_token_id, device=self.config['device'])
+            past_key_values = None
+            start = None
+            # The first step is not timed (cache allocation)
+            for step in range(num_tokens + 1):
+                if step == 1:
+                    start = time.perf_counter()
+                outputs = self.model(encoder_outputs=encoder_outputs, attention_mask=inputs['attention_mask'],
+                                     decoder_input_ids=decoder_input_ids, past_key_values=past_key_values, use_cache=True)
+                past_key_values = outputs.past_key_values
+                decoder_input_ids = outputs.logits[:, -1:].argmax(dim=-1)
+        return (time.perf_counter() - start) / num_tokens
+
     def add_to_log(self, user_input, prediction, error):
         """Add prediction to log, keeping only the last 3"""
         
@@ -151,42 +426,46 @@ class RoboticsAI:
         self.prediction_log = []
         return "🗑️ Log cleared successfully!"
     
-    def predict(self, user_input):
-        """Generate prediction for user input"""
+    def predict(self, user_input, timeout=None):
+        """
+        Generate prediction for user input
+
+        timeout: seconds to wait for the scheduler / worker pool (default config['generate_timeout']);
+        when it passes the prediction fails with an error instead of blocking the caller.
+        """
         
         if not self.model or not self.tokenizer:
             return None, "Unloaded model"
         
         try:
-            # Tokenize input
-            inputs = self.tokenizer(
-                user_input,
-                return_tensors="pt",
-                max_length=self.config['max_length'],
-                truncation=True,
-                padding=True
-            )
-            inputs = {k: v.to(self.config['device']) for k, v in inputs.items()}
-            
-            # Generate prediction
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_length=self.config['max_length'],
-                    num_beams=3,
-                    do_sample=False,
-                    early_stopping=True,
-                    pad_token_id=self.tokenizer.pad_token_id
-                )
-            
-            # Decode result
-            result = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            # Unambiguous templated queries are parsed by rules, without running the model
+            with span('predict.fast_path'):
+                command = self.rule_parser.parse(user_input) if self.rule_parser else None
+            if command is not None:
+                self.add_to_log(user_input, command, None)
+                return command, None
+
+            # Repeated queries skip the model entirely
+            with span('predict.cache_lookup'):
+                result = self.prediction_cache.get(user_input) if self.prediction_cache else None
+            from_cache = result is not None
+
+            if not from_cache:
+                # Includes the time queued in the scheduler / worker pool
+                with span('predict.generate'):
+                    if self.scheduler:
+                        result = self.scheduler.generate(user_input, timeout or self.config['generate_timeout'])
+                    else:
+                        result = self.generate_text(user_input)
             
             # Validate JSON
             try:
-                parsed_json = json.loads(result)
+                with span('predict.json_parse'):
+                    parsed_json = json.loads(result)
                 prediction_result = parsed_json
                 error_result = None
+                if self.prediction_cache and not from_cache:
+                    self.prediction_cache.put(user_input, result)
             except json.JSONDecodeError as e:
                 prediction_result = result
                 error_result = f"Invalid JSON: {str(e)[:50]}..."
@@ -195,11 +474,310 @@ class RoboticsAI:
             
             return prediction_result, error_result
                 
+        except FutureTimeoutError:
+            error_result = f"Prediction error: no answer from the model after {timeout or self.config['generate_timeout']} s"
+            self.add_to_log(user_input, None, error_result)
+            return None, error_result
+
         except Exception as e:
             error_result = f"Prediction error: {str(e)[:50]}..."
         
             self.add_to_log(user_input, None, error_result)
+            return None, error_result
     
+    def generate_text(self, user_input, model=None):
+        """Run the model on the user input and return the decoded text (no logging)"""
+        return self.generate_texts([user_input], model=model)[0]
+
+    def generate_texts(self, user_inputs, model=None, decoding=None):
+        """
+        Run the model on a padded batch of inputs and return the decoded texts
+
+        Args:
+            decoding: 'beam' (3 beams), 'adaptive' (greedy first, beam search only for the
+                outputs that fail the JSON/schema validation or have a low confidence) or
+                'constrained' (greedy, masking every token not valid under the command schema) or
+                'speculative' (greedy with prompt-lookup drafts, same output as greedy).
+                Defaults to config['decoding'].
+        """
+        model = model if model is not None else self.model
+        decoding = decoding or self.config['decoding']
+
+        # Tokenize input
+        with span('model.tokenize'):
+            inputs = self.tokenize(user_inputs)
+
+        if decoding == 'adaptive':
+            return self.generate_adaptive(inputs, model)
+
+        if decoding == 'speculative':
+            with self.decoding_stats.timed('speculative') as timer:
+                texts = self.generate_speculative(inputs, model)
+                timer.sequences = len(texts)
+            return texts
+
+        if decoding == 'constrained':
+            with self.decoding_stats.timed('constrained') as timer:
+                texts = self.generate_constrained(inputs, model)
+                timer.sequences = len(texts)
+            return texts
+
+        with self.decoding_stats.timed('beam') as timer:
+            texts = self.generate_beam(inputs, model)
+            timer.sequences = len(texts)
+        return texts
+
+    def tokenize(self, user_inputs):
+        inputs = self.tokenizer(
+            user_inputs,
+            return_tensors="pt",
+            max_length=self.config['max_length'],
+            truncation=True,
+            padding=True
+        )
+        return {k: v.to(self.config['device']) for k, v in inputs.items()}
+
+    def encode(self, inputs, model):
+        """Encoder outputs of the batch, through the encoder cache for the served model"""
+        if self.encoder_cache is None or model is not self.model:
+            with torch.no_grad():
+                return model.get_encoder()(**inputs)
+        return self.encoder_cache.encode(model.get_encoder(), inputs)
+
+    def early_stop_kwargs(self, num_beams):
+        """generate() arguments that end each sequence once its top-level JSON object is closed"""
+        if not self.config['stop_on_json']:
+            return {}
+        tracker = JsonObjectTracker(self.tokenizer, self.token_texts)
+        if num_beams > 1:
+            return {'logits_processor': LogitsProcessorList([ForceEosOnCompleteJson(tracker, self.tokenizer.eos_token_id)])}
+        return {'stopping_criteria': StoppingCriteriaList([JsonCompleteStoppingCriteria(tracker)])}
+
+    def generate_beam(self, inputs, model):
+        # Generate prediction
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                encoder_outputs=self.encode(inputs, model),
+                max_length=self.config['max_length'],
+                num_beams=3,
+                do_sample=False,
+                early_stopping=True,
+                pad_token_id=self.tokenizer.pad_token_id,
+                **self.early_stop_kwargs(num_beams=3)
+            )
+        
+        # Decode result
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def generate_adaptive(self, inputs, model):
+        """Greedy fast path, re-generating with beam search only the outputs that need it"""
+        with self.decoding_stats.timed('greedy') as timer:
+            with torch.no_grad():
+                outputs = model.generate(
+                    **inputs,
+                    encoder_outputs=self.encode(inputs, model),
+                    max_length=self.config['max_length'],
+                    num_beams=1,
+                    do_sample=False,
+                    output_scores=True,
+                    return_dict_in_generate=True,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    **self.early_stop_kwargs(num_beams=1)
+                )
+            texts = self.tokenizer.batch_decode(outputs.sequences, skip_special_tokens=True)
+            timer.sequences = len(texts)
+
+            # Sequence confidence: geometric mean of the chosen token probabilities
+            log_probs = model.compute_transition_scores(outputs.sequences, outputs.scores, normalize_logits=True)
+            generated = outputs.sequences[:, 1:] != self.tokenizer.pad_token_id
+            lengths = generated.sum(dim=1).clamp(min=1)
+            log_probs = torch.where(generated, log_probs, torch.zeros_like(log_probs))
+            confidence = torch.exp(log_probs.sum(dim=1) / lengths)
+
+        retry = [i for i, text in enumerate(texts)
+                 if confidence[i] < self.config['greedy_min_confidence'] or not is_valid_output(text)]
+        self.decoding_stats.record_fallbacks(len(texts), len(retry))
+
+        if retry:
+            subset = {k: v[retry] for k, v in inputs.items()}
+            with self.decoding_stats.timed('beam') as timer:
+                for i, text in zip(retry, self.generate_beam(subset, model)):
+                    texts[i] = text
+                timer.sequences = len(retry)
+        return texts
+
+    def generate_speculative(self, inputs, model):
+        """
+        Greedy decoding with prompt-lookup drafts copied from the input (numbers, units),
+        verified several tokens per decoder pass. Same output as greedy decoding.
+        """
+        texts = []
+        with torch.no_grad():
+            for row in range(inputs['input_ids'].shape[0]):
+                # Each sequence is drafted and verified on its own (without its padding)
+                length = int(inputs['attention_mask'][row].sum())
+                single = {k: v[row:row + 1, :length] for k, v in inputs.items()}
+                tracker = JsonObjectTracker(self.tokenizer, self.token_texts) if self.config['stop_on_json'] else None
+                token_ids, passes, drafted, accepted = prompt_lookup_greedy(
+                    model, single, self.config['max_length'], model.config.decoder_start_token_id,
+                    self.tokenizer.eos_token_id,
+                    ngram_size=self.config['lookup_ngram_size'],
+                    num_draft_tokens=self.config['lookup_draft_tokens'],
+                    tracker=tracker,
+                    encoder_outputs=self.encode(single, model)
+                )
+                self.decoding_stats.record_speculation(passes, len(token_ids), drafted, accepted)
+                texts.append(self.tokenizer.decode(token_ids, skip_special_tokens=True))
+        return texts
+
+    def get_token_constraint(self):
+        """Vocabulary trie of the JSON grammar, built on first use"""
+        if self.token_constraint is None:
+            self.token_constraint = TokenConstraint(self.tokenizer)
+        return self.token_constraint
+
+    def generate_constrained(self, inputs, model):
+        """Greedy decoding where only tokens valid under the command JSON schema can be generated"""
+        constraint = self.get_token_constraint()
+        decoder_start_token_id = model.config.decoder_start_token_id
+
+        with torch.no_grad():
+            if inputs['input_ids'].shape[0] == 1:
+                # Single input: structural tokens are emitted without their own decoder step
+                token_ids = constrained_greedy(model, inputs, constraint, self.config['max_length'], decoder_start_token_id,
+                                               encoder_outputs=self.encode(inputs, model))
+                return [self.tokenizer.decode(token_ids, skip_special_tokens=True)]
+
+            outputs = model.generate(
+                **inputs,
+                encoder_outputs=self.encode(inputs, model),
+                max_length=self.config['max_length'],
+                num_beams=1,
+                do_sample=False,
+                logits_processor=LogitsProcessorList([JsonSchemaLogitsProcessor(constraint, decoder_start_token_id)]),
+                pad_token_id=self.tokenizer.pad_token_id,
+                **self.early_stop_kwargs(num_beams=1)
+            )
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def enable_scheduler(self, max_batch_size=8, max_wait_ms=5):
+        """
+        Route every prediction through a single worker thread that owns the model
+        and runs concurrent requests as micro-batches
+        """
+        if self.scheduler is None:
+            self.scheduler = InferenceScheduler(self.generate_texts, max_batch_size, max_wait_ms).start()
+        return self.scheduler
+
+    def enable_worker_pool(self, num_workers, max_batch_size=8, threads_per_worker=None):
+        """
+        Route every prediction to worker processes forked from this one, sharing the
+        loaded weights. Must be called right after load_model, before any inference.
+        Falls back to the in-process scheduler where fork is not available (Windows).
+        Not available with compile=True: compiling runs inference in this process before the fork.
+        """
+        if self.config['compile']:
+            raise RuntimeError("The worker pool can't be used with a compiled model (compile=True)")
+        if self.scheduler is None:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                print("⚠️ Worker processes need fork, using the in-process scheduler...")
+                return self.enable_scheduler(max_batch_size)
+            try:
+                self.model.share_memory()
+            except Exception:
+                pass  # Packed int8 weights stay copy-on-write
+            self.scheduler = InferenceWorkerPool(self.generate_texts, num_workers, max_batch_size, threads_per_worker,
+                                                 self.collect_worker_stats, self.merge_worker_stats).start()
+        return self.scheduler
+
+    def collect_worker_stats(self):
+        """Run in an inference worker: decoding counters, encoder cache hits and latency spans since the last call"""
+        return {
+            'decoding': self.decoding_stats.drain(),
+            'encoder_cache': self.encoder_cache.drain_counters() if self.encoder_cache else None,
+            'metrics': metrics.drain()
+        }
+
+    def merge_worker_stats(self, stats):
+        """Add the statistics of a worker batch, so the status and /metrics cover the whole pool"""
+        self.decoding_stats.merge(stats['decoding'])
+        if self.encoder_cache and stats['encoder_cache']:
+            self.encoder_cache.merge_counters(stats['encoder_cache'])
+        metrics.merge(stats['metrics'])
+
+    def warm_up(self, queries=None):
+        """
+        Run representative queries through the serving path (scheduler or worker
+        processes) so the first requests do not pay the lazy initializations.
+        Nothing is logged nor stored in the prediction cache.
+        """
+        for query in queries or COMPILE_WARMUP_QUERIES:
+            self.scheduler.generate(query) if self.scheduler else self.generate_text(query)
+
+    def shutdown(self, timeout=None):
+        """Stop the scheduler / worker processes once the queued requests are done"""
+        if self.scheduler is not None:
+            self.scheduler.stop(timeout=timeout)
+            self.scheduler = None
+
+    def load_fp32_model(self):
+        """
+        fp32 copy of the fine-tuned model the quantized one was built from, from the local
+        checkpoints only: the trained weights on the architecture of the loaded model,
+        or the converted checkpoint when the trained .pth is not there.
+        """
+        if os.path.exists(self.config['model_path']):
+            reference = AutoModelForSeq2SeqLM.from_config(self.model.config)
+            reference.load_state_dict(load_weights(self.config['model_path'], 'cpu'))
+            return reference
+        return AutoModelForSeq2SeqLM.from_pretrained(self.config['converted_model_path'], local_files_only=True)
+
+    def check_quantization_accuracy(self, queries=None):
+        """
+        Compare the outputs of the quantized model against the fp32 model on a query corpus.
+
+        Returns:
+            dict: exact match rate, parsed JSON match rate, mean latencies and mismatching queries.
+        """
+        queries = queries or QUANTIZATION_CHECK_QUERIES
+
+        reference = self.load_fp32_model()
+        reference.eval()
+
+        exact, same_json = 0, 0
+        latency_fp32, latency_int8 = 0.0, 0.0
+        mismatches = []
+        for query in queries:
+            start = time.perf_counter()
+            expected = self.generate_text(query, model=reference)
+            latency_fp32 += time.perf_counter() - start
+
+            start = time.perf_counter()
+            obtained = self.generate_text(query)
+            latency_int8 += time.perf_counter() - start
+
+            if obtained == expected:
+                exact += 1
+                same_json += 1
+                continue
+            try:
+                if json.loads(obtained) == json.loads(expected):
+                    same_json += 1
+                    continue
+            except json.JSONDecodeError:
+                pass
+            mismatches.append({'input': query, 'fp32': expected, 'int8': obtained})
+
+        return {
+            'queries': len(queries),
+            'exact_match': exact / len(queries),
+            'json_match': same_json / len(queries),
+            'mean_latency_fp32': latency_fp32 / len(queries),
+            'mean_latency_int8': latency_int8 / len(queries),
+            'mismatches': mismatches
+        }
+
     def show_help(self):
         """Show help information"""
         
@@ -286,6 +864,31 @@ Existing model: {'✅' if os.path.exists(self.config['model_path']) else '❌'}
 
 State: {'🟢 READY' if self.model else '🔴 ERROR'}
 """
+        if self.decoder_latency:
+            status += f"Inference mode: {'compiled' if self.compiled else 'eager'}, per-token decoder latency " + ", ".join(
+                f"{mode} {seconds * 1000:.2f} ms" for mode, seconds in self.decoder_latency.items()) + "\n"
+        if self.rule_parser:
+            stats = self.rule_parser.stats()
+            status += f"Fast path: {stats['hit_rate']:.1%} of the queries parsed without the model ({stats['hits']} of {stats['hits'] + stats['misses']})\n"
+        if self.encoder_cache:
+            stats = self.encoder_cache.stats()
+            status += f"Encoder cache: {stats['hit_rate']:.1%} hit rate ({stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries)\n"
+        if self.prediction_cache:
+            stats = self.prediction_cache.stats()
+            status += f"Prediction cache: {stats['hit_rate']:.1%} hit rate ({stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries)\n"
+        stats = self.decoding_stats.stats()
+        for mode, entry in stats['modes'].items():
+            status += f"Decoding {mode}: {entry['calls']} calls, {entry['mean_latency'] * 1000:.1f} ms mean latency\n"
+        if self.config['decoding'] == 'adaptive':
+            status += f"Beam search fallbacks: {stats['fallbacks']} ({stats['fallback_rate']:.1%})\n"
+        if self.config['decoding'] == 'speculative':
+            speculation = stats['speculation']
+            status += f"Prompt lookup: {speculation['acceptance_rate']:.1%} drafts accepted, {speculation['tokens_per_pass']:.2f} tokens per decoder pass\n"
+        if self.scheduler:
+            stats = self.scheduler.stats()
+            status += f"Batching: {stats['requests']} requests in {stats['batches']} batches (mean size {stats['mean_batch_size']:.2f})\n"
+            if 'workers' in stats:
+                status += f"Workers: {stats['workers']} processes x {stats['threads_per_worker']} threads ({stats['restarts']} restarts)\n"
         return status
     
     def get_log_for_processing(self):
@@ -376,4 +979,11 @@ def main():
             break
 
 if __name__ == "__main__":
-    main()
+    if '--check-quantization' in sys.argv:
+        # Accuracy of the int8 model against the fp32 one: python model_chat.py --check-quantization
+        ai = RoboticsAI(quantize=True)
+        if ai.load_model():
+            report = ai.check_quantization_accuracy()
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        main()
@@ -0,0 +1,159 @@
+# =============================================================================
+# PREDICTION CACHE FOR REPEATED NATURAL-LANGUAGE QUERIES
+# =============================================================================
+
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Standalone numeric literals: digits glued to letters ("q1", "3D", "2pi") or to a
+# fraction bar ("pi/2") are part of another token and are left untouched
+NUMBER_PATTERN = re.compile(r'(?<![A-Za-z_\d./])-?\d+(?:\.\d+)?(?![A-Za-z_\d/]|\.\d)')
+PLACEHOLDER_PATTERN = re.compile(r'<n(\d+)>')
+
+
+def normalize_text(text):
+    """Fold whitespace and case"""
+    return ' '.join(text.split()).casefold()
+
+
+def template_numbers(text):
+    """
+    Replace every numeric literal by a placeholder <n0>, <n1>, ...
+
+    Returns:
+        tuple: (templated text, list of literals) or (None, None) if a literal is repeated,
+        because then the output could not be mapped back unambiguously.
+    """
+    numbers = NUMBER_PATTERN.findall(text)
+    if len(set(numbers)) != len(numbers):
+        return None, None
+
+    counter = iter(range(len(numbers)))
+    templated = NUMBER_PATTERN.sub(lambda match: f"<n{next(counter)}>", text)
+    return templated, numbers
+
+
+class PredictionCache:
+    """
+    LRU cache of generated texts keyed on the normalized input, with an optional
+    persistent (sqlite) tier shared between restarts and workers.
+
+    With template_numbers=True (off by default) the numeric literals of the input are templated out,
+    so "angles 45°, 90°, 135°" and "angles 10°, 20°, 30°" share the same entry and the
+    numbers of the current query are substituted back into the cached output.
+    """
+
+    def __init__(self, max_size=512, persist_path=None, namespace='', template_numbers=False):
+        self.max_size = max_size
+        self.namespace = namespace  # Model identity, so a new model never reads old entries
+        self.template_numbers = template_numbers
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(namespace TEXT, key TEXT, value TEXT, PRIMARY KEY (namespace, key))"
+            )
+            self._db.commit()
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _keys(self, user_input):
+        """
+        Returns the candidate keys, most general first:
+        [(templated key, numeric literals), (normalized key, None)]
+        """
+        normalized = normalize_text(user_input)
+        keys = []
+        if self.template_numbers:
+            templated, numbers = template_numbers(normalized)
+            if templated is not None and numbers:
+                keys.append((templated, numbers))
+        keys.append((normalized, None))
+        return keys
+
+    def _lookup(self, key):
+        """Memory tier first, then the persistent one (must hold the lock)"""
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            return value
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT value FROM predictions WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is not None:
+                self._store(key, row[0])
+                self.persistent_hits += 1
+                return row[0]
+        return None
+
+    def get(self, user_input):
+        """Return the cached generated text for this input, or None"""
+        with self._lock:
+            for key, numbers in self._keys(user_input):
+                value = self._lookup(key)
+                if value is not None:
+                    break
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        if numbers is None:
+            return value
+        return PLACEHOLDER_PATTERN.sub(lambda match: numbers[int(match.group(1))], value)
+
+    def put(self, user_input, generated_text):
+        key, value = None, None
+        for candidate, numbers in self._keys(user_input):
+            if numbers is None:
+                key, value = candidate, generated_text
+                break
+            # Template the output with the same placeholders as the input; only possible
+            # if every number of the output was copied from the input
+            outputs = NUMBER_PATTERN.findall(generated_text)
+            if PLACEHOLDER_PATTERN.search(generated_text) or not set(outputs) <= set(numbers):
+                continue
+            positions = {number: i for i, number in enumerate(numbers)}
+            key = candidate
+            value = NUMBER_PATTERN.sub(lambda match: f"<n{positions[match.group(0)]}>", generated_text)
+            break
+
+        with self._lock:
+            self._store(key, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions (namespace, key, value) VALUES (?, ?, ?)",
+                    (self.namespace, key, value)
+                )
+                self._db.commit()
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.persistent_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
@@ -0,0 +1,171 @@
+# =============================================================================
+# RULE-BASED FAST PATH FOR TEMPLATED QUERIES
+# =============================================================================
+
+import re
+import threading
+
+from decoding import validate_command
+from prediction_cache import NUMBER_PATTERN
+
+# Operation keywords; a query is only parsed when exactly one operation matches
+OPERATION_PATTERNS = {
+    'matrices_transformacion': re.compile(r'\bmatri(?:x|ces)\b|\btransformation\b'),
+    'jacobiano': re.compile(r'\bjacobian'),
+    'simulacion_3d': re.compile(r'\b(?:simulat\w*|visuali[sz]\w*|render\w*|3d|show)\b'),
+    'cinematica_inversa': re.compile(r'\binverse kinematics\b|\b(?:reach|position the robot at)\b|\bwhat angles\b'),
+    'cinematica_directa': re.compile(r'\b(?:forward|direct) kinematics\b|\bend(?:[- ]effector)? position\b|\brobot(?:\'s)? position\b'),
+}
+
+LABELED_PATTERN = re.compile(r'\b([xyz])\s*[=:]\s*(-?\d+(?:\.\d+)?)')
+
+# Expressions the rules do not evaluate (left to the model)
+UNSUPPORTED_PATTERN = re.compile(r'π|\bpi\b|\d\s*pi|[*^]|\be\.g\.|\bnot\b|\bexcept\b')
+
+DEGREES_PATTERN = re.compile(r'°|\bdeg(?:ree)?s?\b|\bgrados?\b')
+RADIANS_PATTERN = re.compile(r'\brad(?:ian)?s?\b(?!\s*/\s*s|\s+per\s+second)')
+VELOCITY_PATTERN = re.compile(r'\bvelocit\w*|\bspeeds?\b')
+VELOCITY_UNIT_PATTERN = re.compile(r'\brad(?:ian)?s?\s*(?:/\s*s|per\s+second)\b')
+
+POSITION_UNITS = (
+    ('mm', re.compile(r'\d[)\]]?\s*mm\b|\bmillimet(?:er|re)s?\b')),
+    ('cm', re.compile(r'\d[)\]]?\s*cm\b|\bcentimet(?:er|re)s?\b')),
+    ('m', re.compile(r'\d[)\]]?\s*m\b|\bmet(?:er|re)s?\b')),
+)
+
+
+def _angle_unit(text):
+    """'grados' / 'radianes', or None when missing or both appear"""
+    degrees = bool(DEGREES_PATTERN.search(text))
+    radians = bool(RADIANS_PATTERN.search(text))
+    if degrees == radians:
+        return None
+    return 'grados' if degrees else 'radianes'
+
+
+def _position_unit(text):
+    units = [unit for unit, pattern in POSITION_UNITS if pattern.search(text)]
+    return units[0] if len(units) == 1 else None
+
+
+def _coordinates(text):
+    """x, y, z from 'x=.., y=.., z=..' labels, or the three numbers in order"""
+    labeled = dict(LABELED_PATTERN.findall(text))
+    if labeled:
+        if set(labeled) != {'x', 'y', 'z'} or len(NUMBER_PATTERN.findall(text)) != 3:
+            return None
+        return [labeled['x'], labeled['y'], labeled['z']]
+    numbers = NUMBER_PATTERN.findall(text)
+    return numbers if len(numbers) == 3 else None
+
+
+def _angles(text):
+    numbers = NUMBER_PATTERN.findall(text)
+    unit = _angle_unit(text)
+    if len(numbers) != 3 or unit is None:
+        return None
+    return {'q1': numbers[0], 'q2': numbers[1], 'q3': numbers[2], 'unidad_angular': unit}
+
+
+def _position(text):
+    coordinates = _coordinates(text)
+    unit = _position_unit(text)
+    if coordinates is None or unit is None:
+        return None
+    x, y, z = coordinates
+    return {'x': x, 'y': y, 'z': z, 'unidad_posicion': unit}
+
+
+def _inverse(text):
+    position = _position(text)
+    return {'posicion_objetivo': position} if position else None
+
+
+def _jacobian(text):
+    """Angles before the velocity keyword, joint velocities (rad/s) after it"""
+    match = VELOCITY_PATTERN.search(text)
+    if match is None:
+        if VELOCITY_UNIT_PATTERN.search(text):
+            return None
+        angles = _angles(text)
+        return dict(angles, q1_dot="", q2_dot="", q3_dot="", unidad_velocidad="rad/s") if angles else None
+
+    angles = _angles(text[:match.start()])
+    velocities = NUMBER_PATTERN.findall(text[match.start():])
+    if angles is None or len(velocities) != 3 or not VELOCITY_UNIT_PATTERN.search(text[match.start():]):
+        return None
+    return dict(angles, q1_dot=velocities[0], q2_dot=velocities[1], q3_dot=velocities[2], unidad_velocidad="rad/s")
+
+
+def _simulation(text):
+    """Either joint angles or an end effector position, never both"""
+    angles = _angles(text) if _angle_unit(text) else None
+    position = _position(text) if _position_unit(text) else None
+    if (angles is None) == (position is None):
+        return None
+    # Same keys as the model's output: only the group that was given
+    if angles is not None:
+        return angles
+    return {'posicion_efector': position}
+
+
+PARAMETER_RULES = {
+    'matrices_transformacion': _angles,
+    'cinematica_directa': _angles,
+    'cinematica_inversa': _inverse,
+    'jacobiano': _jacobian,
+    'simulacion_3d': _simulation,
+}
+
+
+def parse_command(user_input):
+    """
+    Deterministic parse of an unambiguous query into the {'operacion', 'parametros'}
+    dict that chat_processing.processing expects.
+
+    Returns None whenever the rules are not confident (no or several operations,
+    missing unit, wrong number of values, expressions like pi/2), so the model decides.
+    """
+    text = ' '.join(user_input.split()).casefold()
+    if UNSUPPORTED_PATTERN.search(text):
+        return None
+
+    operations = [operation for operation, pattern in OPERATION_PATTERNS.items() if pattern.search(text)]
+    if len(operations) != 1:
+        return None
+
+    operacion = operations[0]
+    # "3D" is a keyword, not a value
+    parametros = PARAMETER_RULES[operacion](re.sub(r'\b3d\b', ' ', text))
+    if not parametros:
+        return None
+
+    command = {'operacion': operacion, 'parametros': parametros}
+    return command if validate_command(command) else None
+
+
+class RuleParser:
+    """parse_command with hit / miss counters (thread safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, user_input):
+        command = parse_command(user_input)
+        with self._lock:
+            if command is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return command
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
@@ -0,0 +1,134 @@
+# =============================================================================
+# PRODUCTION SERVER
+# =============================================================================
+#
+# Serves api.app with waitress instead of the Flask development server:
+#   - One process serves HTTP: one event loop thread handles every socket
+#     (asynchronous I/O: slow clients do not hold a thread) and hands complete
+#     requests to ROBOT_AI_THREADS threads.
+#   - The model runs in the inference scheduler thread or in ROBOT_AI_WORKERS
+#     inference processes (they only generate text, they serve no HTTP);
+#     kinematics, text and figures in ROBOT_AI_CPU_WORKERS threads.
+#   - Every write is flushed at once, so /chat/stream events are not held back.
+#   - The figures of the simulations are rendered in ROBOT_AI_SIMULATION_WORKERS
+#     threads and fetched from /simulation/<id> (simulation_jobs.py).
+#   - The model is loaded and warmed up before the port is opened.
+#   - /chat requests beyond ROBOT_AI_MAX_ACTIVE + ROBOT_AI_MAX_QUEUE are answered
+#     with 503 + Retry-After (admission.py) instead of waiting for a thread.
+#   - SIGTERM / Ctrl+C stops accepting connections, lets the requests in progress
+#     finish (ROBOT_AI_SHUTDOWN_TIMEOUT seconds at most) and stops the workers.
+#
+# HTTP stays in one process on purpose: the prediction log, the simulation jobs,
+# the admission queue and the single-flight table are in-process state that
+# several HTTP processes would not share (and each would load its own model).
+# To scale out, run one serve.py per port behind a reverse proxy with sticky
+# sessions (see the README).
+#
+#   python serve.py
+#   ROBOT_AI_PORT=8000 ROBOT_AI_WORKERS=2 ROBOT_AI_MAX_QUEUE=64 python serve.py
+
+import os
+import signal
+import threading
+import time
+
+from waitress import wasyncore
+from waitress.server import create_server
+
+import api
+import executors
+from chat_processing import process
+from rule_parser import parse_command
+from src import Robot_repr, Liaisons
+
+HOST = os.environ.get('ROBOT_AI_HOST', '0.0.0.0')
+PORT = int(os.environ.get('ROBOT_AI_PORT', 5000))
+# By default one thread per admitted or queued /chat request plus a few for the
+# cheap commands and /api, so that a full queue never blocks them
+THREADS = int(os.environ.get('ROBOT_AI_THREADS', 0)) or api.admission.max_active + api.admission.max_queue + 4
+CPU_WORKERS = int(os.environ.get('ROBOT_AI_CPU_WORKERS', 0)) or os.cpu_count() or 1
+SHUTDOWN_TIMEOUT = float(os.environ.get('ROBOT_AI_SHUTDOWN_TIMEOUT', 30))
+
+# One query per operation, parsed by the rules, to warm up the kinematics and the figures
+WARMUP_QUERIES = [
+    "Calculate T matrices for angles 45°, 90°, 135°",
+    "Calculate robot position with angles 45°, 90°, 135°",
+    "I want to position the robot at (200, 300, 400) mm",
+    "Jacobian with angles 45°, 90°, 135° and velocities 2, 1.5, 3 rad/s",
+    "Show robot in 3D with angles 60°, 120°, 180°",
+]
+
+
+def warm_up():
+    """Loads the model and runs every stage once, before the port is opened"""
+    start = time.perf_counter()
+    ai = api.get_ai_instance()
+    ai.warm_up()
+    Robot_repr.start_render_pool(Liaisons)
+    for query in WARMUP_QUERIES:
+        command = parse_command(query)
+        if command is not None:
+            executors.run_cpu(process, command, None)
+    print(f"✅ Warm-up done in {time.perf_counter() - start:.1f} s")
+
+
+def busy(server):
+    """Requests being processed or responses not fully sent"""
+    return any(channel.requests or channel.total_outbufs_len for channel in list(server.active_channels.values()))
+
+
+def stop(server):
+    """Graceful shutdown: no new connections, drain the requests in progress, then stop the workers"""
+    print("🛑 Stopping: finishing the requests in progress...")
+    # Only the listening socket (the server's close() would also close the trigger the threads use)
+    wasyncore.dispatcher.close(server)
+
+    deadline = time.time() + SHUTDOWN_TIMEOUT
+    while busy(server) and time.time() < deadline:
+        wasyncore.loop(timeout=0.1, map=server._map, use_poll=server.adj.asyncore_use_poll, count=1)
+    if busy(server):
+        print(f"⚠️ Requests still running after {SHUTDOWN_TIMEOUT:.0f} s, closing them")
+
+    server.task_dispatcher.shutdown(timeout=1)
+    wasyncore.close_all(server._map)
+    executors.shutdown()
+    api.simulation_jobs.shutdown()
+    if api.ai_instance is not None:
+        api.ai_instance.shutdown(timeout=5)
+    Robot_repr.shutdown_render_pool()
+    print("👋 Server stopped!")
+
+
+def serve():
+    print("\n" + "="*60)
+    print("🤖 ROBOT AI SERVER")
+    print("="*60)
+
+    executors.configure(CPU_WORKERS)
+    warm_up()
+
+    # send_bytes=1: flush each write from the request thread instead of buffering small
+    # writes until the event loop wakes up (up to 1 s later), which would delay the SSE events
+    server = create_server(api.app, host=HOST, port=PORT, threads=THREADS, send_bytes=1)
+
+    stopping = threading.Event()
+
+    def request_stop(*_):
+        stopping.set()
+        server.pull_trigger()  # Wakes up the event loop right away
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, request_stop)
+
+    print(f"Serving on http://{server.effective_host}:{server.effective_port}")
+    print(f"{THREADS} request threads, {CPU_WORKERS} CPU threads")
+    print("="*60)
+
+    while not stopping.is_set():
+        wasyncore.loop(timeout=server.adj.asyncore_loop_timeout, map=server._map,
+                       use_poll=server.adj.asyncore_use_poll, count=1)
+    stop(server)
+
+
+if __name__ == '__main__':
+    serve()
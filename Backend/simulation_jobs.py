@@ -0,0 +1,109 @@
+# =============================================================================
+# DEFERRED 3D SIMULATION JOBS
+# =============================================================================
+#
+# /chat answers a simulacion_3d query with its text and a job id; the figures
+# are serialized here by a small pool of render threads and fetched afterwards
+# from /simulation/<id>. Finished (or abandoned) jobs are kept in a bounded
+# store: at most max_jobs entries, each one for ttl seconds after it was created.
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from src import Robot_repr
+
+
+class SimulationJobs:
+    """Render pool plus bounded store of simulation jobs (id -> future of the HTML)"""
+
+    def __init__(self, workers=2, max_jobs=256, ttl=600.0):
+        """
+        Args:
+            workers: Threads rendering figures (several figures of one job still use the render pool).
+            max_jobs: Jobs kept in the store; the oldest one is dropped (and cancelled if pending) beyond it.
+            ttl: Seconds a job stays retrievable after it was submitted.
+        """
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+
+        self._jobs = OrderedDict()  # id -> (creation time, future, simulation count), oldest first
+        self._lock = threading.Lock()
+        self._executor = None
+
+        self.submitted = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _render(self, result):
+        from chat_processing import render_simulation
+        render_simulation(result)
+        return Robot_repr.simulations_html(result.payloads) if result.payloads else None
+
+    def _prune(self, now):
+        """Drops the expired jobs and the oldest ones beyond max_jobs (lock held)"""
+        while self._jobs:
+            job_id, (created, future, _) = next(iter(self._jobs.items()))
+            if now - created > self.ttl:
+                self.expired += 1
+            elif len(self._jobs) > self.max_jobs:
+                self.evicted += 1
+            else:
+                break
+            future.cancel()
+            del self._jobs[job_id]
+
+    def submit(self, result):
+        """Queues the figures of a SimulationResult and returns the job id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='robot-ai-render')
+            future = self._executor.submit(self._render, result)
+            self._jobs[job_id] = (time.monotonic(), future, len(result.configurations))
+            self.submitted += 1
+            self._prune(time.monotonic())
+        return job_id
+
+    def get(self, job_id, wait=0):
+        """
+        State of a job, waiting up to wait seconds for it to finish.
+
+        Returns:
+            tuple: ('pending' | 'done' | 'error', HTML or error message, simulation count),
+                   or None for an unknown or expired job
+        """
+        with self._lock:
+            self._prune(time.monotonic())
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        _, future, count = job
+        try:
+            html = future.result(timeout=wait)
+        except TimeoutError:
+            return 'pending', None, count
+        except Exception as e:
+            return 'error', str(e), count
+        return 'done', html, count
+
+    def stats(self):
+        with self._lock:
+            pending = sum(not future.done() for _, future, _ in self._jobs.values())
+            return {
+                'jobs': len(self._jobs),
+                'pending': pending,
+                'submitted': self.submitted,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
@@ -0,0 +1,76 @@
+# =============================================================================
+# SINGLE-FLIGHT COALESCING OF IDENTICAL IN-FLIGHT REQUESTS
+# =============================================================================
+#
+# The first request with a given key runs the computation; identical requests
+# arriving while it is still running wait for it and share its result (or its
+# exception) instead of running their own prediction and processing.
+# Nothing is cached: once the computation finishes the key is free again.
+# A waiting request gives up after its own timeout (the leader keeps running).
+
+import threading
+from concurrent.futures import Future, TimeoutError
+
+
+class SingleFlight:
+    """In-flight computations by key (key -> future of the leader)"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, function, *args, timeout=None, **kwargs):
+        """
+        Runs function(*args, **kwargs), or waits up to timeout seconds for the identical call already in flight.
+
+        Returns:
+            tuple: (result, True if it was shared from another request)
+
+        Raises:
+            TimeoutError: The call in flight did not finish within timeout.
+        """
+        if not self.enabled:
+            return function(*args, **kwargs), False
+
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            try:
+                return future.result(timeout), True
+            except TimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                raise
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts
+            }
@@ -0,0 +1,93 @@
+# =============================================================================
+# PROMPT-LOOKUP SPECULATIVE DECODING FOR THE COMMAND PARSER
+# =============================================================================
+
+import torch
+
+
+def find_draft(source, generated, ngram_size, num_draft_tokens):
+    """
+    Draft the next tokens by copying from the input: the longest suffix of the
+    output (up to ngram_size tokens) is searched in the input token sequence and
+    the tokens that follow its first occurrence are proposed.
+    """
+    for n in range(min(ngram_size, len(generated)), 0, -1):
+        suffix = generated[-n:]
+        for i in range(len(source) - n):
+            if source[i:i + n] == suffix:
+                return source[i + n:i + n + num_draft_tokens]
+    return []
+
+
+def crop_cache(past_key_values, rejected):
+    """Drop the last `rejected` cached decoder positions (rejected draft tokens)"""
+    if hasattr(past_key_values, 'crop'):
+        # A negative value removes that many positions (accepted by every Cache version)
+        past_key_values.crop(-rejected)
+        return past_key_values
+    # Legacy tuple cache: (self_k, self_v, cross_k, cross_v) per layer
+    return tuple(
+        (layer[0][:, :, :-rejected], layer[1][:, :, :-rejected]) + tuple(layer[2:])
+        for layer in past_key_values
+    )
+
+
+def prompt_lookup_greedy(model, inputs, max_length, decoder_start_token_id, eos_token_id,
+                         ngram_size=3, num_draft_tokens=10, tracker=None, encoder_outputs=None):
+    """
+    Greedy decoding of a single input with prompt-lookup drafts.
+
+    Each decoder forward pass verifies the whole draft: the draft tokens are
+    accepted while they equal the greedy choice, plus the model's own token at
+    the first mismatch, so the output is the same as plain greedy decoding.
+
+    Args:
+        tracker: optional JsonObjectTracker, generation ends once the JSON object is closed.
+        encoder_outputs: optional precomputed encoder outputs of the input.
+
+    Returns:
+        tuple: (generated token ids, number of decoder passes, drafted tokens, accepted tokens)
+    """
+    if encoder_outputs is None:
+        encoder_outputs = model.get_encoder()(**inputs)
+    device = inputs['input_ids'].device
+    source = inputs['input_ids'][0].tolist()
+
+    generated = []
+    pending = [decoder_start_token_id]
+    past_key_values = None
+    passes, drafted, accepted_total = 0, 0, 0
+
+    while len(generated) < max_length - 1:
+        room = max_length - 2 - len(generated)  # Keep one position for the token chosen by the model
+        draft = find_draft(source, generated, ngram_size, num_draft_tokens)[:max(room, 0)]
+
+        outputs = model(
+            encoder_outputs=encoder_outputs,
+            attention_mask=inputs['attention_mask'],
+            decoder_input_ids=torch.tensor([pending + draft], device=device),
+            past_key_values=past_key_values,
+            use_cache=True
+        )
+        passes += 1
+        drafted += len(draft)
+
+        # Greedy choice after the last pending token and after each draft token
+        choices = outputs.logits[0, len(pending) - 1:].argmax(dim=-1).tolist()
+        accepted = 0
+        while accepted < len(draft) and draft[accepted] == choices[accepted]:
+            accepted += 1
+        accepted_total += accepted
+
+        past_key_values = outputs.past_key_values
+        if accepted < len(draft):
+            past_key_values = crop_cache(past_key_values, len(draft) - accepted)
+
+        new_tokens = draft[:accepted] + [choices[accepted]]
+        for token_id in new_tokens:
+            generated.append(token_id)
+            if token_id == eos_token_id or (tracker is not None and tracker.is_complete(generated)):
+                return generated, passes, drafted, accepted_total
+        pending = [new_tokens[-1]]
+
+    return generated, passes, drafted, accepted_total
@@ -1,9 +1,28 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+
 import plotly.graph_objects as go
 from .const_v import *
+from .render_cache import render_cache, render_key, DIV_ID_PLACEHOLDER
+from . import metrics
+from .metrics import span, timed
 
 
 """FUNCTION TO MODEL THE ROBOT ARM IN 3D. THE FUNCTION IS DECLARED AT THE END"""
 simulation_figures = []
+def simulations_html(payloads):
+    """HTML of a list of serialized figures (render_figure_html), numbered from 1"""
+    all_html = ""
+    for i, payload in enumerate(payloads):
+        # Las figuras ya vienen serializadas (cache), solo falta su div_id definitivo
+        html = payload.replace(DIV_ID_PLACEHOLDER, f"simulation_{i+1}")
+        
+        # SIEMPRE envolver en simulation-container, incluso para UNA sola simulación
+        all_html += f"<div class='simulation-container'><h4>Solution {i+1}</h4>{html}</div>"
+    return all_html
+
 def get_all_simulations_html():
     """Retorna HTML de todas las simulaciones acumuladas"""
     global simulation_figures
@@ -12,16 +31,7 @@ def get_all_simulations_html():
         return None
     
     # CAMBIO PRINCIPAL: SIEMPRE usar simulation-container wrapper
-    all_html = ""
-    for i, fig in enumerate(simulation_figures):
-        html = fig.to_html(
-            include_plotlyjs='cdn' if i == 0 else False,  # Solo incluir JS en la primera
-            div_id=f"simulation_{i+1}",
-            config={'displayModeBar': True}
-        )
-        
-        # SIEMPRE envolver en simulation-container, incluso para UNA sola simulación
-        all_html += f"<div class='simulation-container'><h4>Solution {i+1}</h4>{html}</div>"
+    all_html = simulations_html(simulation_figures)
     
     # Limpiar para próxima vez
     simulation_figures = []
@@ -73,34 +83,53 @@ def generate_cylinder(p1, p2, radius=50, resolution=20):
 
     return x, y, z
 
-def bras_rob_model3D(Liaisons, q, web_mode=False):
-    global simulation_figures
+def arm_points(Liaisons, qs):
+    """
+    Computes the joint points of the arm for one or several configurations in a single vectorized pass.
 
-    q_rad = np.radians(q)
+    :param Liaisons: List of link dimensions [horizontal, vertical, depth].
+    :param qs: Joint angles in degrees, shape (3,) or (N, 3).
+    :return: Array of shape (N, 7, 3) with the points [base, p1, ..., p6] of each configuration.
+    """
+    q_rad = np.radians(np.atleast_2d(np.asarray(qs, dtype=np.float64)))
 
     L1 = Liaisons[0]
     L2 = Liaisons[1]
     L3 = Liaisons[2]
 
     # Angles
-    teta1 = q_rad[0]
-    teta2 = q_rad[1]
-    teta3 = q_rad[2]
+    teta1 = q_rad[:, 0]
+    teta2 = q_rad[:, 1]
+    teta3 = q_rad[:, 2]
 
     # Calculate intermediate coordinates for the 3D plot
-    x1, y1, z1 = 0, 0, L1[1]
+    zero = np.zeros_like(teta1)
+    x1, y1, z1 = zero, zero, zero + L1[1]
     x2, y2, z2 = L1[0] * np.cos(teta1), L1[0] * np.sin(teta1), z1
     x3, y3, z3 = x2 + L2[2] * np.cos(teta1 + np.pi / 2), y2 + L2[2] * np.sin(teta1 + np.pi / 2), z2
     x4, y4, z4 = x3 + L2[1] * np.cos(teta2) * np.cos(teta1), y3 + L2[1] * np.cos(teta2) * np.sin(teta1), z3 + L2[1] * np.sin(teta2)
     x5, y5, z5 = x4 + L3[2] * np.cos(teta1 - np.pi / 2), y4 + L3[2] * np.sin(teta1 - np.pi / 2), z4
     x6, y6, z6 = x5 + L3[1] * np.cos(teta3 + teta2) * np.cos(teta1), y5 + L3[1] * np.cos(teta3 + teta2) * np.sin(teta1), z5 + L3[1] * np.sin(teta3 + teta2)
 
+    xs = np.stack([zero, x1, x2, x3, x4, x5, x6], axis=1)
+    ys = np.stack([zero, y1, y2, y3, y4, y5, y6], axis=1)
+    zs = np.stack([zero, z1, z2, z3, z4, z5, z6], axis=1)
+    return np.stack([xs, ys, zs], axis=2)
+
+@timed('render.build_figure')
+def build_arm_figure(Liaisons, q, points=None):
+    """
+    Builds the plotly figure of the arm for the joint angles q (in degrees).
+    The joint points can be passed already computed by arm_points.
+    """
+    if points is None:
+        points = arm_points(Liaisons, q)[0]
+
     # Add cylinders
     cylinders = []
-    positions = [([0, 0, 0], [x1, y1, z1]), ([x2, y2, z2], [x3, y3, z3]), ([x4, y4, z4], [x5, y5, z5])]
-    for p_start, p_end in positions:
-        start_quarter = p_start + 0.25 * (np.array(p_end) - np.array(p_start))
-        end_quarter = p_start + 0.75 * (np.array(p_end) - np.array(p_start))
+    for p_start, p_end in [(points[0], points[1]), (points[2], points[3]), (points[4], points[5])]:
+        start_quarter = p_start + 0.25 * (p_end - p_start)
+        end_quarter = p_start + 0.75 * (p_end - p_start)
         x_cyl, y_cyl, z_cyl = generate_cylinder(start_quarter, end_quarter)
         cylinders.append(go.Mesh3d(
             x=x_cyl, y=y_cyl, z=z_cyl,
@@ -113,9 +142,9 @@ def bras_rob_model3D(Liaisons, q, web_mode=False):
     # Create the figure with segments and cylinders
     fig = go.Figure(data=[
         go.Scatter3d(
-            x=[0, x1, x2, x3, x4, x5, x6],
-            y=[0, y1, y2, y3, y4, y5, y6],
-            z=[0, z1, z2, z3, z4, z5, z6],
+            x=points[:, 0].tolist(),
+            y=points[:, 1].tolist(),
+            z=points[:, 2].tolist(),
             mode='lines+markers',
             marker=dict(size=4),
             line=dict(color='blue', width=5),
@@ -130,10 +159,164 @@ def bras_rob_model3D(Liaisons, q, web_mode=False):
         zaxis=dict(title="Z Axis", range=[0, 2 * 2110])
     ))
 
+    return fig
+
+def serialize_arm_figure(Liaisons, q, include_plotlyjs, points=None):
+    """Builds and serializes the figure of the arm, with DIV_ID_PLACEHOLDER as div id."""
+    fig = build_arm_figure(Liaisons, q, points)
+    with span('render.to_html'):
+        return fig.to_html(
+            include_plotlyjs=include_plotlyjs,
+            div_id=DIV_ID_PLACEHOLDER,
+            config={'displayModeBar': True}
+        )
+
+@timed('render.figure')
+def render_figure_html(Liaisons, q, include_plotlyjs):
+    """
+    Returns the serialized figure of the arm, with DIV_ID_PLACEHOLDER as div id.
+    Repeated configurations are served from the render cache, skipping both the
+    geometry computation and the to_html cost.
+    """
+    key = render_key(Liaisons, q, include_plotlyjs=include_plotlyjs, displayModeBar=True)
+    payload = render_cache.get(key)
+    if payload is None:
+        payload = serialize_arm_figure(Liaisons, q, include_plotlyjs)
+        render_cache.put(key, payload)
+    return payload
+
+def serialize_in_worker(Liaisons, q, include_plotlyjs, points=None):
+    """
+    serialize_arm_figure for the render processes: returns the payload and the
+    timings of its stages (ms), since the metrics of a child process are not
+    visible in the server process.
+    """
+    metrics.reset()
+    payload = serialize_arm_figure(Liaisons, q, include_plotlyjs, points)
+    return payload, {stage: histogram['mean_ms'] * histogram['count'] for stage, histogram in metrics.snapshot().items()}
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def render_context():
+    """
+    Start method of the render processes. They are never forked from the server
+    process, which already runs threads (request threads, inference scheduler,
+    torch/OpenMP pools): a forked child could inherit one of their locks held.
+    A fork server (a clean single-threaded process) is used where available,
+    spawn elsewhere (Windows).
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Only this module: the server's main module would pull in the model stack
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+def get_render_pool():
+    """Returns the process pool that serializes the figures of a batch (created on first use)."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=render_workers, mp_context=render_context())
+        return _render_pool
+
+def start_render_pool(Liaisons):
+    """Creates the render pool and starts its processes (at server startup, not on the first request)."""
+    if render_workers > 1:
+        try:
+            # One figure per process: also pays the lazy initializations of plotly
+            list(get_render_pool().map(serialize_in_worker, [Liaisons] * render_workers,
+                                       [[0, 0, 0]] * render_workers, [False] * render_workers,
+                                       timeout=render_timeout))
+        except (BrokenProcessPool, TimeoutError):
+            print("⚠️ The render processes could not be started, the figures will be serialized in-process")
+            shutdown_render_pool()
+
+def shutdown_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
+
+@timed('render.batch')
+def render_figures_html(Liaisons, qs, first_index=1):
+    """
+    Batch version of render_figure_html for several configurations (IK solutions).
+    The geometry of every configuration is computed in one vectorized pass and the
+    cache misses are serialized concurrently in the render pool.
+
+    :param first_index: Index of the first figure in the page (only the first one includes plotly.js).
+    :return: List of payloads, in the same order as qs.
+    """
+    qs = np.atleast_2d(np.asarray(qs, dtype=np.float64))
+    points = arm_points(Liaisons, qs)
+
+    payloads = [None] * len(qs)
+    misses = []
+    for i, q in enumerate(qs):
+        include_plotlyjs = 'cdn' if first_index + i == 1 else False
+        key = render_key(Liaisons, q, include_plotlyjs=include_plotlyjs, displayModeBar=True)
+        payloads[i] = render_cache.get(key)
+        if payloads[i] is None:
+            misses.append((i, key, include_plotlyjs))
+
+    if len(misses) > 1 and render_workers > 1:
+        try:
+            pool = get_render_pool()
+            futures = {pool.submit(serialize_in_worker, Liaisons, qs[i], include_plotlyjs, points[i]): (i, key)
+                       for i, key, include_plotlyjs in misses}
+            # One deadline for the whole batch (not render_timeout per figure)
+            done, not_done = wait(futures, timeout=render_timeout)
+            for future in done:
+                i, key = futures[future]
+                payloads[i], timings = future.result()
+                render_cache.put(key, payloads[i])
+                if metrics.enabled:
+                    for stage, ms in timings.items():
+                        metrics.record(stage, ms / 1000)
+            if not_done:
+                # Figuras que no llegan a tiempo: se serializan en este mismo proceso. cancel() solo
+                # descarta las que no han empezado; las que se están serializando ocupan su proceso
+                # hasta terminar, así que el pool se sustituye por uno nuevo para los siguientes batches
+                for future in not_done:
+                    future.cancel()
+                shutdown_render_pool()
+        except BrokenProcessPool:
+            # Si el pool muere, se serializa en este mismo proceso
+            shutdown_render_pool()
+
+    for i, key, include_plotlyjs in misses:
+        if payloads[i] is None:
+            payloads[i] = serialize_arm_figure(Liaisons, qs[i], include_plotlyjs, points[i])
+            render_cache.put(key, payloads[i])
+
+    return payloads
+
+def bras_rob_model3D(Liaisons, q, web_mode=False):
+    global simulation_figures
+
     if web_mode:
-        # Acumular figura en lugar de mostrarla
-        simulation_figures.append(fig)
-        return fig.to_html(include_plotlyjs='cdn', div_id=f"simulation_{len(simulation_figures)}")
+        # Acumular figura serializada en lugar de mostrarla (solo incluir JS en la primera)
+        index = len(simulation_figures) + 1
+        payload = render_figure_html(Liaisons, q, include_plotlyjs='cdn' if index == 1 else False)
+        simulation_figures.append(payload)
+        return payload.replace(DIV_ID_PLACEHOLDER, f"simulation_{index}")
     else:
         # Comportamiento normal (mostrar ventana)
-        return fig.show()
+        return build_arm_figure(Liaisons, q).show()
+
+def bras_rob_model3D_batch(Liaisons, qs, web_mode=False):
+    """Same as bras_rob_model3D for several configurations at once (e.g. every IK solution)."""
+    global simulation_figures
+
+    if web_mode:
+        first_index = len(simulation_figures) + 1
+        payloads = render_figures_html(Liaisons, qs, first_index=first_index)
+        simulation_figures.extend(payloads)
+        return [payload.replace(DIV_ID_PLACEHOLDER, f"simulation_{first_index + i}")
+                for i, payload in enumerate(payloads)]
+    else:
+        points = arm_points(Liaisons, qs)
+        return [build_arm_figure(Liaisons, q, p).show() for q, p in zip(qs, points)]
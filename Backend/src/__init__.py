@@ -2,5 +2,6 @@ from .main_analyse import *
 from .const_v import *
 from .trajectory_generation import *
 from .modele_differentiel import *
+from .kinematics_batch import *
 
-__all__ = ["main_analyse", "const_v", "trajectory_generation", "modele_differentiel"]
+__all__ = ["main_analyse", "const_v", "trajectory_generation", "modele_differentiel", "kinematics_batch"]
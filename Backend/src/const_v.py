@@ -1,3 +1,4 @@
+import os
 import numpy as np
 
 # Modified Denavit-Hartenberg parameters
@@ -20,3 +21,9 @@ Liaisons = [
     [0, 825, 352],  # Joint 2
     [0, 735, 352],  # Joint 3
 ]
+
+# For the render cache of the 3D simulations
+render_decimals = decimals  # Angles are rounded to display precision before building the cache key
+render_cache_max_bytes = 32 * 1024 * 1024  # Memory budget of the serialized figures
+render_workers = min(4, os.cpu_count() or 1)  # Worker processes serializing the figures of several IK solutions
+render_timeout = 30  # Seconds to wait for a figure from the render processes before serializing it in-process
@@ -0,0 +1,195 @@
+"""VECTORIZED VERSIONS OF THE KINEMATIC MODELS, FOR N CONFIGURATIONS AT ONCE"""
+
+import numpy as np
+import sympy as sp
+
+from .modele_differentiel import Jacob_analytique
+
+
+__all__ = ["matrices_batch", "matrice_Tn_batch", "mgd_batch", "mgi_batch", "Jacob_geo_batch",
+           "Jacob_analytique_batch", "MDD_batch", "MDI_batch"]
+
+
+def matrices_batch(qs, dh):
+    """
+    Batch version of generate_transformation_matrices (without rounding).
+
+    Arguments:
+        qs: Array (N, 3) of joint angles in degrees.
+        dh: Dictionary containing DH parameters (a_i_m1, alpha_i_m1, r_i).
+
+    Returns:
+        Array (N, number of links, 4, 4) of transformation matrices T(i, i+1).
+    """
+    qs = np.atleast_2d(np.asarray(qs, dtype=np.float64))
+    n_links = len(dh['a_i_m1'])
+
+    # Fixed angle for the final joint, as in generate_transformation_matrices
+    q = np.zeros((len(qs), n_links))
+    q[:, :qs.shape[1]] = qs
+    q = np.radians(q)
+
+    a = np.asarray(dh['a_i_m1'], dtype=np.float64)
+    alpha = np.asarray(dh['alpha_i_m1'], dtype=np.float64)
+    r = np.asarray(dh['r_i'], dtype=np.float64)
+    c, s = np.cos(q), np.sin(q)
+    ca, sa = np.cos(alpha), np.sin(alpha)
+
+    matrices = np.zeros((len(qs), n_links, 4, 4))
+    matrices[..., 0, 0] = c
+    matrices[..., 0, 1] = -s
+    matrices[..., 0, 3] = a
+    matrices[..., 1, 0] = s * ca
+    matrices[..., 1, 1] = c * ca
+    matrices[..., 1, 2] = -sa
+    matrices[..., 1, 3] = -r * sa
+    matrices[..., 2, 0] = s * sa
+    matrices[..., 2, 1] = c * sa
+    matrices[..., 2, 2] = ca
+    matrices[..., 2, 3] = r * ca
+    matrices[..., 3, 3] = 1
+    return matrices
+
+
+def matrice_Tn_batch(dh, qs):
+    """
+    Batch version of matrice_Tn.
+
+    Returns:
+        Array (N, 4, 4) of T0,n matrices.
+    """
+    matrices = matrices_batch(qs, dh)
+    result = matrices[:, 0]
+    for i in range(1, matrices.shape[1]):
+        result = result @ matrices[:, i]
+    return result
+
+
+def mgd_batch(qs, Liaisons):
+    """
+    Batch version of mgd.
+
+    Arguments:
+        qs: Array (N, 3) of joint angles in degrees.
+        Liaisons: List of link dimensions [horizontal, vertical, depth].
+
+    Returns:
+        Array (N, 3) of operational coordinates [x, y, z].
+    """
+    L1, L2, L3 = Liaisons
+    teta1, teta2, teta3 = np.radians(np.atleast_2d(np.asarray(qs, dtype=np.float64))).T
+
+    c1, s1 = np.cos(teta1), np.sin(teta1)
+    reach = L1[0] + L2[1] * np.cos(teta2) + L3[1] * np.cos(teta3 + teta2)
+    depth = L2[2] - L3[2]
+
+    # Same terms as mgd: cos(teta1 +- pi/2) = -+sin(teta1), sin(teta1 +- pi/2) = +-cos(teta1)
+    x = reach * c1 - depth * s1
+    y = reach * s1 + depth * c1
+    z = L1[1] + L2[1] * np.sin(teta2) + L3[1] * np.sin(teta3 + teta2)
+    return np.stack([x, y, z], axis=1)
+
+
+def mgi_batch(Xds, Liaisons):
+    """
+    Batch version of mgi.
+
+    Arguments:
+        Xds: Array (N, 3) of target positions.
+        Liaisons: List of link dimensions [horizontal, vertical, depth].
+
+    Returns:
+        solutions: Array (N, 4, 3) of joint angles in radians, in the order of mgi.
+        valid: Boolean array (N, 4); mgi(Xds[i]) == solutions[i][valid[i]].
+    """
+    x, y, z = np.atleast_2d(np.asarray(Xds, dtype=np.float64)).T
+    L1, L2, L3 = Liaisons
+    X, Y = L2[1], L3[1]
+
+    q1_1 = np.arctan2(y, x)
+    solutions, valid = [], []
+    for q1 in (q1_1, q1_1 - np.pi):
+        Z1 = np.cos(q1) * x + np.sin(q1) * y - L1[0]
+        Z2 = z - L1[1]
+
+        c3 = (Z1 ** 2 + Z2 ** 2 - X ** 2 - Y ** 2) / (2 * X * Y)
+        reachable = (c3 >= -1) & (c3 <= 1)
+        c3 = np.clip(c3, -1, 1)
+
+        for sign in (1, -1):
+            q3 = np.arctan2(sign * np.sqrt(1 - c3 ** 2), c3)
+            B1 = X + Y * c3
+            B2 = Y * np.sin(q3)
+            s2 = (B1 * Z2 - B2 * Z1) / (B1 ** 2 + B2 ** 2)
+            c2 = (B1 * Z1 + B2 * Z2) / (B1 ** 2 + B2 ** 2)
+            q2 = np.arctan2(s2, c2)
+            solutions.append(np.stack([q1, q2, q3], axis=1))
+            valid.append(reachable)
+
+    return np.stack(solutions, axis=1), np.stack(valid, axis=1)
+
+
+def Jacob_geo_batch(matrices):
+    """
+    Batch version of Jacob_geo.
+
+    Arguments:
+        matrices: Array (N, 4, 4, 4) of transformation matrices (see matrices_batch).
+
+    Returns:
+        Array (N, 6, 3) of geometric Jacobians.
+    """
+    T_01 = matrices[:, 0]
+    T_02 = T_01 @ matrices[:, 1]
+    T_03 = T_02 @ matrices[:, 2]
+    T_0T = T_03 @ matrices[:, 3]
+    ot = T_0T[:, :3, 3]
+
+    J = np.empty((len(matrices), 6, 3))
+    for k, T in enumerate((T_01, T_02, T_03)):
+        z, o = T[:, :3, 2], T[:, :3, 3]
+        J[:, :3, k] = np.cross(z, ot - o)
+        J[:, 3:, k] = z
+    return J
+
+
+_jacob_analytique_entries = None
+
+
+def Jacob_analytique_batch(qs):
+    """
+    Batch version of Jacob_analytique(q): the symbolic Jacobian is compiled once
+    into numpy functions of ci, si instead of substituting it for each configuration.
+
+    Arguments:
+        qs: Array (N, 3) of joint angles in degrees.
+
+    Returns:
+        Array (N, 6, 3) of analytical Jacobians.
+    """
+    global _jacob_analytique_entries
+    if _jacob_analytique_entries is None:
+        symbols = sp.symbols('c1 s1 c2 s2 c3 s3')
+        J = Jacob_analytique()
+        _jacob_analytique_entries = [[sp.lambdify(symbols, J[i, j], 'numpy') for j in range(J.shape[1])]
+                                     for i in range(J.shape[0])]
+
+    q = np.radians(np.atleast_2d(np.asarray(qs, dtype=np.float64)))
+    c, s = np.cos(q), np.sin(q)
+    args = (c[:, 0], s[:, 0], c[:, 1], s[:, 1], c[:, 2], s[:, 2])
+
+    J = np.empty((len(q), len(_jacob_analytique_entries), len(_jacob_analytique_entries[0])))
+    for i, row in enumerate(_jacob_analytique_entries):
+        for j, entry in enumerate(row):
+            J[:, i, j] = entry(*args)
+    return J
+
+
+def MDD_batch(vs, Js):
+    """Batch version of MDD: (N, 3) joint velocities, (N, 6, 3) Jacobians -> (N, 6)."""
+    return np.einsum('nij,nj->ni', Js, vs)
+
+
+def MDI_batch(xs, Js):
+    """Batch version of MDI: (N, k) OT velocities, (N, k, 3) Jacobians -> (N, 3)."""
+    return np.einsum('nji,ni->nj', np.linalg.pinv(Js), xs)
@@ -0,0 +1,150 @@
+"""PER-STAGE LATENCY HISTOGRAMS OF THE REQUEST PATH (IN MEMORY)"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Upper bounds of the histogram buckets, in milliseconds (the last bucket is open)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# ROBOT_AI_METRICS=0 turns every span into a no-op
+enabled = os.environ.get('ROBOT_AI_METRICS', '1') != '0'
+
+
+class Histogram:
+    """Latency histogram of one stage: bucket counts, count, sum, min and max (ms)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def merge(self, other):
+        """Adds the measurements of another histogram (same buckets)."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the open bucket)."""
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'min_ms': self.min if self.count else 0.0,
+            'max_ms': self.max,
+            'p50_ms': self.quantile(0.5),
+            'p90_ms': self.quantile(0.9),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {f"le_{bound}": count for bound, count in zip(BUCKETS_MS, self.counts)} | {'inf': self.counts[-1]}
+        }
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def record(stage, seconds):
+    """Adds one measurement (in seconds) to the histogram of the stage."""
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.add(seconds * 1000)
+
+
+@contextmanager
+def _timed_span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+def span(stage):
+    """
+    Context manager timing a stage of the request path:
+
+        with span('predict.generate'):
+            ...
+
+    When metrics are disabled it only costs the `enabled` check.
+    """
+    return _timed_span(stage) if enabled else _null_span
+
+
+def timed(stage):
+    """Decorator version of span."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with _timed_span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Per-stage histograms, sorted by stage name."""
+    with _lock:
+        return {stage: _histograms[stage].snapshot() for stage in sorted(_histograms)}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def drain():
+    """Takes out every histogram (picklable), leaving them empty; see merge."""
+    with _lock:
+        histograms = dict(_histograms)
+        _histograms.clear()
+    return histograms
+
+
+def merge(histograms):
+    """Adds the histograms drained in another process (the inference workers)."""
+    with _lock:
+        for stage, other in histograms.items():
+            histogram = _histograms.get(stage)
+            if histogram is None:
+                histogram = _histograms[stage] = Histogram()
+            histogram.merge(other)
@@ -0,0 +1,91 @@
+"""CACHE OF SERIALIZED 3D FIGURES, SHARED BY EVERY SIMULATION REQUEST"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .const_v import render_decimals, render_cache_max_bytes
+
+
+# Placeholder used as div_id when serializing; replaced by the real id on each hit
+DIV_ID_PLACEHOLDER = "__robot_simulation_div__"
+
+
+def render_key(Liaisons, q, **options):
+    """
+    Builds the cache key of a figure.
+
+    Arguments:
+        Liaisons: List of link dimensions [horizontal, vertical, depth].
+        q: Joint angles in degrees (q1, q2, q3).
+        options: Render options that change the serialized output (include_plotlyjs, ...).
+
+    Returns:
+        Hashable tuple (angles rounded to display precision, robot model, options).
+    """
+    q_key = tuple(float(v) + 0.0 for v in np.round(np.asarray(q, dtype=np.float64), render_decimals))
+    model_key = tuple(tuple(float(v) for v in liaison) for liaison in Liaisons)
+    return q_key, model_key, tuple(sorted(options.items()))
+
+
+class RenderCache:
+    """
+    LRU cache of serialized figure payloads with a memory budget in bytes.
+    The payloads are stored with DIV_ID_PLACEHOLDER as div id.
+    """
+
+    def __init__(self, max_bytes=render_cache_max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        size = len(payload)
+        if size > self.max_bytes:
+            return  # Never cache a payload larger than the whole budget
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = payload
+            self._size += size
+            # Evict least recently used payloads until we fit in the budget
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+render_cache = RenderCache()
@@ -0,0 +1,73 @@
+import os
+import shutil
+
+import pytest
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+from tokenizers.processors import TemplateProcessing
+from transformers import PreTrainedTokenizerFast, T5Config, T5ForConditionalGeneration
+
+# Characters of the queries and of the JSON commands, one token each
+CHARACTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789{}[]":,.-_ =°/()|\'?π'
+
+
+@pytest.fixture(scope='session')
+def tiny_model(tmp_path_factory):
+    """
+    Tiny T5 with random weights and a character tokenizer, so the model code runs
+    offline and in milliseconds: the Hugging Face directory (used as the base model)
+    and the same weights as a trained state dict.
+
+    Returns:
+        tuple: (model directory, .pth path)
+    """
+    root = tmp_path_factory.mktemp('tiny_model')
+    vocab = {'<pad>': 0, '</s>': 1, '<unk>': 2}
+    for character in CHARACTERS:
+        vocab.setdefault(character, len(vocab))
+
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token='<unk>'))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split('', 'isolated')
+    tokenizer.decoder = decoders.Fuse()
+    tokenizer.post_processor = TemplateProcessing(single='$A </s>', special_tokens=[('</s>', 1)])
+    PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token='<pad>', eos_token='</s>',
+                            unk_token='<unk>').save_pretrained(root / 'model')
+
+    torch.manual_seed(0)
+    model = T5ForConditionalGeneration(T5Config(
+        vocab_size=len(vocab), d_model=32, d_ff=64, num_layers=2, num_heads=2, d_kv=16,
+        decoder_start_token_id=0, pad_token_id=0, eos_token_id=1))
+    model.save_pretrained(root / 'model')
+    torch.save(model.state_dict(), root / 'model.pth')
+    return str(root / 'model'), str(root / 'model.pth')
+
+
+@pytest.fixture
+def make_ai(tiny_model, tmp_path):
+    """Factory of loaded RoboticsAI instances on the tiny model; every checkpoint they write goes to tmp_path"""
+    from model_chat import RoboticsAI
+
+    model_dir, weights = tiny_model
+    model_path = tmp_path / 'model_8427.pth'
+    if not model_path.exists():
+        shutil.copy(weights, model_path)
+
+    instances = []
+
+    def make(load=True, **kwargs):
+        ai = RoboticsAI(**kwargs)
+        ai.config.update(
+            model_name=model_dir,
+            model_path=str(model_path),
+            quantized_model_path=str(tmp_path / 'model_8427_int8.pth'),
+            converted_model_path=str(tmp_path / 'model_8427'),
+            max_length=48
+        )
+        if load:
+            assert ai.load_model()
+        instances.append(ai)
+        return ai
+
+    yield make
+    for ai in instances:
+        ai.shutdown(timeout=5)
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def hold_slot(controller):
+    """Takes a slot in another thread until the returned event is set"""
+    admitted, release = threading.Event(), threading.Event()
+
+    def run():
+        with controller.admit():
+            admitted.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert admitted.wait(5)
+    return release, thread
+
+
+def test_rejects_at_once_when_queue_is_full():
+    controller = AdmissionController(max_active=1, max_queue=0, timeout=5)
+    release, thread = hold_slot(controller)
+    try:
+        with pytest.raises(Overloaded) as error:
+            with controller.admit():
+                pass
+        assert error.value.reason == "Server busy, queue full"
+        assert error.value.retry_after >= 1
+        assert controller.stats()['rejected'] == 1
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_rejects_when_deadline_passes_in_queue():
+    controller = AdmissionController(max_active=1, max_queue=4, timeout=5)
+    release, thread = hold_slot(controller)
+    try:
+        with pytest.raises(Overloaded) as error:
+            with controller.admit(timeout=0.05):
+                pass
+        assert error.value.reason == "Server busy, request deadline exceeded"
+        stats = controller.stats()
+        assert stats['expired'] == 1 and stats['queued'] == 0
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_admits_queued_request_once_a_slot_frees():
+    controller = AdmissionController(max_active=1, max_queue=4, timeout=5)
+    release, thread = hold_slot(controller)
+    threading.Timer(0.05, release.set).start()
+    with controller.admit(timeout=5):
+        assert controller.stats()['active'] == 1
+    thread.join()
+    assert controller.stats()['admitted'] == 2
@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+import chat_processing
+from chat_formatting import format_text
+from chat_results import SimulationResult
+
+# Text printed by chat_processing.processing() before the handlers returned result
+# objects, for one prediction of each handler branch (log fallbacks included)
+with open(os.path.join(os.path.dirname(__file__), 'data', 'chat_text.json'), encoding='utf-8') as f:
+    GOLDEN = json.load(f)
+
+
+class Log:
+    """Stands in for RoboticsAI: only the prediction log is read"""
+
+    def __init__(self, log):
+        self.log = log
+
+    def get_log_for_processing(self):
+        return self.log
+
+
+@pytest.fixture(autouse=True)
+def no_ai_reference():
+    yield
+    chat_processing.set_ai_reference(None)
+
+
+@pytest.mark.parametrize('case', sorted(GOLDEN))
+def test_format_text_matches_the_old_printed_output(case):
+    golden = GOLDEN[case]
+    chat_processing.set_ai_reference(Log(golden['log']))
+    result = chat_processing.process(golden['prediction'], golden['error'], render_figures=False)
+    assert format_text(result) == golden['text']
+
+
+def test_processing_still_prints_the_text(capsys):
+    golden = GOLDEN['direct_kinematics']
+    chat_processing.processing(golden['prediction'], golden['error'])
+    assert capsys.readouterr().out == golden['text']
+
+
+def test_simulation_results_carry_the_figures_without_rendering():
+    golden = GOLDEN['simulation_from_angles']
+    result = chat_processing.process(golden['prediction'], None, render_figures=False)
+    assert isinstance(result, SimulationResult)
+    assert result.payloads == []
+    data = result.to_dict()
+    assert data['type'] == 'simulacion_3d'
+    assert 'payloads' not in data
+    json.dumps(data)
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+import api
+
+ANGLES = {'q1': 30, 'q2': 45, 'q3': 60, 'unidad_angular': 'grados'}
+PREDICTIONS = {
+    "posicion con 30, 45, 60": {'operacion': 'cinematica_directa', 'parametros': ANGLES},
+    "muestra el robot con 30, 45, 60": {'operacion': 'simulacion_3d',
+                                        'parametros': dict(ANGLES, posicion_efector={'x': None, 'y': None, 'z': None,
+                                                                                     'unidad_posicion': 'mm'})},
+}
+
+
+class FakeAI:
+    """The parts of RoboticsAI that the chat routes use, with canned predictions"""
+
+    def __init__(self):
+        self.config = {'generate_timeout': 5}
+        self.prediction_log = []
+
+    def predict(self, user_input, timeout=None):
+        if user_input not in PREDICTIONS:
+            return "{not json", "Invalid JSON: Expecting property name..."
+        return PREDICTIONS[user_input], None
+
+    def show_help(self):
+        return "HELP"
+
+    def get_log_for_processing(self):
+        return self.prediction_log
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, 'ai_instance', FakeAI())
+    monkeypatch.setattr(api.simulation_jobs, 'submit', lambda result: 'job-1')
+    api.app.config['TESTING'] = True
+    return api.app.test_client()
+
+
+def stream(client, message):
+    """(event, data) pairs of a /chat/stream response"""
+    response = client.post('/chat/stream', json={'message': message})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_simulation_events_come_in_pipeline_order(client):
+    events = stream(client, "muestra el robot con 30, 45, 60")
+    assert [event for event, _ in events] == ['prediction', 'result', 'simulation', 'done']
+
+    assert events[0][1] == {'prediction': PREDICTIONS["muestra el robot con 30, 45, 60"], 'error': None}
+    assert events[1][1]['result']['type'] == 'simulacion_3d'
+    assert events[2][1] == {'simulation_id': 'job-1', 'simulation_url': '/simulation/job-1', 'simulation_count': 1}
+    assert events[3][1] == {}
+
+
+def test_results_without_figures_skip_the_simulation_event(client):
+    events = stream(client, "posicion con 30, 45, 60")
+    assert [event for event, _ in events] == ['prediction', 'result', 'done']
+    assert "Coordinates of the end effector" in events[1][1]['response']
+    assert events[1][1]['result']['type'] == 'cinematica_directa'
+
+
+def test_prediction_errors_are_streamed_as_results(client):
+    events = stream(client, "no es una orden")
+    assert [event for event, _ in events] == ['prediction', 'result', 'done']
+    assert events[0][1]['prediction'] is None
+    assert events[1][1]['response'].startswith("Error: Invalid JSON")
+
+
+def test_commands_without_the_model_send_result_and_done(client):
+    events = stream(client, "help")
+    assert events == [('result', {'response': "HELP\n", 'result': None}), ('done', {})]
+
+
+def test_overloaded_requests_get_503_before_the_stream(client, monkeypatch):
+    def reject(*args, **kwargs):
+        raise api.Overloaded("Server busy, queue full", 2)
+
+    monkeypatch.setattr(api, 'coalesce', reject)
+    response = client.post('/chat/stream', json={'message': "posicion con 30, 45, 60"})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+
+
+def test_invalid_requests_get_400(client):
+    assert client.post('/chat/stream', json={'message': ""}).status_code == 400
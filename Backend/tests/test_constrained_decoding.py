@@ -0,0 +1,49 @@
+import pytest
+
+from constrained_decoding import INITIAL_STATE, advance_text, forced_text
+
+ANGLES = '"q1": {q}, "q2": 90, "q3": 135, "unidad_angular": "grados"'
+
+
+def accepts(text):
+    state = advance_text(INITIAL_STATE, text)
+    return state is not None and state.mode == 'done'
+
+
+@pytest.mark.parametrize('text', [
+    '{"operacion": "cinematica_directa", "parametros": {' + ANGLES.format(q='"45"') + '}}',
+    '{"operacion": "cinematica_directa", "parametros": {' + ANGLES.format(q='-45.5') + '}}',
+    '{"operacion": "cinematica_inversa", "parametros": {"posicion_objetivo": '
+    '{"x": 200, "y": 300, "z": 400, "unidad_posicion": "mm"}}}',
+    '{"operacion": "simulacion_3d", "parametros": {"posicion_efector": '
+    '{"x": 1, "y": 2, "z": 3, "unidad_posicion": ""}}}',
+])
+def test_accepts_commands_of_the_schema(text):
+    assert accepts(text)
+
+
+@pytest.mark.parametrize('number', ['1e5', '1E5', '2.5e-3', '0e+0', '-1.25E10'])
+def test_accepts_json_exponents(number):
+    assert accepts('{"operacion": "cinematica_directa", "parametros": {' + ANGLES.format(q=number) + '}}')
+
+
+@pytest.mark.parametrize('number', ['01', '1.', '1e', '1e+', '1.e5', '1e5.0', '1ee5', '--1', '.5'])
+def test_rejects_invalid_numbers(number):
+    assert not accepts('{"operacion": "cinematica_directa", "parametros": {' + ANGLES.format(q=number) + '}}')
+
+
+@pytest.mark.parametrize('text', [
+    '{"operacion": "volar", "parametros": {}}',  # Unknown operation
+    '{"operacion": "cinematica_directa", "parametros": {"q1": 1, "q2": 2, "q3": 3}}',  # Missing key
+    '{"operacion": "cinematica_directa", "parametros": {' + ANGLES.format(q=1) + ', "q4": 1}}',  # Unknown key
+    '{"operacion": "cinematica_directa", "parametros": {' + ANGLES.format(q=1)[:-9] + '"grad"}}',  # Bad enum
+    '["cinematica_directa"]',
+])
+def test_rejects_commands_outside_the_schema(text):
+    assert not accepts(text)
+
+
+def test_forces_the_structural_prefix():
+    text, state = forced_text(INITIAL_STATE)
+    assert text == '{"operacion":'  # Then an optional space
+    assert state.mode == 'value'
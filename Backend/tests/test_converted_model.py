@@ -0,0 +1,47 @@
+import os
+import time
+
+import torch
+
+QUERIES = ["mueve a x=2 y=3", "gira 90"]
+
+
+def test_first_load_writes_the_converted_checkpoint(make_ai):
+    first = make_ai()
+    converted = first.config['converted_model_path']
+    assert os.path.exists(os.path.join(converted, 'model.safetensors'))
+
+    # The next startup does not need the base model
+    second = make_ai(load=False)
+    second.config['model_name'] = 'no-such-org/no-such-model'
+    assert second.load_converted_model()
+
+    trained = torch.load(first.config['model_path'], map_location='cpu', weights_only=True)
+    for name, weights in second.model.state_dict().items():
+        assert torch.equal(weights, trained[name])
+
+    assert second.load_model()
+    assert second.model_status == 'TRAINED_MODEL'
+    assert second.generate_texts(QUERIES) == first.generate_texts(QUERIES)
+
+
+def test_stale_converted_checkpoint_is_not_used(make_ai):
+    ai = make_ai()
+    # A newer trained model makes the converted checkpoint stale
+    later = time.time() + 10
+    os.utime(ai.config['model_path'], (later, later))
+    assert not make_ai(load=False).load_converted_model()
+
+
+def test_failed_conversion_keeps_the_previous_checkpoint(make_ai, monkeypatch):
+    ai = make_ai()
+    converted = ai.config['converted_model_path']
+    before = os.path.getmtime(os.path.join(converted, 'model.safetensors'))
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ai.tokenizer, 'save_pretrained', fail)
+    ai.convert_model()
+    assert os.path.getmtime(os.path.join(converted, 'model.safetensors')) == before
+    assert not os.path.exists(converted + '.tmp')
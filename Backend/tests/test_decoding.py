@@ -0,0 +1,112 @@
+import json
+
+import model_chat
+from decoding import DecodingStats, is_valid_output, validate_command
+
+QUERIES = ["mueve a x=2 y=3", "gira 90", "distancia entre (0,0) y (3,4)"]
+
+MOVE = {'operacion': 'cinematica_inversa',
+        'parametros': {'posicion_objetivo': {'x': 2, 'y': 3, 'z': 0, 'unidad_posicion': 'cm'}}}
+
+
+def test_validate_command_checks_the_operation_schema():
+    assert validate_command(MOVE)
+    assert is_valid_output(json.dumps(MOVE))
+    assert not validate_command({'operacion': 'cinematica_inversa', 'parametros': {}})
+    assert not validate_command({'operacion': 'bailar', 'parametros': {}})
+    assert not is_valid_output('{"operacion": ')
+    # Simulation takes either the angles or the end effector position
+    assert validate_command({'operacion': 'simulacion_3d', 'parametros': {'posicion_efector': MOVE['parametros']['posicion_objetivo']}})
+
+
+def test_adaptive_falls_back_to_beam_search_for_low_confidence(make_ai):
+    ai = make_ai()
+    expected = ai.generate_texts(QUERIES, decoding='beam')
+
+    ai.config['greedy_min_confidence'] = 1.01  # No greedy output is confident enough
+    ai.decoding_stats = DecodingStats()
+    assert ai.generate_texts(QUERIES, decoding='adaptive') == expected
+
+    stats = ai.decoding_stats.stats()
+    assert stats['fallbacks'] == len(QUERIES)
+    assert stats['fallback_rate'] == 1.0
+    assert stats['modes']['beam']['sequences'] == len(QUERIES)
+
+
+def test_adaptive_keeps_confident_valid_greedy_outputs(make_ai, monkeypatch):
+    ai = make_ai()
+    ai.config['greedy_min_confidence'] = 0.0
+    monkeypatch.setattr(model_chat, 'is_valid_output', lambda text: True)
+    ai.decoding_stats = DecodingStats()
+
+    ai.generate_texts(QUERIES, decoding='adaptive')
+    stats = ai.decoding_stats.stats()
+    assert stats['fallbacks'] == 0
+    assert stats['modes']['greedy']['sequences'] == len(QUERIES)
+    assert 'beam' not in stats['modes']
+
+
+def test_decoding_stats_merge_adds_drained_counters():
+    worker, parent = DecodingStats(), DecodingStats()
+    worker.record('greedy', 0.5, 2)
+    worker.record_fallbacks(2, 1)
+    parent.record('greedy', 0.5, 1)
+
+    parent.merge(worker.drain())
+    stats = parent.stats()
+    assert stats['modes']['greedy']['calls'] == 2
+    assert stats['modes']['greedy']['sequences'] == 3
+    assert stats['fallback_rate'] == 0.5
+    assert worker.stats()['modes'] == {}
+
+
+def encode(tokenizer, text):
+    return tokenizer(text, add_special_tokens=False)['input_ids']
+
+
+def test_json_tracker_completes_on_the_closing_brace(tiny_model):
+    from transformers import AutoTokenizer
+    from decoding import JsonObjectTracker
+
+    tokenizer = AutoTokenizer.from_pretrained(tiny_model[0])
+    tracker = JsonObjectTracker(tokenizer)
+    text = '{"a": {"b": "}{"}, "c": 1}'
+    ids = encode(tokenizer, text)
+
+    closing = [i for i in range(1, len(ids) + 1) if tracker.is_complete(ids[:i])]
+    # Braces inside strings do not count
+    assert closing[0] == len(ids)
+    assert tracker.is_complete(ids + encode(tokenizer, ' trailing}'))
+    assert not tracker.is_complete(encode(tokenizer, '{"a": 1'))
+
+
+def test_json_early_stop_ends_only_the_complete_sequences(tiny_model):
+    import torch
+    from transformers import AutoTokenizer
+    from decoding import ForceEosOnCompleteJson, JsonCompleteStoppingCriteria, JsonObjectTracker
+
+    tokenizer = AutoTokenizer.from_pretrained(tiny_model[0])
+    tracker = JsonObjectTracker(tokenizer)
+    complete, partial = encode(tokenizer, '{"a":1}'), encode(tokenizer, '{"a":12')
+    input_ids = torch.tensor([[0] + complete, [0] + partial])
+
+    stop = JsonCompleteStoppingCriteria(tracker)(input_ids, None)
+    assert stop.tolist() == [True, False]
+
+    scores = torch.zeros(2, len(tokenizer))
+    scores[0, 5] = 3.0
+    forced = ForceEosOnCompleteJson(tracker, tokenizer.eos_token_id)(input_ids, scores.clone())
+    assert forced[0].argmax().item() == tokenizer.eos_token_id
+    assert torch.isinf(forced[0]).sum().item() == len(tokenizer) - 1
+    assert torch.equal(forced[1], scores[1])
+
+
+
+def test_json_tracker_skips_escaped_quotes():
+    from decoding import JsonObjectTracker
+
+    text = '{"c": "\\"}"}'
+    # One token per character, texts given directly (no tokenizer needed)
+    tracker = JsonObjectTracker(None, dict(enumerate(text)))
+    ids = list(range(len(text)))
+    assert [i for i in range(1, len(ids) + 1) if tracker.is_complete(ids[:i])][0] == len(ids)
@@ -0,0 +1,75 @@
+import torch
+
+from encoder_cache import EncoderOutputCache
+
+
+def encoder_states(ai, inputs):
+    with torch.no_grad():
+        return ai.model.get_encoder()(**inputs).last_hidden_state
+
+
+def test_cached_rows_skip_the_encoder_and_match_it(make_ai):
+    ai = make_ai()
+    cache = EncoderOutputCache()
+    encoder = ai.model.get_encoder()
+    batch = ai.tokenize(["gira 90", "distancia entre (0,0) y (3,4)"])
+
+    first = cache.encode(encoder, batch).last_hidden_state
+    assert cache.stats()['misses'] == 2
+    second = cache.encode(encoder, batch).last_hidden_state
+    assert cache.stats()['hits'] == 2
+
+    mask = batch['attention_mask'].bool()
+    expected = encoder_states(ai, batch)
+    for output in (first, second):
+        assert torch.allclose(output[mask], expected[mask], atol=1e-5)
+        assert not output[~mask].any()  # Padding positions are zeros
+
+
+def test_key_ignores_the_right_padding(make_ai):
+    ai = make_ai()
+    cache = EncoderOutputCache()
+    encoder = ai.model.get_encoder()
+
+    alone = ai.tokenize(["gira 90"])
+    padded = ai.tokenize(["gira 90", "distancia entre (0,0) y (3,4)"])
+    assert padded['input_ids'].shape[1] > alone['input_ids'].shape[1]
+
+    cache.encode(encoder, alone)
+    output = cache.encode(encoder, padded).last_hidden_state
+    assert cache.stats() == {'entries': 2, 'hits': 1, 'misses': 2, 'hit_rate': 1 / 3}
+
+    length = alone['input_ids'].shape[1]
+    assert torch.allclose(output[0, :length], encoder_states(ai, alone)[0], atol=1e-5)
+    assert not output[0, length:].any()
+
+
+def test_cache_evicts_least_recently_used(make_ai):
+    ai = make_ai()
+    cache = EncoderOutputCache(max_size=2)
+    encoder = ai.model.get_encoder()
+    for query in ["a", "b", "a", "c"]:
+        cache.encode(encoder, ai.tokenize([query]))
+
+    cache.encode(encoder, ai.tokenize(["a"]))
+    assert cache.stats()['hits'] == 2
+    cache.encode(encoder, ai.tokenize(["b"]))
+    assert cache.stats()['misses'] == 4
+
+
+def test_counters_drain_and_merge():
+    worker, parent = EncoderOutputCache(), EncoderOutputCache()
+    worker.hits, worker.misses = 3, 1
+    parent.merge_counters(worker.drain_counters())
+    assert parent.stats()['hit_rate'] == 0.75
+    assert worker.stats()['hits'] == 0
+
+
+def test_generation_through_the_cache_is_unchanged(make_ai):
+    ai = make_ai()
+    queries = ["gira 90", "distancia entre (0,0) y (3,4)"]
+    cached = ai.generate_texts(queries, decoding='beam')
+    assert ai.encoder_cache.stats()['misses'] == 2
+
+    ai.encoder_cache = None
+    assert ai.generate_texts(queries, decoding='beam') == cached
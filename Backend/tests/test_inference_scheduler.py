@@ -0,0 +1,106 @@
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from inference_scheduler import InferenceScheduler
+
+
+class BlockingGenerator:
+    """generate_batch that records its batches and holds the first one until released"""
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, user_inputs):
+        self.batches.append(list(user_inputs))
+        self.started.set()
+        assert self.release.wait(5)
+        return [text.upper() for text in user_inputs]
+
+
+def test_concurrent_requests_run_as_one_batch():
+    generate = BlockingGenerator()
+    scheduler = InferenceScheduler(generate, max_batch_size=3, max_wait_ms=50).start()
+    try:
+        first = scheduler.submit("a")
+        assert generate.started.wait(5)
+        # Queued while the worker is busy: run together, at most max_batch_size at a time
+        futures = [scheduler.submit(text) for text in "bcde"]
+        generate.release.set()
+
+        assert first.result(5) == "A"
+        assert [future.result(5) for future in futures] == list("BCDE")
+        assert generate.batches == [["a"], ["b", "c", "d"], ["e"]]
+        assert scheduler.stats()['batches'] == 3
+        assert scheduler.stats()['requests'] == 5
+    finally:
+        generate.release.set()
+        scheduler.stop(timeout=5)
+
+
+def test_stop_fails_the_requests_left_in_the_queue():
+    generate = BlockingGenerator()
+    scheduler = InferenceScheduler(generate, max_batch_size=1).start()
+    running = scheduler.submit("a")
+    assert generate.started.wait(5)
+    queued = [scheduler.submit(text) for text in "bc"]
+
+    # The worker is still blocked when the timeout passes
+    scheduler.stop(timeout=0.1)
+    for future in queued:
+        with pytest.raises(RuntimeError, match="stopped"):
+            future.result(5)
+    with pytest.raises(RuntimeError, match="not running"):
+        scheduler.submit("d")
+
+    generate.release.set()
+    assert running.result(5) == "A"
+
+
+def test_stop_serves_the_queued_requests_first():
+    scheduler = InferenceScheduler(lambda texts: [text * 2 for text in texts]).start()
+    futures = [scheduler.submit(text) for text in "xyz"]
+    scheduler.stop(timeout=5)
+    assert [future.result(0) for future in futures] == ["xx", "yy", "zz"]
+
+
+def test_generate_timeout_drops_the_request():
+    generate = BlockingGenerator()
+    scheduler = InferenceScheduler(generate, max_batch_size=1).start()
+    try:
+        scheduler.submit("a")
+        assert generate.started.wait(5)
+        with pytest.raises(TimeoutError):
+            scheduler.generate("b", timeout=0.05)
+        generate.release.set()
+        assert scheduler.generate("c", timeout=5) == "C"
+        # The cancelled request never reached the model
+        assert ["b"] not in generate.batches
+    finally:
+        generate.release.set()
+        scheduler.stop(timeout=5)
+
+
+def test_model_errors_fail_the_whole_batch():
+    def generate(user_inputs):
+        raise ValueError("bad batch")
+
+    scheduler = InferenceScheduler(generate).start()
+    try:
+        with pytest.raises(ValueError, match="bad batch"):
+            scheduler.generate("a", timeout=5)
+    finally:
+        scheduler.stop(timeout=5)
+
+
+def test_scheduler_matches_direct_generation(make_ai):
+    ai = make_ai()
+    queries = ["mueve a x=2 y=3", "gira 90", "distancia entre (0,0) y (3,4)"]
+    expected = [ai.generate_text(query) for query in queries]
+
+    scheduler = ai.enable_scheduler(max_wait_ms=50)
+    futures = [scheduler.submit(query) for query in queries]
+    assert [future.result(30) for future in futures] == expected
@@ -0,0 +1,63 @@
+import pytest
+from flask import Flask
+
+import kinematics_api
+from kinematics_api import MAX_TRAJECTORIES
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(kinematics_api.kinematics_api)
+    return app.test_client()
+
+
+def test_forward_kinematics_of_one_and_of_several_items(client):
+    single = client.post('/api/fk', json={'q': [30, 60, 90]})
+    assert single.status_code == 200
+    assert len(single.get_json()['position']) == 3
+
+    batch = client.post('/api/fk', json={'q': [[30, 60, 90], [0, 0, 0]], 'decimals': 2})
+    assert batch.status_code == 200
+    assert len(batch.get_json()['position']) == 2
+
+
+@pytest.mark.parametrize('path, body, message', [
+    ('/api/fk', {}, "Missing 'q'"),
+    ('/api/fk', {'q': [1, 2]}, "'q' must be [3 numbers] or a list of them"),
+    ('/api/fk', {'q': [[1, 2, 3], [4, 5]]}, "'q' must be an array of numbers"),
+    ('/api/fk', {'q': ['a', 2, 3]}, "'q' must be an array of numbers"),
+    ('/api/fk', {'q': [1, 2, 3], 'unit': 'grad'}, "'unit' must be 'deg' or 'rad'"),
+    ('/api/fk', {'q': [1, 2, 3], 'decimals': 1.5}, "'decimals' must be an integer"),
+    ('/api/fk', {'q': [1, 2, 3], 'decimals': True}, "'decimals' must be an integer"),
+    ('/api/ik', {'position': [1, 2, 3], 'unit': 'km'}, "'unit' must be one of mm, cm, m"),
+    ('/api/ik', {'position': [1, 2, 3], 'angle_unit': 'grad'}, "'angle_unit' must be 'deg' or 'rad'"),
+    ('/api/jacobian', {'q': [[1, 2, 3]] * 3, 'q_dot': [[1, 2, 3]] * 2},
+     "'q_dot' must have one item or as many items as 'q'"),
+    ('/api/trajectory', {'A': [1, 2, 3], 'B': [4, 5, 6], 'V1': 10}, "Each trajectory needs A and B"),
+    ('/api/trajectory', {'A': [1, 2], 'B': [4, 5, 6], 'V1': 10, 'V2': 20, 'K': 5}, "A and B must be [x, y, z]"),
+    ('/api/trajectory', {'A': [1, 2, 3], 'B': [4, 5, 6], 'V1': 0, 'V2': 20, 'K': 5}, "must be positive"),
+    ('/api/trajectory', {'trajectories': [{}] * (MAX_TRAJECTORIES + 1)}, "'trajectories' must be a list"),
+])
+def test_invalid_bodies_are_answered_with_400(client, path, body, message):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
+
+
+def test_body_must_be_a_json_object(client):
+    assert client.post('/api/fk', data='not json', content_type='application/json').status_code == 400
+    assert client.post('/api/fk', json=[1, 2, 3]).status_code == 400
+
+
+def test_rejects_non_finite_values(client):
+    response = client.post('/api/fk', data='{"q": [NaN, 1, 2]}', content_type='application/json')
+    assert response.status_code == 400
+    assert "non-finite" in response.get_json()['error']
+
+
+def test_rejects_more_items_than_the_limit(client, monkeypatch):
+    monkeypatch.setattr(kinematics_api, 'MAX_ITEMS', 2)
+    response = client.post('/api/fk', json={'q': [[1, 2, 3]] * 3})
+    assert response.status_code == 400
+    assert "At most 2 items" in response.get_json()['error']
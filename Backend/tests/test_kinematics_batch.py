@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from benchmarks.kinematics_benchmark import CASES, check_agreement, make_inputs
+from src.const_v import Liaisons
+from src.kinematics_batch import mgd_batch, mgi_batch
+from src.matrice_tn import mgi
+
+
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_batch_versions_match_the_scalar_models(case):
+    n = 5 if case == 'Jacob_analytique' else 50
+    assert check_agreement(case, make_inputs(n), n)
+
+
+def test_mgi_batch_matches_mgi_for_unreachable_targets():
+    targets = np.array([[0, 500, 900], [1e5, 0, 0], [0, 0, -1e5], [300, -200, 1200]], dtype=np.float64)
+    solutions, valid = mgi_batch(targets, Liaisons)
+    assert solutions.shape == (4, 4, 3)
+    for i, target in enumerate(targets):
+        expected = np.array(mgi(target, Liaisons), dtype=np.float64).reshape(-1, 3)
+        np.testing.assert_allclose(solutions[i][valid[i]], expected, atol=1e-9)
+    assert not valid[1].any()
+
+
+def test_mgi_batch_solutions_reach_the_target():
+    qs = np.array([[30, 20, 60], [-120, -40, 150]], dtype=np.float64)
+    targets = mgd_batch(qs, Liaisons)
+    solutions, valid = mgi_batch(targets, Liaisons)
+    for i, target in enumerate(targets):
+        reached = mgd_batch(np.degrees(solutions[i][valid[i]]), Liaisons)
+        np.testing.assert_allclose(reached, np.tile(target, (len(reached), 1)), atol=1e-6)
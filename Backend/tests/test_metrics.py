@@ -0,0 +1,69 @@
+import pytest
+
+from src import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, 'enabled', True)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_quantiles_use_the_bucket_bounds():
+    histogram = metrics.Histogram()
+    for ms in [0.2] * 50 + [3] * 40 + [700] * 9 + [20000]:
+        histogram.add(ms)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['min_ms'] == 0.2
+    assert snapshot['max_ms'] == 20000
+    assert snapshot['p50_ms'] == 0.25
+    assert snapshot['p90_ms'] == 5
+    assert snapshot['p99_ms'] == 1000
+    assert snapshot['buckets']['le_0.25'] == 50
+    assert snapshot['buckets']['inf'] == 1
+
+
+def test_spans_and_timed_record_per_stage():
+    with metrics.span('predict.generate'):
+        pass
+
+    @metrics.timed('model.tokenize')
+    def tokenize():
+        return 'ids'
+
+    assert tokenize() == 'ids'
+    assert tokenize() == 'ids'
+    snapshot = metrics.snapshot()
+    assert list(snapshot) == ['model.tokenize', 'predict.generate']
+    assert snapshot['model.tokenize']['count'] == 2
+
+
+def test_span_records_even_when_the_stage_fails():
+    with pytest.raises(ValueError):
+        with metrics.span('predict.json_parse'):
+            raise ValueError
+    assert metrics.snapshot()['predict.json_parse']['count'] == 1
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, 'enabled', False)
+    with metrics.span('predict.generate'):
+        pass
+    assert metrics.snapshot() == {}
+
+
+def test_drain_and_merge_move_the_worker_histograms():
+    metrics.record('predict.generate', 0.002)
+    drained = metrics.drain()
+    assert metrics.snapshot() == {}
+
+    metrics.record('predict.generate', 0.004)
+    metrics.merge(drained)
+    snapshot = metrics.snapshot()['predict.generate']
+    assert snapshot['count'] == 2
+    assert snapshot['mean_ms'] == pytest.approx(3.0)
+    assert snapshot['min_ms'] == pytest.approx(2.0)
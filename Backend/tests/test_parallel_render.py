@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import Liaisons, Robot_repr
+from src.render_cache import render_cache
+
+QS = [[30, 60, 90], [-30, 120, 45], [10, 20, 30]]
+
+
+@pytest.fixture(autouse=True)
+def empty_render_cache():
+    render_cache.clear()
+    yield
+    render_cache.clear()
+    Robot_repr.shutdown_render_pool()
+
+
+def sequential_payloads():
+    points = Robot_repr.arm_points(Liaisons, QS)
+    return [Robot_repr.serialize_arm_figure(Liaisons, q, 'cdn' if i == 0 else False, points[i])
+            for i, q in enumerate(QS)]
+
+
+def test_render_processes_give_the_same_payloads_as_in_process(monkeypatch):
+    monkeypatch.setattr(Robot_repr, 'render_workers', 2)
+    payloads = Robot_repr.render_figures_html(Liaisons, QS)
+    assert payloads == sequential_payloads()
+
+
+def test_batch_waits_one_deadline_then_serializes_the_rest_in_process(monkeypatch):
+    def slow_worker(Liaisons, q, include_plotlyjs, points=None):
+        time.sleep(0.15)
+        return f"worker {q.tolist()}", {}
+
+    # One thread: the figures finish at 0.15, 0.30 and 0.45 s, after the 0.25 s deadline of the batch
+    monkeypatch.setattr(Robot_repr, 'render_workers', 2)
+    monkeypatch.setattr(Robot_repr, 'render_timeout', 0.25)
+    monkeypatch.setattr(Robot_repr, 'serialize_in_worker', slow_worker)
+    monkeypatch.setattr(Robot_repr, '_render_pool', ThreadPoolExecutor(max_workers=1))
+
+    payloads = Robot_repr.render_figures_html(Liaisons, QS)
+    assert payloads[0] == "worker [30.0, 60.0, 90.0]"
+    assert payloads[1:] == sequential_payloads()[1:]
+    assert Robot_repr._render_pool is None  # Replaced: its worker is still busy with a late figure
@@ -0,0 +1,57 @@
+from prediction_cache import PredictionCache
+
+
+def test_prediction_cache_evicts_least_recently_used():
+    cache = PredictionCache(max_size=2)
+    cache.put("angles 1, 2, 3", "one")
+    cache.put("angles 4, 5, 6", "two")
+    assert cache.get("ANGLES 1,  2, 3") == "one"  # Case and spaces are folded
+
+    cache.put("angles 7, 8, 9", "three")
+    assert cache.get("angles 4, 5, 6") is None
+    assert cache.get("angles 1, 2, 3") == "one"
+    assert cache.stats()['entries'] == 2
+
+
+def test_prediction_cache_does_not_template_numbers_by_default():
+    cache = PredictionCache()
+    cache.put("angles 1, 2, 3", '{"q1": "1", "q2": "2", "q3": "3"}')
+    assert cache.get("angles 4, 5, 6") is None
+
+
+def test_prediction_cache_templates_numbers_when_enabled():
+    cache = PredictionCache(template_numbers=True)
+    cache.put("angles 1, 2, 3", '{"q1": "1", "q2": "2", "q3": "3"}')
+    assert cache.get("angles 4, 5, 6") == '{"q1": "4", "q2": "5", "q3": "6"}'
+
+
+def test_prediction_cache_leaves_numbers_inside_tokens_alone():
+    cache = PredictionCache(template_numbers=True)
+    cache.put("show the robot in 3D with q1 at pi/2", "3D")
+    assert cache.get("show the robot in 2D with q1 at pi/2") is None
+    assert cache.get("show the robot in 3D with q1 at pi/3") is None
+
+
+def test_prediction_namespace_covers_the_decoding_setup(tmp_path):
+    from model_chat import RoboticsAI
+
+    database = str(tmp_path / "predictions.sqlite")
+    RoboticsAI(prediction_cache_path=database).prediction_cache.put("gira 90", '{"beam": 1}')
+
+    assert RoboticsAI(prediction_cache_path=database).prediction_cache.get("gira 90") == '{"beam": 1}'
+    for other in (RoboticsAI(prediction_cache_path=database, decoding='adaptive'),
+                  RoboticsAI(prediction_cache_path=database, quantize=True),
+                  RoboticsAI(prediction_cache_path=database, compiled=True)):
+        assert other.prediction_cache.get("gira 90") is None
+
+
+def test_prediction_namespace_follows_the_final_config(make_ai):
+    ai = make_ai(load=False)
+    ai.config['greedy_min_confidence'] = 0.5
+    ai.config['decoding'] = 'adaptive'
+    ai.prediction_cache.put("gira 90", '{"stale": 1}')
+
+    assert ai.load_model()
+    assert 'adaptive' in ai.prediction_cache.namespace
+    assert 'min-confidence0.5' in ai.prediction_cache.namespace
+    assert ai.prediction_cache.get("gira 90") is None
@@ -0,0 +1,43 @@
+import os
+
+import torch
+
+QUERIES = ["mueve a x=2 y=3", "distancia entre (0,0) y (3,4)"]
+
+
+def test_quantized_model_is_cached_and_reloaded(make_ai):
+    ai = make_ai(quantize=True)
+    assert ai.model_status == 'TRAINED_MODEL_INT8'
+    assert os.path.exists(ai.config['quantized_model_path'])
+
+    reloaded = make_ai(quantize=True)
+    assert reloaded.model_status == 'TRAINED_MODEL_INT8'
+    assert reloaded.generate_texts(QUERIES) == ai.generate_texts(QUERIES)
+
+
+def test_reference_comes_from_the_local_checkpoint(make_ai):
+    ai = make_ai()
+    # The base model is no longer reachable: the reference must not need it
+    ai.config['model_name'] = 'no-such-org/no-such-model'
+
+    reference = ai.load_fp32_model()
+    trained = torch.load(ai.config['model_path'], map_location='cpu', weights_only=True)
+    for name, weights in reference.state_dict().items():
+        assert torch.equal(weights, trained[name])
+
+    # Against itself (fp32) the check finds no difference
+    result = ai.check_quantization_accuracy(QUERIES)
+    assert result['queries'] == 2
+    assert result['exact_match'] == 1.0
+    assert result['mismatches'] == []
+
+
+def test_reference_from_the_converted_checkpoint(make_ai):
+    ai = make_ai(quantize=True)
+    assert os.path.isdir(ai.config['converted_model_path'])
+    os.remove(ai.config['model_path'])
+    ai.config['model_name'] = 'no-such-org/no-such-model'
+
+    result = ai.check_quantization_accuracy(QUERIES)
+    assert result['queries'] == 2
+    assert 0.0 <= result['json_match'] <= 1.0
@@ -0,0 +1,39 @@
+from src.const_v import render_decimals
+from src.render_cache import RenderCache, render_key
+
+
+def test_render_cache_evicts_least_recently_used_within_byte_budget():
+    cache = RenderCache(max_bytes=10)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+    assert cache.get('a') == 'xxxx'  # 'b' is now the least recently used
+
+    cache.put('c', 'xxxx')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'xxxx' and cache.get('c') == 'xxxx'
+    assert cache.stats()['bytes'] == 8
+
+
+def test_render_cache_skips_payloads_larger_than_budget():
+    cache = RenderCache(max_bytes=10)
+    cache.put('a', 'xxxx')
+    cache.put('big', 'x' * 11)
+    assert cache.get('big') is None
+    assert cache.get('a') == 'xxxx'
+
+
+def test_render_cache_replacing_an_entry_updates_its_size():
+    cache = RenderCache(max_bytes=10)
+    cache.put('a', 'xxxxxxxx')
+    cache.put('a', 'xx')
+    cache.put('b', 'xxxxxxxx')
+    assert cache.stats()['bytes'] == 10
+    assert cache.get('a') == 'xx'
+
+
+def test_render_key_rounds_angles_to_display_precision():
+    liaisons = [[1, 2, 3], [4, 5, 6]]
+    step = 10 ** -(render_decimals + 2)
+    assert render_key(liaisons, [30, 60, 90]) == render_key(liaisons, [30 + step, 60 - step, 90])
+    assert render_key(liaisons, [30, 60, 90]) != render_key(liaisons, [31, 60, 90])
+    assert render_key(liaisons, [30, 60, 90], include_plotlyjs=True) != render_key(liaisons, [30, 60, 90])
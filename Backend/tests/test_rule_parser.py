@@ -0,0 +1,48 @@
+import pytest
+
+from rule_parser import RuleParser, parse_command
+
+
+def test_parses_forward_kinematics():
+    assert parse_command("Calculate robot position with angles 45°, 90°, 135°") == {
+        'operacion': 'cinematica_directa',
+        'parametros': {'q1': '45', 'q2': '90', 'q3': '135', 'unidad_angular': 'grados'}
+    }
+
+
+def test_parses_inverse_kinematics():
+    assert parse_command("I want to position the robot at (200, 300, 400) mm") == {
+        'operacion': 'cinematica_inversa',
+        'parametros': {'posicion_objetivo': {'x': '200', 'y': '300', 'z': '400', 'unidad_posicion': 'mm'}}
+    }
+
+
+def test_parses_jacobian_with_velocities():
+    parameters = parse_command("Jacobian with angles 45°, 90°, 135° and velocities 2, 1.5, 3 rad/s")['parametros']
+    assert (parameters['q1_dot'], parameters['q2_dot'], parameters['q3_dot']) == ('2', '1.5', '3')
+    assert parameters['unidad_velocidad'] == 'rad/s'
+
+
+def test_simulation_has_only_the_given_group_of_keys():
+    by_angles = parse_command("Show robot in 3D with angles 60°, 120°, 180°")
+    assert by_angles['operacion'] == 'simulacion_3d'
+    assert set(by_angles['parametros']) == {'q1', 'q2', 'q3', 'unidad_angular'}
+
+    by_position = parse_command("I want to see the robot at (200, 300, 400) mm in 3D")
+    assert set(by_position['parametros']) == {'posicion_efector'}
+
+
+@pytest.mark.parametrize('query', [
+    "hola",
+    "Calculate robot position with angles 45°, 90°",
+    "move the robot a bit to the left",
+])
+def test_leaves_unclear_queries_to_the_model(query):
+    assert parse_command(query) is None
+
+
+def test_counts_hits_and_misses():
+    parser = RuleParser()
+    parser.parse("hola")
+    parser.parse("Calculate robot position with angles 45°, 90°, 135°")
+    assert parser.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
@@ -0,0 +1,92 @@
+import http.client
+import socket
+import threading
+import time
+
+import pytest
+from flask import Flask, Response
+from waitress import wasyncore
+from waitress.server import create_server
+
+import api
+import executors
+import serve
+from src import Robot_repr
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/slow')
+    def slow():
+        time.sleep(0.5)
+        return "done"
+
+    @app.route('/stream')
+    def stream():
+        def events():
+            yield "data: first\n\n"
+            time.sleep(0.5)
+            yield "data: second\n\n"
+        return Response(events(), mimetype='text/event-stream')
+
+    return app
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """serve.py's server and event loop on an ephemeral port, stopped with serve.stop"""
+    # The shared executors and jobs of the other tests are left alone
+    monkeypatch.setattr(executors, 'shutdown', lambda: None)
+    monkeypatch.setattr(api.simulation_jobs, 'shutdown', lambda: None)
+    monkeypatch.setattr(Robot_repr, 'shutdown_render_pool', lambda: None)
+    monkeypatch.setattr(api, 'ai_instance', None)
+    monkeypatch.setattr(serve, 'SHUTDOWN_TIMEOUT', 5)
+
+    server = create_server(make_app(), host='127.0.0.1', port=0, threads=2, send_bytes=1)
+    server.stopping = threading.Event()
+
+    def run():
+        while not server.stopping.is_set():
+            wasyncore.loop(timeout=0.05, map=server._map, use_poll=server.adj.asyncore_use_poll, count=1)
+        serve.stop(server)
+
+    loop = threading.Thread(target=run, daemon=True)
+    loop.start()
+    yield server
+    # The loop wakes up every 50 ms: no pull_trigger, it could race with stop() closing it
+    server.stopping.set()
+    loop.join(10)
+
+
+def get(server, path):
+    connection = http.client.HTTPConnection('127.0.0.1', server.effective_port, timeout=10)
+    connection.request('GET', path)
+    return connection.getresponse()
+
+
+def test_stream_events_are_sent_as_they_are_written(server):
+    start = time.perf_counter()
+    response = get(server, '/stream')
+    assert response.readline() == b"data: first\n"
+    # Flushed at once, not when the generator ends
+    assert time.perf_counter() - start < 0.4
+    assert b"data: second" in response.read()
+
+
+def test_stop_finishes_the_requests_in_progress(server):
+    answers = []
+    client = threading.Thread(target=lambda: answers.append(get(server, '/slow').read()))
+    client.start()
+
+    deadline = time.monotonic() + 5
+    while not serve.busy(server):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    server.stopping.set()
+
+    client.join(10)
+    assert answers == [b"done"]
+    # The listening socket is closed first: no new connections
+    with pytest.raises(ConnectionRefusedError):
+        socket.create_connection(('127.0.0.1', server.effective_port), timeout=1)
@@ -0,0 +1,117 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import simulation_jobs
+from simulation_jobs import SimulationJobs
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(simulation_jobs.time, 'monotonic', clock)
+    return clock
+
+
+def make_jobs(render=None, **kwargs):
+    jobs = SimulationJobs(workers=1, **kwargs)
+    jobs._render = render or (lambda result: f"<div>{len(result.configurations)}</div>")
+    return jobs
+
+
+def simulation(count=1):
+    return SimpleNamespace(configurations=[[0, 0, 0]] * count)
+
+
+def test_job_html_is_fetched_by_id(clock):
+    jobs = make_jobs()
+    try:
+        job_id = jobs.submit(simulation(2))
+        assert jobs.get(job_id, wait=5) == ('done', "<div>2</div>", 2)
+        assert jobs.get("unknown") is None
+    finally:
+        jobs.shutdown()
+
+
+def test_pending_and_failed_jobs(clock):
+    release = threading.Event()
+
+    def render(result):
+        release.wait(5)
+        raise ValueError("no figure")
+
+    jobs = make_jobs(render)
+    try:
+        job_id = jobs.submit(simulation())
+        assert jobs.get(job_id) == ('pending', None, 1)
+        assert jobs.stats()['pending'] == 1
+        release.set()
+        assert jobs.get(job_id, wait=5) == ('error', "no figure", 1)
+    finally:
+        release.set()
+        jobs.shutdown()
+
+
+def test_jobs_expire_after_the_ttl(clock):
+    jobs = make_jobs(ttl=60)
+    try:
+        job_id = jobs.submit(simulation())
+        clock.now += 59
+        assert jobs.get(job_id, wait=5)[0] == 'done'
+        clock.now += 2
+        assert jobs.get(job_id) is None
+        assert jobs.stats()['expired'] == 1
+        assert jobs.stats()['jobs'] == 0
+    finally:
+        jobs.shutdown()
+
+
+def test_oldest_jobs_are_evicted_beyond_max_jobs(clock):
+    release = threading.Event()
+    jobs = make_jobs(lambda result: release.wait(5) and "<div></div>", max_jobs=2)
+    try:
+        first, second, third = (jobs.submit(simulation()) for _ in range(3))
+        # The oldest one is dropped and, still pending, cancelled
+        assert jobs.get(first) is None
+        assert jobs.stats()['evicted'] == 1
+        assert jobs.stats()['jobs'] == 2
+        release.set()
+        assert jobs.get(third, wait=5)[0] == 'done'
+        assert jobs.get(second, wait=5)[0] == 'done'
+    finally:
+        release.set()
+        jobs.shutdown()
+
+
+def test_simulation_route_serves_the_rendered_figures(monkeypatch):
+    import api
+    from chat_processing import process
+
+    jobs = SimulationJobs(workers=1)
+    monkeypatch.setattr(api, 'simulation_jobs', jobs)
+    client = api.app.test_client()
+    try:
+        parameters = {'q1': 30, 'q2': 45, 'q3': 60, 'unidad_angular': 'grados',
+                      'posicion_efector': {'x': None, 'y': None, 'z': None, 'unidad_posicion': 'mm'}}
+        result = process({'operacion': 'simulacion_3d', 'parametros': parameters}, None, render_figures=False)
+        job_id = jobs.submit(result)
+
+        response = client.get(f'/simulation/{job_id}?wait=10')
+        assert response.status_code == 200
+        assert response.json['status'] == 'done'
+        assert response.json['simulation_count'] == 1
+        assert 'plotly' in response.json['simulations_html'].lower()
+
+        assert client.get('/simulation/unknown').status_code == 404
+        assert client.get(f'/simulation/{job_id}?wait=soon').status_code == 400
+    finally:
+        jobs.shutdown()
@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def start_leader(flight, function, results):
+    """Runs flight.do in another thread and returns once the leader is in flight"""
+    started = threading.Event()
+
+    def run():
+        try:
+            results.append(flight.do('key', function, started))
+        except Exception as e:
+            results.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert started.wait(5)
+    return thread
+
+
+def release_when_coalesced(flight, release):
+    """Lets the leader finish once a follower is waiting for it"""
+    def run():
+        while flight.stats()['coalesced'] == 0:
+            time.sleep(0.001)
+        release.set()
+    threading.Thread(target=run).start()
+
+
+def test_identical_calls_share_one_computation():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute(started):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    thread = start_leader(flight, compute, results)
+    release_when_coalesced(flight, release)
+    assert flight.do('key', compute, None) == (42, True)
+    thread.join()
+
+    assert results == [(42, False)]
+    assert len(calls) == 1
+    assert flight.stats()['coalesced'] == 1 and flight.stats()['in_flight'] == 0
+
+
+def test_error_of_leader_reaches_followers():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def compute(started):
+        started.set()
+        release.wait(5)
+        raise ValueError("model failed")
+
+    results = []
+    thread = start_leader(flight, compute, results)
+    release_when_coalesced(flight, release)
+    with pytest.raises(ValueError, match="model failed"):
+        flight.do('key', compute, None)
+    thread.join()
+    assert isinstance(results[0], ValueError)
+
+
+def test_follower_gives_up_after_its_timeout():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def compute(started):
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    thread = start_leader(flight, compute, results)
+    with pytest.raises(TimeoutError):
+        flight.do('key', compute, None, timeout=0.05)
+    release.set()
+    thread.join()
+
+    assert results == [(42, False)]
+    assert flight.stats()['timeouts'] == 1
+
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight(enabled=False)
+    assert flight.do('key', lambda: 1) == (1, False)
+    assert flight.stats()['leaders'] == 0
@@ -0,0 +1,69 @@
+import pytest
+import torch
+
+import speculative_decoding
+from speculative_decoding import find_draft, prompt_lookup_greedy
+
+QUERIES = ["mueve a x=2 y=3", "distancia entre (0,0) y (3,4)"]
+MAX_LENGTH = 24
+
+
+def test_find_draft_copies_what_follows_the_longest_suffix():
+    source = [5, 6, 7, 8, 9, 6, 7, 1]
+    assert find_draft(source, [4, 6, 7], ngram_size=3, num_draft_tokens=2) == [8, 9]
+    assert find_draft(source, [9], ngram_size=3, num_draft_tokens=10) == [6, 7, 1]
+    assert find_draft(source, [3], ngram_size=3, num_draft_tokens=10) == []
+
+
+def greedy(model, inputs):
+    """Plain greedy decoding, without the decoder start token"""
+    with torch.no_grad():
+        output = model.generate(**inputs, max_length=MAX_LENGTH, num_beams=1, do_sample=False)
+    return output[0, 1:].tolist()
+
+
+@pytest.fixture
+def model(make_ai):
+    ai = make_ai()
+    return ai, ai.model
+
+
+@pytest.mark.parametrize('draft', ['lookup', 'right', 'half_right', 'wrong'])
+def test_prompt_lookup_greedy_matches_greedy(model, monkeypatch, draft):
+    ai, model = model
+    for query in QUERIES:
+        inputs = ai.tokenize([query])
+        expected = greedy(model, inputs)
+
+        # Drafts of every quality: fully accepted, rejected halfway (cache cropped) or not at all
+        def oracle(source, generated, ngram_size, num_draft_tokens):
+            right = expected[len(generated):len(generated) + 4]
+            if draft == 'right':
+                return right
+            if draft == 'half_right':
+                return right[:2] + [3]
+            return [3, 3, 3]
+
+        if draft != 'lookup':
+            monkeypatch.setattr(speculative_decoding, 'find_draft', oracle)
+        with torch.no_grad():
+            tokens, passes, drafted, accepted = prompt_lookup_greedy(
+                model, inputs, MAX_LENGTH, model.config.decoder_start_token_id, ai.tokenizer.eos_token_id)
+
+        assert len(expected) > 4
+        assert tokens == [token for token in expected if token != ai.tokenizer.pad_token_id]
+        assert accepted <= drafted
+        if draft == 'right':
+            assert passes < len(tokens)
+        if draft == 'wrong':
+            assert accepted == 0 or 3 in expected
+
+
+def test_speculative_mode_matches_greedy_texts(make_ai):
+    ai = make_ai()
+    ai.config['stop_on_json'] = False
+    ai.config['max_length'] = MAX_LENGTH
+    expected = [ai.tokenizer.decode(greedy(ai.model, ai.tokenize([query])), skip_special_tokens=True)
+                for query in QUERIES]
+    assert ai.generate_texts(QUERIES, decoding='speculative') == expected
+    assert ai.decoding_stats.stats()['speculation']['tokens'] > 0
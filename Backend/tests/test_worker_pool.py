@@ -0,0 +1,98 @@
+import os
+import signal
+import time
+
+import pytest
+
+from worker_pool import InferenceWorkerPool
+
+
+def generate(user_inputs):
+    """Upper-cases the inputs; 'crash' kills the worker, 'fail' raises, 'slow' takes a while"""
+    if 'crash' in user_inputs:
+        os._exit(1)
+    if 'fail' in user_inputs:
+        raise ValueError("bad input")
+    if 'slow' in user_inputs:
+        time.sleep(0.5)
+    return [text.upper() + f"/{len(user_inputs)}" for text in user_inputs]
+
+
+@pytest.fixture
+def pool():
+    pool = InferenceWorkerPool(generate, num_workers=2, max_batch_size=4, threads_per_worker=1).start()
+    yield pool
+    pool.stop(timeout=5)
+
+
+def wait_for_restarts(pool, restarts):
+    deadline = time.monotonic() + 10
+    while pool.stats()['restarts'] < restarts or pool.stats()['workers'] < pool.num_workers:
+        assert time.monotonic() < deadline, pool.stats()
+        time.sleep(0.05)
+
+
+def test_pool_serves_requests(pool):
+    assert [pool.generate(text, timeout=10) for text in "ab"] == ["A/1", "B/1"]
+    assert pool.stats()['requests'] == 2
+
+
+def test_requests_queued_while_the_workers_are_busy_run_as_batches(pool):
+    busy = [pool.submit("slow"), pool.submit("slow")]
+    futures = [pool.submit(text) for text in "abcdef"]
+    assert [future.result(10) for future in busy] == ["SLOW/1", "SLOW/1"]
+    results = [future.result(10) for future in futures]
+    assert [text.split("/")[0] for text in results] == list("ABCDEF")
+    assert max(int(text.split("/")[1]) for text in results) > 1
+    assert pool.stats()['batches'] < 2 + len(futures)
+
+
+def test_model_errors_fail_only_their_batch(pool):
+    with pytest.raises(RuntimeError, match="bad input"):
+        pool.generate("fail", timeout=10)
+    assert pool.generate("a", timeout=10) == "A/1"
+
+
+def test_crashed_worker_fails_its_request_and_is_restarted(pool):
+    with pytest.raises(RuntimeError, match="crashed"):
+        pool.generate("crash", timeout=10)
+    wait_for_restarts(pool, 1)
+    assert [pool.generate(text, timeout=10) for text in "abc"] == ["A/1", "B/1", "C/1"]
+
+
+def test_killed_idle_worker_does_not_stop_the_pool(pool):
+    # Killed while waiting for work: nothing it shared with the others may stay locked
+    os.kill(pool._workers[0].pid, signal.SIGKILL)
+    futures = [pool.submit(text) for text in "abcdefgh"]
+    assert [future.result(10).split("/")[0] for future in futures] == list("ABCDEFGH")
+    wait_for_restarts(pool, 1)
+    assert pool.generate("z", timeout=10) == "Z/1"
+
+
+def test_pool_survives_all_its_workers_being_killed(pool):
+    for worker in list(pool._workers):
+        os.kill(worker.pid, signal.SIGKILL)
+    wait_for_restarts(pool, 2)
+    assert pool.generate("a", timeout=10) == "A/1"
+
+
+def test_stop_serves_the_queued_requests_then_refuses_new_ones():
+    pool = InferenceWorkerPool(generate, num_workers=1, max_batch_size=2, threads_per_worker=1).start()
+    futures = [pool.submit(text) for text in ["slow", "a", "b", "c"]]
+    pool.stop(timeout=10)
+    assert [future.result(0).split("/")[0] for future in futures] == ["SLOW", "A", "B", "C"]
+    assert pool.stats()['workers'] == 0
+    with pytest.raises(RuntimeError, match="not running"):
+        pool.submit("d")
+
+
+def test_worker_pool_matches_direct_generation(make_ai):
+    ai = make_ai()
+    queries = ["mueve a x=2 y=3", "gira 90", "distancia entre (0,0) y (3,4)"]
+    # Forked before the parent runs any inference
+    pool = ai.enable_worker_pool(num_workers=2, threads_per_worker=1)
+    futures = [pool.submit(query) for query in queries]
+    texts = [future.result(60) for future in futures]
+    assert texts == ai.generate_texts(queries)
+    # The decoding counters of the workers are merged into this process
+    assert ai.decoding_stats.stats()['modes']['beam']['sequences'] >= 2 * len(queries)
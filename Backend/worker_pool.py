@@ -0,0 +1,297 @@
+# =============================================================================
+# PRE-FORK INFERENCE WORKER PROCESSES
+# =============================================================================
+
+import collections
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, TimeoutError
+from multiprocessing.connection import wait
+
+import torch
+
+
+def _worker_main(index, generate_batch, requests, results, num_threads, collect_stats):
+    """
+    Worker process: receives batches of inputs on its own request pipe and sends back
+    the texts (plus the statistics of the batch, if collect_stats is given).
+    Nothing is shared with the other workers, so a worker killed at any point
+    (even while waiting for work) can't leave a lock taken for the others.
+    'taken' tells the parent the batch arrived: if the worker dies before sending it,
+    the batch goes to another worker instead of failing.
+    """
+    # Without this every worker would use all the cores (oversubscription)
+    torch.set_num_threads(num_threads)
+    if collect_stats:
+        collect_stats()  # Counters inherited from the parent, already counted there
+
+    while True:
+        try:
+            batch = requests.recv()
+        except EOFError:  # The parent is gone
+            break
+        if batch is None:
+            break
+
+        ids = [request_id for request_id, _ in batch]
+        results.send(('taken', ids))
+        try:
+            texts = generate_batch([user_input for _, user_input in batch])
+            message = ('done', ids, texts)
+        except Exception as e:
+            message = ('error', ids, f"{type(e).__name__}: {e}")
+        results.send(message + (collect_stats() if collect_stats else None,))
+
+
+class InferenceWorkerPool:
+    """
+    N worker processes forked from the process that loaded the model, so the weights
+    are shared (shared memory / copy-on-write) instead of loaded once per worker.
+
+    Same interface as InferenceScheduler: submit() returns a Future resolved by a
+    collector thread with the text generated in one of the workers. Requests wait
+    in this process and are sent as one batch to whichever worker is idle.
+    """
+
+    def __init__(self, generate_batch, num_workers=2, max_batch_size=8, threads_per_worker=None,
+                 collect_stats=None, merge_stats=None):
+        """
+        Args:
+            generate_batch: Callable list[str] -> list[str], run inside the workers.
+            num_workers: Number of worker processes.
+            max_batch_size: Maximum number of queued requests a worker runs as one batch.
+            threads_per_worker: torch intra-op threads of each worker (default: cores / workers).
+            collect_stats: Callable run in a worker after each batch, returning (and resetting)
+                its statistics; merge_stats receives them in this process.
+        """
+        self.generate_batch = generate_batch
+        self.collect_stats = collect_stats
+        self.merge_stats = merge_stats
+        self.num_workers = num_workers
+        self.max_batch_size = max_batch_size
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+
+        self._context = multiprocessing.get_context('fork')
+        self._workers = []
+        self._requests = []  # Worker index -> write end of its request pipe
+        self._results = []  # Worker index -> read end of its result pipe
+        self._collector = None
+        self._running = False
+
+        self._ids = itertools.count()
+        self._queue = collections.deque()  # (request id, input) not sent to a worker yet
+        self._pending = {}  # request id -> Future
+        self._in_flight = {}  # worker index -> (batch sent to it, whether it confirmed taking it)
+        self._idle = set()  # Worker indexes waiting for a batch
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.requests = 0
+        self.restarts = 0
+
+    def start(self):
+        """Fork the workers; call it before the parent runs any inference (forked OpenMP pools can hang)"""
+        if self._collector is None:
+            self._running = True
+            self._workers, self._requests, self._results = [], [], []
+            for index in range(self.num_workers):
+                worker, requests, results = self._fork(index)
+                self._workers.append(worker)
+                self._requests.append(requests)
+                self._results.append(results)
+                self._idle.add(index)
+            self._collector = threading.Thread(target=self._collect, name="inference-workers", daemon=True)
+            self._collector.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the workers once the queued requests have been served"""
+        if self._collector is not None:
+            with self._lock:
+                self._running = False
+                self._dispatch()  # Idle workers get their stop signal now, busy ones when done
+            for worker in self._workers:
+                worker.join(timeout)
+            # The collector exits once it has read the results of the stopped workers
+            self._collector.join(timeout)
+            self._collector = None
+            self._fail(list(self._pending), "Inference workers stopped")
+
+    def submit(self, user_input):
+        """Queue an input and return a Future resolved with the generated text (RuntimeError once stopped)"""
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            if not self._running:
+                raise RuntimeError("Inference workers are not running")
+            self._pending[request_id] = future
+            self._queue.append((request_id, user_input))
+            self._dispatch()
+        return future
+
+    def generate(self, user_input, timeout=None):
+        """
+        Blocking helper: submit and wait for the result.
+        After timeout seconds the request is dropped (its late result is ignored) and TimeoutError raised.
+        """
+        future = self.submit(user_input)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+                'queued': len(self._pending),
+                'workers': sum(worker.is_alive() for worker in self._workers),
+                'threads_per_worker': self.threads_per_worker,
+                'restarts': self.restarts
+            }
+
+    def _fork(self, index):
+        requests, request_sender = self._context.Pipe(duplex=False)
+        results, result_sender = self._context.Pipe(duplex=False)
+        worker = self._context.Process(
+            target=_worker_main,
+            args=(index, self.generate_batch, requests, result_sender,
+                  self.threads_per_worker, self.collect_stats),
+            name=f"inference-worker-{index}",
+            daemon=True
+        )
+        worker.start()
+        # Each end is only used by one side
+        requests.close()
+        result_sender.close()
+        return worker, request_sender, results
+
+    def _dispatch(self):
+        """
+        Send the queued requests to the idle workers, up to max_batch_size each
+        (must hold the lock). Once stopped and drained, idle workers get the stop signal.
+        """
+        while self._idle and self._queue:
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                request_id, user_input = self._queue.popleft()
+                future = self._pending.get(request_id)
+                if future is None or future.cancelled():  # Dropped by a generate() timeout
+                    self._pending.pop(request_id, None)
+                    continue
+                batch.append((request_id, user_input))
+            if not batch:
+                break
+
+            index = self._idle.pop()
+            try:
+                self._requests[index].send(batch)
+            except (BrokenPipeError, OSError):
+                # The worker is dead: the batch waits for the next one, _check_workers restarts it
+                self._queue.extendleft(reversed(batch))
+                continue
+            self._in_flight[index] = (batch, False)
+
+        if not self._running and not self._queue:
+            for index in list(self._idle):
+                try:
+                    self._requests[index].send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            self._idle.clear()
+
+    def _fail(self, request_ids, message):
+        with self._lock:
+            futures = [self._pending.pop(request_id, None) for request_id in request_ids]
+        for future in futures:
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError(message))
+
+    def _read(self, index):
+        """Handle the results worker index has already sent, without waiting"""
+        results = self._results[index]
+        try:
+            while results.poll():
+                self._handle(index, results.recv())
+        except (EOFError, OSError):
+            pass  # The worker is gone
+
+    def _check_workers(self):
+        """
+        Fail the requests the crashed workers were generating (they may be what
+        crashed them), requeue the ones they never took and fork replacements.
+        """
+        dead = [index for index, worker in enumerate(self._workers) if not worker.is_alive()]
+        if not dead or not self._running:
+            return
+
+        crashed = []
+        for index in dead:
+            print(f"⚠️ Inference worker {index} exited (code {self._workers[index].exitcode}), restarting it...")
+            self._read(index)  # Results sent before dying are still good
+            with self._lock:
+                batch, taken = self._in_flight.pop(index, ([], False))
+                if taken:
+                    crashed.extend(request_id for request_id, _ in batch)
+                else:
+                    self._queue.extendleft(reversed(batch))
+                self._idle.discard(index)
+            self._requests[index].close()
+            self._results[index].close()
+            worker, requests, results = self._fork(index)
+            with self._lock:
+                self._workers[index], self._requests[index], self._results[index] = worker, requests, results
+                self.restarts += 1
+                self._idle.add(index)
+        self._fail(crashed, "Inference worker crashed")
+
+        with self._lock:
+            self._dispatch()
+
+    def _collect(self):
+        while True:
+            # Wakes up on a result or on a worker exiting (its sentinel), checked every iteration
+            ready = wait(self._results + [worker.sentinel for worker in self._workers], timeout=1)
+            for index, results in enumerate(self._results):
+                if results in ready:
+                    self._read(index)
+
+            if not self._running and not any(worker.is_alive() for worker in self._workers):
+                for index in range(len(self._workers)):
+                    self._read(index)
+                break
+            self._check_workers()
+
+    def _handle(self, index, message):
+        kind, ids = message[:2]
+        if kind == 'taken':
+            with self._lock:
+                if index in self._in_flight:
+                    self._in_flight[index] = (self._in_flight[index][0], True)
+            return
+
+        if self.merge_stats and message[3] is not None:
+            self.merge_stats(message[3])
+        if kind == 'error':
+            self._fail(ids, message[2])
+            futures, texts = [], []
+        else:
+            with self._lock:
+                self.batches += 1
+                self.requests += len(ids)
+                futures = [self._pending.pop(request_id, None) for request_id in ids]
+            texts = message[2]
+
+        with self._lock:
+            self._in_flight.pop(index, None)
+            self._idle.add(index)
+            self._dispatch()
+
+        for future, text in zip(futures, texts):
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_result(text)
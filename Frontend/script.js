@@ -71,8 +71,8 @@ function formatSolutionsText(textContent) {
     return textContent;
 }
 
-// NUEVA: Función para actualizar con simulación (MEJORADA para formato)
-function updateLoadingMessageWithSimulation(loadingMessageDiv, textContent, simulationHtml) {
+// Texto de la respuesta + visor 3D en estado "Loading..." (la simulación llega después)
+function showSimulationPlaceholder(loadingMessageDiv, textContent) {
     const messageContent = loadingMessageDiv.querySelector('.message-content');
     messageContent.className = 'message-content simulation-message';
     
@@ -95,41 +95,101 @@ function updateLoadingMessageWithSimulation(loadingMessageDiv, textContent, simu
             </div>
         </div>
     `;
+}
+
+// Carga el HTML de la simulación en el visor creado por showSimulationPlaceholder
+function loadSimulation(loadingMessageDiv, simulationHtml) {
+    const messageContent = loadingMessageDiv.querySelector('.message-content');
+    const simViewer = messageContent.querySelector('.simulation-viewer');
+    const statusSpan = messageContent.querySelector('.simulation-status');
     
-    // Resto del código igual...
-    setTimeout(() => {
-        const simViewer = messageContent.querySelector('.simulation-viewer');
-        const statusSpan = messageContent.querySelector('.simulation-status');
+    try {
+        const iframe = document.createElement('iframe');
+        iframe.style.width = '100%';
+        iframe.style.height = '500px';
+        iframe.style.border = 'none';
+        iframe.srcdoc = simulationHtml;
         
-        try {
-            const iframe = document.createElement('iframe');
-            iframe.style.width = '100%';
-            iframe.style.height = '500px';
-            iframe.style.border = 'none';
-            iframe.srcdoc = simulationHtml;
-            
-            simViewer.innerHTML = '';
-            simViewer.appendChild(iframe);
-            
-            statusSpan.textContent = 'Interactive';
-            statusSpan.style.background = '#28a745';
-            
-            console.log('✅ Simulación cargada en iframe con anchura fija');
-            
-        } catch (error) {
-            console.log('⚠️ Iframe fallido, intentando inyección directa');
-            
-            simViewer.innerHTML = `
-                <div class="plotly-container-wrapper" style="width: 100%; height: 500px; overflow: auto;">
-                    ${simulationHtml}
-                </div>
-            `;
+        simViewer.innerHTML = '';
+        simViewer.appendChild(iframe);
+        
+        statusSpan.textContent = 'Interactive';
+        statusSpan.style.background = '#28a745';
+        
+        console.log('✅ Simulación cargada en iframe con anchura fija');
+        
+    } catch (error) {
+        console.log('⚠️ Iframe fallido, intentando inyección directa');
+        
+        simViewer.innerHTML = `
+            <div class="plotly-container-wrapper" style="width: 100%; height: 500px; overflow: auto;">
+                ${simulationHtml}
+            </div>
+        `;
+        
+        statusSpan.textContent = 'Loaded';
+        statusSpan.style.background = '#17a2b8';
+    }
+}
+
+// Pide las figuras de un job de simulación (espera en el servidor hasta 10 s por petición)
+async function fetchSimulation(loadingMessageDiv, simulationUrl) {
+    const statusSpan = loadingMessageDiv.querySelector('.simulation-status');
+    
+    try {
+        while (true) {
+            const response = await fetch(`${API_URL}${simulationUrl}?wait=10`);
+            if (response.status === 202) continue;
             
-            statusSpan.textContent = 'Loaded';
-            statusSpan.style.background = '#17a2b8';
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || `HTTP ${response.status}`);
+            }
+            loadSimulation(loadingMessageDiv, data.simulations_html);
+            return;
         }
+    } catch (error) {
+        console.error('Simulation Error:', error);
+        if (statusSpan) {
+            statusSpan.textContent = 'Unavailable';
+            statusSpan.style.background = '#dc3545';
+        }
+    }
+}
+
+// Mantiene la burbuja de carga mostrando la etapa en curso
+function updateLoadingStage(loadingMessageDiv, stage) {
+    const loadingText = loadingMessageDiv.querySelector('.loading-text');
+    if (loadingText && loadingText.firstChild) {
+        loadingText.firstChild.textContent = `${stage} `;
+    }
+}
+
+// Lee un stream Server-Sent Events de una respuesta fetch y llama a onEvent(evento, datos) por cada evento
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
         
-    }, 500);
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
 }
 
 // Función para enviar mensaje (TU ORIGINAL + pequeña mejora)
@@ -152,8 +212,8 @@ async function sendMessage() {
     const loadingMessage = addMessage('', false, true);
     
     try {
-        // LLAMADA REAL A LA API (asíncrona)
-        const response = await fetch(`${API_URL}/chat`, {
+        // LLAMADA REAL A LA API (streaming: cada etapa se muestra en cuanto llega)
+        const response = await fetch(`${API_URL}/chat/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -161,29 +221,49 @@ async function sendMessage() {
             body: JSON.stringify({ message: message })
         });
         
+        if (response.status === 503) {
+            const data = await response.json();
+            updateLoadingMessage(loadingMessage, `⏳ ${data.error}\n\nPlease try again in ${data.retry_after} s.`);
+            return;
+        }
+        
         if (!response.ok) {
             throw new Error(`HTTP ${response.status}: ${response.statusText}`);
         }
         
-        const data = await response.json();
-        
-        // DEBUG: Ver qué respuesta recibimos
-        console.log('📨 Respuesta de la API:', data);
+        let waitingSimulation = false;
         
-        // ACTUALIZAR BURBUJA DE CARGA CON RESPUESTA REAL
-        if (data.error) {
-            console.log('❌ Error detectado');
-            updateLoadingMessage(loadingMessage, `❌ Error: ${data.error}`);
-        } else if (data.has_simulation && data.simulations_html) {
-            console.log('✅ Simulación detectada con HTML');
-            updateLoadingMessageWithSimulation(loadingMessage, data.response, data.simulations_html);
-        } else if (data.has_simulation) {
-            console.log('⚠️ Simulación detectada PERO sin HTML');
-            updateLoadingMessage(loadingMessage, data.response + '\n\n[Simulación abierta en ventana externa]');
-        } else {
-            console.log('📝 Respuesta normal');
-            updateLoadingMessage(loadingMessage, data.response);
-        }
+        await readEventStream(response, (event, data) => {
+            // DEBUG: Ver qué eventos recibimos
+            console.log(`📨 Evento ${event}:`, data);
+            
+            if (event === 'prediction') {
+                // Consulta interpretada: la burbuja sigue cargando mientras se calcula
+                const operation = data.prediction ? data.prediction.operacion : null;
+                updateLoadingStage(loadingMessage, operation ? `Computing ${operation.replace(/_/g, ' ')}` : 'Processing');
+            } else if (event === 'result') {
+                const result = data.result;
+                if (result && result.type === 'simulacion_3d' && result.configurations.length) {
+                    console.log('✅ Simulación detectada, esperando el HTML');
+                    waitingSimulation = true;
+                    showSimulationPlaceholder(loadingMessage, data.response || '');
+                } else {
+                    console.log('📝 Respuesta normal');
+                    updateLoadingMessage(loadingMessage, data.response || '');
+                }
+            } else if (event === 'simulation') {
+                // Las figuras se generan en segundo plano: se piden al servidor cuando estén listas
+                waitingSimulation = false;
+                fetchSimulation(loadingMessage, data.simulation_url);
+            } else if (event === 'error') {
+                console.log('❌ Error detectado');
+                waitingSimulation = false;
+                updateLoadingMessage(loadingMessage, `❌ Error: ${data.error}`);
+            } else if (event === 'done' && waitingSimulation) {
+                const statusSpan = loadingMessage.querySelector('.simulation-status');
+                if (statusSpan) statusSpan.textContent = 'Unavailable';
+            }
+        });
         
     } catch (error) {
         console.error('API Error:', error);